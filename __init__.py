@@ -18,7 +18,7 @@ Created by Jacques Lucke
 	along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
-import sys, os, bpy, mathutils, inspect
+import sys, os, bpy, bpy.utils.previews, mathutils, inspect, numpy, hashlib, tempfile
 import xml.etree.ElementTree as ET
 from bpy.app.handlers import persistent
 sys.path.append(os.path.dirname(__file__))
@@ -28,6 +28,14 @@ from lens_flare_constraint_utils import *
 from lens_flare_driver_utils import *
 from lens_flare_animation_utils import *
 from lens_flare_material_and_node_utils import *
+from lens_flare_engine_utils import *
+from lens_flare_raster_utils import *
+from lens_flare_preset_utils import *
+from lens_flare_atlas_utils import *
+from lens_flare_procedural_utils import *
+from lens_flare_occlusion_utils import *
+from lens_flare_screen_utils import *
+from lens_flare_profiling_utils import *
 
 
 bl_info = {
@@ -45,8 +53,13 @@ activeFlareName = ""
 activeElementName = ""
 
 addonFolder = inspect.getfile(inspect.currentframe())[0:-len("__init__.py")]
-elementsFolder = addonFolder + "elements\\"
-presetsFolder = addonFolder + "presets\\"
+elementsFolder = os.path.join(addonFolder, "elements", "")
+presetsFolder = os.path.join(addonFolder, "presets", "")
+# the addon folder can be read only, everything in here can be rebuilt
+cacheFolder = os.path.join(tempfile.gettempdir(), "blender lens flares")
+thumbnailsFolder = os.path.join(cacheFolder, "thumbnails")
+decodedElementsFolder = os.path.join(thumbnailsFolder, "elements")
+presetIndexPath = os.path.join(cacheFolder, "presets.sqlite")
 	
 flareControlerPrefix = "flare controler"
 angleCalculatorPrefix = "angle calculator"
@@ -59,6 +72,8 @@ endElementPrefix = "end element"
 flareElementEmptyPrefix = "flare element data"
 elementNamesContainerPrefix = "element data names container"
 targetEmptyPrefix = "target empty"
+flareInstancesPrefix = "flare instances"
+flareInstancePrefix = "flare element instances"
 
 dofDistanceName = "dof distance"
 plainDistanceName = "plane distance"
@@ -83,6 +98,35 @@ intensityName = "intensity"
 imageNodeName = "image node"
 colorMultiplyNodeName = "color multiply node"
 emissionNodeName = "emission node"
+intensityNodeName = "intensity node"
+flareShaderGroupName = "lens flare shader"
+flareMaterialPrefix = "lens flare "
+flareImagePropertyName = "flare image"
+previewImageName = "lens flare preview"
+atlasImageName = "lens flare atlas"
+atlasMaterialName = "lens flare atlas material"
+atlasMeshPrefix = "atlas plane "
+atlasRectsPropertyName = "atlas rects"
+imageNamePropertyName = "image name"
+proceduralSpecPropertyName = "procedural spec"
+maxIDNameLength = 63
+# the object index of element planes carries their intensity, it is the only driveable scalar the shader can read
+intensityIndexScale = 1000
+occlusionName = "occlusion"
+hideBeforeCullingName = "hide before culling"
+transparentBounceMargin = 8
+instancesContainerPropertyName = "instances container"
+centerEmptyPropertyName = "lens flare center"
+directionCalculatorPropertyName = "lens flare direction calculator"
+instanceTemplatePropertyName = "instance template"
+instanceObjectsPropertyName = "instance objects"
+instanceIntensityName = "lens flare intensity"
+instanceColorLayerName = "instance intensity"
+flareInstanceShaderGroupName = "lens flare instance shader"
+flareInstanceMaterialPrefix = "lens flare instances "
+maxTransparentBounces = 512
+elementPlaneSize = 0.1
+rigConstraintTypes = ["LIMIT_LOCATION", "LIMIT_ROTATION", "LIMIT_SCALE", "TRACK_TO", "COPY_ROTATION"]
 childOfFlarePropertyName = "child of flare"
 targetPropertyName = "flare target"
 cameraOfFlarePropertyName = "camera of this flare"
@@ -96,6 +140,17 @@ flareNamePropertyName = "flare name"
 linkToFlareControlerPropertyName = "flare link from target"
 targetNamePropertyName = "target empty"
 angleNamePropertyName = "angle calculator"
+startDistanceNamePropertyName = "start distance calculator"
+engineName = "flare engine"
+
+driverEngine = "DRIVERS"
+compactEngine = "COMPACT"
+handlerEngine = "HANDLER"
+bakedEngine = "BAKED"
+rigEngines = (driverEngine, compactEngine)
+engineItems = [	(driverEngine, "Drivers", "Every flare is a rig of scripted drivers."),
+				(compactEngine, "Compact Drivers", "Driver rig in which every derived value is computed only once."),
+				(handlerEngine, "Frame Handler", "All flares are computed together in one frame change handler.") ]
 
 anglePath = getDataPath(angleName)
 startDistancePath = getDataPath(startDistanceName)
@@ -113,51 +168,77 @@ offsetYPath = getDataPath(offsetYName)
 additionalRotationPath = getDataPath(additionalRotationName)
 trackToCenterInfluencePath = getDataPath(trackToCenterInfluenceName)
 intensityPath = getDataPath(intensityName)
+occlusionPath = getDataPath(occlusionName)
 elementNamePropertyPath = getDataPath(elementNamePropertyName)
 flareNamePropertyPath = getDataPath(flareNamePropertyName)
+colorMultiplyPath = getDataPath(colorMultiplyName)
 
 
 # new lens flare
 ###################################
 
-def newLensFlareFromData(camera, target, flareData):
-	flareControler = newLensFlare(camera, target)
+def newLensFlareFromData(camera, target, flareData, engine = None):
+	flareControler = newLensFlare(camera, target, engine)
 	flareData.setDataOnFlareControler(flareControler)
 	return flareControler
 
-def newLensFlare(camera, target):
+@profiled("newLensFlare")
+def newLensFlare(camera, target, engine = None, center = None, directionCalculator = None):
+	# center and direction calculator can be passed in when many flares are created for one camera
+	if engine is None: engine = getDefaultFlareEngine()
 	setCurrentOffsetPropertyOnCamera(camera)
-	center = getCenterEmpty(camera)
 	targetEmpty = newTargetEmpty(target)
 	flareControler = newFlareControler(camera, targetEmpty, center)	
+	setCustomProperty(flareControler, engineName, engine)
 	setCustomProperty(targetEmpty, linkToFlareControlerPropertyName, flareControler.name)
-	angleCalculator = newAngleCalculator(flareControler, camera, targetEmpty, center)
-	startDistanceCalculator = newStartDistanceCalculator(flareControler, angleCalculator, center, camera)
-	
-	startElement = newStartElement(flareControler, camera, startDistanceCalculator)
-	endElement = newEndElement(flareControler, startElement, center, camera)
 	
 	elementNamesContainer = newElementEmptyNamesContainer(flareControler)
+	helpers = [elementNamesContainer, targetEmpty]
+	if usesDriverRig(flareControler):
+		if center is None: center = getCenterEmpty(camera)
+		if directionCalculator is None: directionCalculator = getCameraDirectionCalculator(camera)
+		helpers.extend(newDriverRigHelpers(flareControler, camera, targetEmpty, center, directionCalculator))
 	
-	setCustomProperty(flareControler, startElementPropertyName, startElement.name)
-	setCustomProperty(flareControler, endElementPropertyName, endElement.name)
 	setCustomProperty(flareControler, elementNamesContainerPropertyName, elementNamesContainer.name)
 	setCustomProperty(flareControler, targetNamePropertyName, targetEmpty.name)
-	setCustomProperty(flareControler, angleNamePropertyName, angleCalculator.name)
 	setParentWithoutInverse(targetEmpty, camera)
 	makePartOfFlareControler(targetEmpty, flareControler)
+	registerFlareHelpers(flareControler, helpers)
 	
 	flareControler.hide =  True
-	angleCalculator.hide = True
-	startDistanceCalculator.hide = True
-	startElement.hide = True
-	endElement.hide = True
-	elementNamesContainer.hide = True
-	targetEmpty.hide = True
-	
-	setMinMaxTransparentBounces(512)
+	for helper in helpers:
+		helper.hide = True
 	return flareControler
 	
+def newDriverRigHelpers(flareControler, camera, targetEmpty, center, directionCalculator):
+	setTargetDirectionProperties(flareControler, targetEmpty)
+	angleCalculator = newAngleCalculator(flareControler, directionCalculator)
+	startDistanceCalculator = newStartDistanceCalculator(flareControler, angleCalculator, center, camera)
+	
+	startElement = newStartElement(flareControler, camera, startDistanceCalculator)
+	endElement = newEndElement(flareControler, startElement, center, camera)
+	
+	setCustomProperty(flareControler, startElementPropertyName, startElement.name)
+	setCustomProperty(flareControler, endElementPropertyName, endElement.name)
+	setCustomProperty(flareControler, angleNamePropertyName, angleCalculator.name)
+	setCustomProperty(flareControler, startDistanceNamePropertyName, startDistanceCalculator.name)
+	return [angleCalculator, startDistanceCalculator, startElement, endElement]
+	
+def getDefaultFlareEngine():
+	return getattr(bpy.context.scene, "lens_flare_engine", driverEngine)
+def getFlareEngine(flareControler):
+	return flareControler.get(engineName, driverEngine)
+def usesDriverEngine(flareControler):
+	return getFlareEngine(flareControler) == driverEngine
+def usesCompactEngine(flareControler):
+	return getFlareEngine(flareControler) == compactEngine
+def usesDriverRig(flareControler):
+	return getFlareEngine(flareControler) in rigEngines
+def usesBakedEngine(flareControler):
+	return getFlareEngine(flareControler) == bakedEngine
+def usesHandlerEngine(flareControler):
+	return getFlareEngine(flareControler) == handlerEngine
+	
 def setCurrentOffsetPropertyOnCamera(camera):
 	if currentElementOffsetName not in camera:
 		setCustomProperty(camera, currentElementOffsetName, -0.002)
@@ -171,22 +252,14 @@ def newTargetEmpty(target):
 # camera direction calculator
 
 def getCameraDirectionCalculator(camera):
-	directionCalculators = getCameraDirectionCalculators()
-	for calculator in directionCalculators:
-		if calculator.parent == camera:
-			return calculator
-	return newCameraDirectionCalculator(camera)
-	
-def getCameraDirectionCalculators():
-	calculators = []
-	for object in bpy.data.objects:
-		if hasPrefix(object.name, cameraDirectionCalculatorPrefix):
-			calculators.append(object)
-	return calculators
+	calculator = getCameraHelper(camera, directionCalculatorPropertyName, cameraDirectionCalculatorPrefix)
+	if calculator is None: calculator = newCameraDirectionCalculator(camera)
+	return calculator
 	
 def newCameraDirectionCalculator(camera):
 	calculator = newEmpty(name = cameraDirectionCalculatorPrefix)
 	setParentWithoutInverse(calculator, camera)
+	setCustomProperty(camera, directionCalculatorPropertyName, calculator.name)
 	calculator.location.z = -1
 	lockCurrentLocalLocation(calculator)
 	setCameraDirectionProperties(calculator, camera)
@@ -201,22 +274,14 @@ def setCameraDirectionProperties(directionCalculator, camera):
 # center creation	
 
 def getCenterEmpty(camera):
-	centers = getCenterEmpties()
-	for center in centers:
-		if center.parent == camera:
-			return center
-	return newCenterEmpty(camera)
-	
-def getCenterEmpties():
-	centers = []
-	for object in bpy.data.objects:
-		if hasPrefix(object.name, cameraCenterPrefix):
-			centers.append(object)
-	return centers
+	center = getCameraHelper(camera, centerEmptyPropertyName, cameraCenterPrefix)
+	if center is None: center = newCenterEmpty(camera)
+	return center
 	
 def newCenterEmpty(camera):
 	center = newEmpty(name = cameraCenterPrefix, type = "SPHERE")
 	setParentWithoutInverse(center, camera)
+	setCustomProperty(camera, centerEmptyPropertyName, center.name)
 	center.empty_draw_size = 0.1
 	center.hide = True
 	setCenterDistance(center, camera)
@@ -224,13 +289,41 @@ def newCenterEmpty(camera):
 	return center
 	
 def setCenterDistance(center, camera):
-	directionCalculator = getCameraDirectionCalculator(camera)
-	
 	driver = newDriver(center, "location", index = 2)
 	linkFloatPropertyToDriver(driver, "distance", getCameraFromObject(camera), "dof_distance", idType = "CAMERA")
 	linkTransformChannelToDriver(driver, "scale", camera, "SCALE_Z")
 	driver.expression = "-max(distance, 1)/scale"
 	
+# camera helper references
+
+# the camera stores the names of its helpers; they are only searched again when a name is stale
+
+def getCameraHelper(camera, propertyName, prefix):
+	helper = getValidCameraHelper(camera, propertyName, prefix)
+	isStale = propertyName in camera
+	if helper is None and (isStale or not cameraHelperReferencesAreBuilt.get(propertyName, False)):
+		rebuildCameraHelperReferences(propertyName, prefix)
+		helper = getValidCameraHelper(camera, propertyName, prefix)
+	return helper
+	
+def getValidCameraHelper(camera, propertyName, prefix):
+	helper = bpy.data.objects.get(camera.get(propertyName, ""))
+	if helper is None or helper.parent != camera or not hasPrefix(helper.name, prefix): return None
+	return helper
+	
+# property name -> whether helpers of files without stored references were searched already
+cameraHelperReferencesAreBuilt = {}
+
+def rebuildCameraHelperReferences(propertyName, prefix):
+	for object in bpy.data.objects:
+		camera = object.parent
+		if camera is None or not hasPrefix(object.name, prefix): continue
+		if getValidCameraHelper(camera, propertyName, prefix) is None:
+			setCustomProperty(camera, propertyName, object.name)
+	cameraHelperReferencesAreBuilt[propertyName] = True
+def resetCameraHelperReferences():
+	cameraHelperReferencesAreBuilt.clear()
+	
 # flare controler creation	
 
 def newFlareControler(camera, target, center):
@@ -238,11 +331,11 @@ def newFlareControler(camera, target, center):
 	makePartOfFlareControler(flareControler, flareControler)
 	setCustomProperty(flareControler, flareNamePropertyName, "Lens Flare")
 	setCustomProperty(flareControler, intensityName, 1.0, min = 0.0)
+	setOcclusionProperty(flareControler)
 	setObjectReference(flareControler, cameraOfFlarePropertyName, camera)
 	setObjectReference(flareControler, targetPropertyName, target)
 	setParentWithoutInverse(flareControler, camera)	
 	lockCurrentLocalLocation(flareControler)
-	setTargetDirectionProperties(flareControler, target)
 	return flareControler
 	
 def setTargetDirectionProperties(flareControler, target):
@@ -252,11 +345,11 @@ def setTargetDirectionProperties(flareControler, target):
 	
 # angle calculator
 
-def newAngleCalculator(flareControler, camera, target, center):
+def newAngleCalculator(flareControler, cameraDirectionCalculator):
 	angleCalculator = newEmpty(name = angleCalculatorPrefix)
 	makePartOfFlareControler(angleCalculator, flareControler)
 	setParentWithoutInverse(angleCalculator, flareControler)
-	setTargetAngleProperty(angleCalculator, flareControler, getCameraDirectionCalculator(camera))
+	setTargetAngleProperty(angleCalculator, flareControler, cameraDirectionCalculator)
 	return angleCalculator
 	
 def setTargetAngleProperty(angleCalculator, flareControler, cameraDirectionCalculator):
@@ -291,8 +384,11 @@ def setStartDistanceProperty(startDistanceCalculator, angleCalculator, center, c
 def newStartElement(flareControler, camera, startDistanceCalculator):
 	startElement = newEmpty(name = startElementPrefix)
 	makePartOfFlareControler(startElement, flareControler)
-	setParentWithoutInverse(startElement, flareControler)
-	setStartLocationDrivers(startElement, camera, flareControler, startDistanceCalculator)
+	if usesCompactEngine(flareControler):
+		setCompactStartLocationDrivers(startElement, camera, flareControler, startDistanceCalculator)
+	else:
+		setParentWithoutInverse(startElement, flareControler)
+		setStartLocationDrivers(startElement, camera, flareControler, startDistanceCalculator)
 	return startElement
 	
 def setStartLocationDrivers(startElement, camera, flareControler, startDistanceCalculator):
@@ -318,14 +414,25 @@ def setStartLocationDrivers(startElement, camera, flareControler, startDistanceC
 		linkFloatPropertyToDriver(driver, "distance", startDistanceCalculator, startDistancePath)
 		linkTransformChannelToDriver(driver, "cam", camera, "LOC_Z")
 		driver.expression = "direction*distance+cam"
+		
+def setCompactStartLocationDrivers(startElement, camera, flareControler, startDistanceCalculator):
+	for index, (directionPath, channel) in enumerate([(directionXPath, "LOC_X"), (directionYPath, "LOC_Y"), (directionZPath, "LOC_Z")]):
+		driver = newDriver(startElement, "location", index = index)
+		linkFloatPropertyToDriver(driver, "direction", flareControler, directionPath)
+		linkFloatPropertyToDriver(driver, "distance", startDistanceCalculator, startDistancePath)
+		linkTransformChannelToDriver(driver, "cam", camera, channel)
+		driver.expression = "direction*distance+cam"
 	
 # end element creation
 
 def newEndElement(flareControler, startElement, center, camera):
 	endElement = newEmpty(name = endElementPrefix)
 	makePartOfFlareControler(endElement, flareControler)
-	setParentWithoutInverse(endElement, flareControler)
-	setEndLocationDrivers(endElement, startElement, center)
+	if usesCompactEngine(flareControler):
+		setCompactEndLocationDrivers(endElement, startElement, center)
+	else:
+		setParentWithoutInverse(endElement, flareControler)
+		setEndLocationDrivers(endElement, startElement, center)
 	return endElement
 	
 def setEndLocationDrivers(endElement, startElement, center):
@@ -348,6 +455,13 @@ def setEndLocationDrivers(endElement, startElement, center):
 		linkTransformChannelToDriver(driver, "start", startElement, "LOC_Z")
 		linkTransformChannelToDriver(driver, "center", center, "LOC_Z")
 		driver.expression = "2*center - start"
+		
+def setCompactEndLocationDrivers(endElement, startElement, center):
+	for index, channel in enumerate(["LOC_X", "LOC_Y", "LOC_Z"]):
+		driver = newDriver(endElement, "location", index = index)
+		linkTransformChannelToDriver(driver, "start", startElement, channel)
+		linkTransformChannelToDriver(driver, "center", center, channel)
+		driver.expression = "2*center - start"
 	
 # element data names container
 	
@@ -365,19 +479,23 @@ def newElementEmptyNamesContainer(flareControler):
 
 def newFlareElementFromData(flareControler, elementData):
 	name = elementData.name
-	image = getImage(elementData.getImagePath())
-	(element, plane) = newFlareElement(flareControler, image, name)
+	(element, plane) = newFlareElement(flareControler, None, name)
 	elementData.setDataOnElement(element)
 	return element
 	
+@profiled("newFlareElement")
 def newFlareElement(flareControler, image, name = "element"):
 	camera = getCameraFromFlareControler(flareControler)
 	camera[currentElementOffsetName] += 0.0003
-	startElement = getStartElement(flareControler)
-	endElement = getEndElement(flareControler)
 	
-	element = newFlareElementEmpty(flareControler, startElement, endElement, camera)
+	element = newFlareElementEmpty(flareControler, camera)
 	flareElement = newFlareElementPlane(image, element, flareControler, camera)	
+	if usesDriverEngine(flareControler):
+		setPositionConstraintOnFlareElement(element, getStartElement(flareControler), getEndElement(flareControler))
+		setDriverRigOnElementPlane(flareElement, element, camera)
+	elif usesCompactEngine(flareControler):
+		setCompactRigOnFlareElement(element, getStartElement(flareControler), getEndElement(flareControler), camera)
+		setCompactRigOnElementPlane(flareElement, element, camera)
 	
 	setCustomProperty(element, elementPlainNamePropertyName, flareElement.name)
 	
@@ -386,6 +504,8 @@ def newFlareElement(flareControler, image, name = "element"):
 	
 	elementNamesContainer = getElementEmptyNamesContainer(flareControler)
 	appendObjectReference(elementNamesContainer, element)
+	registerFlareElement(flareControler, element, flareElement)
+	if not isCreatingFlaresInBatch: raiseTransparentBouncesForAllElements()
 	
 	setCustomProperty(element, elementNamePropertyName, name)
 	
@@ -393,14 +513,13 @@ def newFlareElement(flareControler, image, name = "element"):
 	
 	return (element, flareElement)
 	
-def newFlareElementEmpty(flareControler, startElement, endElement, camera):
+def newFlareElementEmpty(flareControler, camera):
 	element = newEmpty(name = flareElementEmptyPrefix)
 	makePartOfFlareControler(element, flareControler)
 	element.empty_draw_size = 0.01
 	
-	setParentWithoutInverse(element, flareControler)
+	if not usesCompactEngine(flareControler): setParentWithoutInverse(element, flareControler)
 	setCustomPropertiesOnFlareElement(element, camera)
-	setPositionConstraintOnFlareElement(element, startElement, endElement)
 	return element
 	
 def setCustomPropertiesOnFlareElement(element, camera):
@@ -424,58 +543,176 @@ def setPositionConstraintOnFlareElement(element, startElement, endElement):
 		setPositionDriverOnFlareElementConstraint(element, startElement, endElement, constraintPath + val + "_y", "LOC_Y")
 		setPositionDriverOnFlareElementConstraint(element, startElement, endElement, constraintPath + val + "_z", "LOC_Z")
 		
-def setPositionDriverOnFlareElementConstraint(element, startElement, endElement, pathToValue, channel):
-	driver = newDriver(element, pathToValue)
+def setPositionDriverOnFlareElementConstraint(element, startElement, endElement, pathToValue, channel, index = -1):
+	driver = newDriver(element, pathToValue, index = index)
 	linkTransformChannelToDriver(driver, "start", startElement, channel)
 	linkTransformChannelToDriver(driver, "end", endElement, channel)
 	linkFloatPropertyToDriver(driver, "position", element, elementPositionPath)
 	driver.expression = "start * (1-position) + end * position"
-
+	
+def setCompactRigOnFlareElement(element, startElement, endElement, camera):
+	constraint = element.constraints.new(type = "COPY_ROTATION")
+	constraint.target = camera
+	for index, channel in enumerate(["LOC_X", "LOC_Y", "LOC_Z"]):
+		setPositionDriverOnFlareElementConstraint(element, startElement, endElement, "location", channel, index)
+	
 def newFlareElementPlane(image, element, flareControler, camera):
-	plane = newPlane(name = flareElementPrefix, size = 0.1)
+	plane = newPlane(name = flareElementPrefix, size = elementPlaneSize, shareMesh = True)
 	makePartOfFlareControler(plane, flareControler)
-	setCustomProperty(plane, planeWidthFactorName, image.size[0] / image.size[1])
+	setCustomProperty(plane, planeWidthFactorName, 1.0)
+	setCustomProperty(plane, colorMultiplyName, [1.0, 1.0, 1.0], min = 0.0, description = "Color the element image is multiplied with.")
 	makeOnlyVisibleToCamera(plane)
-	material = newCyclesFlareMaterial(image)
-	setMaterialOnObject(plane, material)
+	if image is not None: setImageOnElementPlane(plane, image)
+	setIntensityDriverOnElementPlane(plane, element, flareControler)
+	return plane
 	
+def setDriverRigOnElementPlane(plane, element, camera):
 	setParentWithoutInverse(plane, element)
 	setScaleConstraintOnElementPlane(plane, element, camera)
 	setTrackToCenterConstraintOnElementPlane(plane, element, camera)
 	limitXYRotationOnElementPlane(plane)
 	setLimitLocationConstraintOnElementPlane(plane, element, camera)
-	setIntensityDriverOnElementPlane(plane, element, flareControler)
 	setAdditionalRotationDriverOnElementPlane(plane, element)
 	
-	return plane
+def setCompactRigOnElementPlane(plane, element, camera):
+	setParentWithoutInverse(plane, element)
+	setCompactScaleDriversOnElementPlane(plane, element, camera)
+	setTrackToCenterConstraintOnElementPlane(plane, element, camera)
+	limitXYRotationOnElementPlane(plane)
+	setCompactLocationDriversOnElementPlane(plane, element, camera)
+	setAdditionalRotationDriverOnElementPlane(plane, element)
+	
+def setCompactScaleDriversOnElementPlane(plane, element, camera):
+	# scale with the distance of the plane itself, offsets move it away from the element
+	driver = newDriver(plane, "scale", index = 0)
+	linkDistanceToDriver(driver, "distance", plane, camera)
+	linkFloatPropertyToDriver(driver, "factor", plane, planeWidthFactorPath)
+	linkFloatPropertyToDriver(driver, "scale", element, scaleXPath)
+	driver.expression = "factor * scale * distance"
+	
+	driver = newDriver(plane, "scale", index = 1)
+	linkDistanceToDriver(driver, "distance", plane, camera)
+	linkFloatPropertyToDriver(driver, "scale", element, scaleYPath)
+	driver.expression = "scale * distance"
+	# the plane is flat, so its z scale does not need a driver
+	plane.scale[2] = 1.0
+	
+def setCompactLocationDriversOnElementPlane(plane, element, camera):
+	for index, offsetPath in enumerate([offsetXPath, offsetYPath, avoidArtefactsOffsetPath]):
+		driver = newDriver(plane, "location", index = index)
+		linkFloatPropertyToDriver(driver, "offset", element, offsetPath)
+		linkDistanceToDriver(driver, "distance", element, camera)
+		driver.expression = "offset*distance"
+	
+# image name -> material name
+flareMaterialPool = {}
+flareMaterialPoolIsBuilt = False
+
+def getFlareMaterial(image):
+	ensureFlareMaterialPool()
+	material = bpy.data.materials.get(flareMaterialPool.get(image.name, ""))
+	if material is None or material.get(flareImagePropertyName) != image.name:
+		material = newCyclesFlareMaterial(image)
+		flareMaterialPool[image.name] = material.name
+	return material
 	
+def ensureFlareMaterialPool():
+	global flareMaterialPoolIsBuilt
+	if flareMaterialPoolIsBuilt: return
+	for material in bpy.data.materials:
+		if flareImagePropertyName in material:
+			flareMaterialPool[material[flareImagePropertyName]] = material.name
+	flareMaterialPoolIsBuilt = True
+def resetFlareMaterialPool():
+	global flareMaterialPoolIsBuilt
+	flareMaterialPool.clear()
+	flareMaterialPoolIsBuilt = False
+
 def newCyclesFlareMaterial(image):
-	material = newCyclesMaterial()
+	material = newCyclesMaterial(name = flareMaterialPrefix + image.name)
 	cleanMaterial(material)
+	material[flareImagePropertyName] = image.name
 	
 	nodeTree = material.node_tree
 	textureCoordinatesNode = newTextureCoordinatesNode(nodeTree)
 	imageNode = newImageTextureNode(nodeTree)
-	colorRamp = newColorRampNode(nodeTree)
-	colorMultiply = newColorMixNode(nodeTree, type = "MULTIPLY", factor = 1.0, default2 = [1.0, 1.0, 1.0, 1.0])
-	emission = newEmissionNode(nodeTree)
-	transparent = newTransparentNode(nodeTree)
-	addShader = newAddShader(nodeTree)
+	shader = newGroupNode(nodeTree, getFlareShaderGroup())
 	output = newOutputNode(nodeTree)
 	
 	imageNode.image = image
 	imageNode.name = imageNodeName
-	colorMultiply.name = colorMultiplyNodeName
-	emission.name = emissionNodeName
 	
 	newNodeLink(nodeTree, textureCoordinatesNode.outputs["Generated"], imageNode.inputs[0])
-	newNodeLink(nodeTree, imageNode.outputs[0], colorRamp.inputs[0])
-	newNodeLink(nodeTree, colorRamp.outputs[0], colorMultiply.inputs[1])
-	newNodeLink(nodeTree, colorMultiply.outputs[0], emission.inputs[0])
-	linkToAddShader(nodeTree, emission.outputs[0], transparent.outputs[0], addShader)
-	newNodeLink(nodeTree, addShader.outputs[0], output.inputs[0])
+	newNodeLink(nodeTree, imageNode.outputs[0], shader.inputs[0])
+	newNodeLink(nodeTree, shader.outputs[0], output.inputs[0])
 	return material
 	
+def getFlareShaderGroup():
+	group = bpy.data.node_groups.get(flareShaderGroupName)
+	if group is None: group = newFlareShaderGroup()
+	elif intensityNodeName not in group.nodes: upgradeFlareShaderGroup(group)
+	return group
+def getFlareInstanceShaderGroup():
+	group = bpy.data.node_groups.get(flareInstanceShaderGroupName)
+	if group is None: group = newFlareShaderGroup(flareInstanceShaderGroupName, useInstanceColor = True)
+	return group
+	
+# element color comes from the object color and the intensity from the object index
+# instances get the complete color from the object color and their own intensity from a vertex color layer
+def newFlareShaderGroup(name = flareShaderGroupName, useInstanceColor = False):
+	group = newShaderNodeGroup(name)
+	group.inputs.new("NodeSocketColor", "Color")
+	group.outputs.new("NodeSocketShader", "Shader")
+	newFlareShaderNodes(group, useInstanceColor)
+	return group
+	
+def newFlareShaderNodes(group, useInstanceColor):
+	groupInput = newGroupInputNode(group)
+	colorRamp = newColorRampNode(group)
+	objectInfo = newObjectInfoNode(group)
+	colorMultiply = newColorMixNode(group, type = "MULTIPLY", factor = 1.0, default2 = [1.0, 1.0, 1.0, 1.0])
+	emission = newEmissionNode(group)
+	transparent = newTransparentNode(group)
+	addShader = newAddShader(group)
+	groupOutput = newGroupOutputNode(group)
+	
+	colorMultiply.name = colorMultiplyNodeName
+	emission.name = emissionNodeName
+	emission.inputs[1].default_value = 1.0
+	
+	newNodeLink(group, groupInput.outputs[0], colorRamp.inputs[0])
+	newNodeLink(group, colorRamp.outputs[0], colorMultiply.inputs[1])
+	if useInstanceColor:
+		attribute = newAttributeNode(group, instanceColorLayerName)
+		instanceMultiply = newColorMixNode(group, type = "MULTIPLY", factor = 1.0)
+		newNodeLink(group, objectInfo.outputs["Color"], instanceMultiply.inputs[1])
+		newNodeLink(group, attribute.outputs["Color"], instanceMultiply.inputs[2])
+		newNodeLink(group, instanceMultiply.outputs[0], colorMultiply.inputs[2])
+	else:
+		indexToIntensity = newMathNode(group, type = "DIVIDE", default = intensityIndexScale)
+		square = newMathNode(group, type = "POWER", default = 2.0)
+		intensityMultiply = newColorMixNode(group, type = "MULTIPLY", factor = 1.0)
+		intensityMultiply.name = intensityNodeName
+		newNodeLink(group, objectInfo.outputs["Object Index"], indexToIntensity.inputs[0])
+		newNodeLink(group, indexToIntensity.outputs[0], square.inputs[0])
+		newNodeLink(group, objectInfo.outputs["Color"], intensityMultiply.inputs[1])
+		newNodeLink(group, square.outputs[0], intensityMultiply.inputs[2])
+		newNodeLink(group, intensityMultiply.outputs[0], colorMultiply.inputs[2])
+	newNodeLink(group, colorMultiply.outputs[0], emission.inputs[0])
+	linkToAddShader(group, emission.outputs[0], transparent.outputs[0], addShader)
+	newNodeLink(group, addShader.outputs[0], groupOutput.inputs[0])
+	
+# files from before the intensity moved into the object index drive the three color channels
+def upgradeFlareShaderGroup(group):
+	removeNodes(group)
+	newFlareShaderNodes(group, useInstanceColor = False)
+	for flareControler in getAllFlares():
+		for element in getDataElementsFromFlare(flareControler):
+			plane = getPlaneFromElement(element)
+			if usesLegacyElementMaterial(plane): continue
+			if driverHasVariable(plane, "color", "objectIntensity"): setIntensityDriverOnElementPlane(plane, element, flareControler)
+			else: plane.pass_index = intensityIndexScale
+	
 def setScaleConstraintOnElementPlane(plane, element, camera):
 	constraint = plane.constraints.new(type = "LIMIT_SCALE")
 	constraintPath = getConstraintPath(constraint)
@@ -533,10 +770,35 @@ def setLimitLocationConstraintOnElementPlane(plane, element, camera):
 		driver.expression = "offset*distance"
 		
 def setIntensityDriverOnElementPlane(plane, element, flareControler):
-	driver = newDriver(getNodeWithNameInObject(plane, emissionNodeName).inputs[1], "default_value")
+	# one driver; the object color is the multiply color and the shader squares the intensity
+	if occlusionName not in flareControler: setOcclusionProperty(flareControler)
+	for index in range(3):
+		plane.driver_remove("color", index)
+	plane.color = list(plane[colorMultiplyName]) + [1.0]
+	plane.driver_remove("pass_index")
+	driver = newDriver(plane, "pass_index")
+	linkFloatPropertyToDriver(driver, "objectIntensity", element, intensityPath)
+	linkFloatPropertyToDriver(driver, "flareIntensity", flareControler, intensityPath)
+	linkFloatPropertyToDriver(driver, "occlusion", flareControler, occlusionPath)
+	driver.expression = str(intensityIndexScale) + " * objectIntensity * flareIntensity * occlusion + 0.5"
+	
+def getElementPlaneColor(plane):
+	if usesLegacyElementMaterial(plane): return list(plane.color[:3])
+	intensity = (plane.pass_index / intensityIndexScale) ** 2
+	return [value * intensity for value in plane.color[:3]]
+		
+def setLegacyIntensityDriverOnElementPlane(plane, element, flareControler):
+	if occlusionName not in flareControler: setOcclusionProperty(flareControler)
+	socket = getEmissionStrengthSocket(plane)
+	socket.driver_remove("default_value")
+	driver = newDriver(socket, "default_value")
 	linkFloatPropertyToDriver(driver, "objectIntensity", element, intensityPath)
 	linkFloatPropertyToDriver(driver, "flareIntensity", flareControler, intensityPath)
-	driver.expression = "(objectIntensity * flareIntensity)**2"
+	linkFloatPropertyToDriver(driver, "occlusion", flareControler, occlusionPath)
+	driver.expression = "(objectIntensity * flareIntensity * occlusion)**2"
+	
+def setOcclusionProperty(flareControler):
+	setCustomProperty(flareControler, occlusionName, 1.0, min = 0.0, max = 1.0, description = "Visibility of the target, keyed when baking occlusion.")
 	
 def setAdditionalRotationDriverOnElementPlane(plane, element):
 	driver = newDriver(plane, "rotation_euler", index = 2)
@@ -549,12 +811,12 @@ def setAdditionalRotationDriverOnElementPlane(plane, element):
 ################################
 
 def getAllFlares():
-	flareControlers = []
-	for object in bpy.data.objects:
-		if hasFlareControlerAttribute(object) or hasLinkToFlareControler(object):
-			flareControler = getCorrespondingFlareControler(object)
-			if flareControler not in flareControlers and flareControler is not None:
-				flareControlers.append(flareControler)
+	ensureFlareRegistry()
+	flareControlers = [bpy.data.objects.get(flareName) for flareName in flareRegistry]
+	if any(flareControler is None for flareControler in flareControlers):
+		# deleted or renamed, the rebuild finds renamed flares under their new name
+		rebuildFlareRegistry()
+		flareControlers = [bpy.data.objects.get(flareName) for flareName in flareRegistry]
 	return flareControlers
 
 def getSelectedFlares():
@@ -562,26 +824,22 @@ def getSelectedFlares():
 	selection = getSelectedObjects()
 	selection.append(getActive())
 	for object in selection:
-		if hasFlareControlerAttribute(object) or hasLinkToFlareControler(object):
-			flareControler = getCorrespondingFlareControler(object)
-			if flareControler not in flareControlers and flareControler is not None:
-				flareControlers.append(flareControler)
+		flareControler = getRegisteredFlareControler(object)
+		if flareControler not in flareControlers and flareControler is not None:
+			flareControlers.append(flareControler)
 	return flareControlers
 	
 def getSelectedFlareElementEmpties():	
 	flareElementEmpties = []
 	selection = getSelectedObjects()
 	for object in selection:
-		if hasFlareElementAttribute(object):
-			element = getCorrespondingElement(object)
-			if element not in flareElementEmpties and element is not None:
-				flareElementEmpties.append(element)
+		element = getRegisteredElement(object)
+		if element not in flareElementEmpties and element is not None:
+			flareElementEmpties.append(element)
 	return flareElementEmpties
 	
 def getDataElementsFromFlare(flareControler):
-	elementNamesContainer = getElementEmptyNamesContainer(flareControler)
-	elementEmpties = getObjectReferences(elementNamesContainer)
-	return elementEmpties
+	return getRegisteredElements(flareControler)
 	
 def getCameraFromFlareControler(flareControler):
 	return flareControler.parent
@@ -593,8 +851,7 @@ def getEndElement(flareControler):
 def getAngleCalculator(flareControler):
 	return bpy.data.objects[flareControler[angleNamePropertyName]]
 def getElementEmptyObjects(flareControler):
-	container = getElementEmptyNamesContainer(flareControler)
-	return getObjectReferences(container)
+	return getRegisteredElements(flareControler)
 def getElementEmptyNamesContainer(flareControler):
 	return bpy.data.objects[flareControler[elementNamesContainerPropertyName]]
 
@@ -633,27 +890,88 @@ def getImageFromElementEmpty(data):
 	plane = getPlaneFromElement(data)
 	node = getNodeWithNameInObject(plane, imageNodeName)
 	return node.image
+def getImageNameOfElementPlane(plane):
+	if imageNamePropertyName in plane: return plane[imageNamePropertyName]
+	return getElementImageName(getNodeWithNameInObject(plane, imageNodeName).image)
 	
 def setImagePathOnElementPlane(plane, imagePath):
-	image = getImage(imagePath)
-	getNodeWithNameInObject(plane, imageNodeName).image = image
+	# the atlas only holds images of the elements folder
+	isElementImage = os.path.normcase(os.path.dirname(os.path.abspath(imagePath))) == os.path.normcase(os.path.abspath(elementsFolder))
+	if isElementImage and useAtlasOnElementPlane(plane, os.path.basename(imagePath)): return
+	setAnyImageOnElementPlane(plane, getImage(imagePath))
+def setProceduralImageOnElementPlane(plane, spec, resolution):
+	if useAtlasOnElementPlane(plane, spec): return
+	setAnyImageOnElementPlane(plane, getProceduralImage(spec, resolution))
+	
+def useAtlasOnElementPlane(plane, imageName):
+	rect = getAtlasRect(imageName)
+	if rect is None or colorMultiplyName not in plane: return False
+	setAtlasOnElementPlane(plane, imageName, rect)
+	return True
+def setAnyImageOnElementPlane(plane, image):
+	if colorMultiplyName in plane: setImageOnElementPlane(plane, image)
+	else:
+		getNodeWithNameInObject(plane, imageNodeName).image = image
+		plane[planeWidthFactorName] = image.size[0] / image.size[1]
+	
+def setImageOnElementPlane(plane, image):
+	plane[imageNamePropertyName] = getElementImageName(image)
+	if hasPrefix(plane.data.name, atlasMeshPrefix): plane.data = getSharedPlaneMesh(elementPlaneSize)
+	setObjectLevelMaterial(plane, getFlareMaterial(image))
 	plane[planeWidthFactorName] = image.size[0] / image.size[1]
 	
 def setMultiplyColorOnElementPlane(plane, color):
-	getNodeWithNameInObject(plane, colorMultiplyNodeName).inputs[2].default_value = color
-	
+	if colorMultiplyName in plane:
+		plane[colorMultiplyName] = list(color[:3])
+		plane.color = list(color[:3]) + [1.0]
+	else: getNodeWithNameInObject(plane, colorMultiplyNodeName).inputs[2].default_value = color
+def getMultiplyColorOfElementPlane(plane):
+	if colorMultiplyName in plane: return list(plane[colorMultiplyName]) + [1.0]
+	return list(getNodeWithNameInObject(plane, colorMultiplyNodeName).inputs[2].default_value)
+	
+@profiled("deleteFlare")
 def deleteFlare(flareControler):
-	for object in bpy.data.objects:
-		if isPartOfFlareControler(object, flareControler) and object != flareControler:
-			delete(object)
-	delete(flareControler)
+	removeFlares([flareControler])
+	
+@profiled("deleteFlares")
+def deleteFlares(flareControlers):
+	removeFlares(flareControlers)
+	
+def removeFlares(flareControlers):
+	objects = []
+	for flareControler in flareControlers:
+		objects.extend(getRegisteredFlareMembers(flareControler))
+	flareNames = [flareControler.name for flareControler in flareControlers]
+	removeObjectsAndUnusedData(objects)
+	for flareName in flareNames:
+		unregisterFlare(flareName)
 	
 def deleteFlareElement(element):
 	flareControler = getCorrespondingFlareControler(element)
-	delete(getPlaneFromElement(element))
-	delete(element)
+	unregisterFlareElement(flareControler, element)
+	removeObjectsAndUnusedData([getPlaneFromElement(element), element])
 	cleanReferenceList(getElementEmptyNamesContainer(flareControler))
 	
+def removeObjectsAndUnusedData(objects):
+	(meshes, materials, images, actions) = (set(), set(), set(), set())
+	for object in objects:
+		if object.type == "MESH": meshes.add(object.data)
+		if object.animation_data is not None and object.animation_data.action is not None:
+			actions.add(object.animation_data.action)
+		for slot in object.material_slots:
+			if slot.material is not None: materials.add(slot.material)
+	for material in materials:
+		node = material.node_tree.nodes.get(imageNodeName) if material.node_tree is not None else None
+		if node is not None and node.image is not None: images.add(node.image)
+	
+	removeObjects(objects)
+	removeUnusedDatablocks(bpy.data.meshes, meshes)
+	removeUnusedDatablocks(bpy.data.actions, actions)
+	removeUnusedDatablocks(bpy.data.materials, materials)
+	removeUnusedDatablocks(bpy.data.images, images)
+	shaderGroup = bpy.data.node_groups.get(flareShaderGroupName)
+	if shaderGroup is not None: removeUnusedDatablocks(bpy.data.node_groups, [shaderGroup])
+	
 def duplicateFlareElement(element):
 	flareControler = getCorrespondingFlareControler(element)
 	elementData = FlareElementData.FromElement(element)
@@ -668,11 +986,50 @@ def duplicateLensFlare(flareControler):
 		elementDatas.append(FlareElementData.FromElement(element))
 	generateLensFlare(getActiveCamera(), getActive(), flareData, elementDatas)
 	
-def generateLensFlare(camera, target, flareData, elementDatas):
-	flareControler = newLensFlareFromData(camera, target, flareData)
+# batch creation
+
+isCreatingFlaresInBatch = False
+
+@profiled("newLensFlares")
+def newLensFlares(camera, targets, presetPath = None, engine = None):
+	global isCreatingFlaresInBatch
+	if presetPath is None: (flareData, elementDatas) = (None, [])
+	else: (flareData, elementDatas) = readLensFlareFile(presetPath)
+	if engine is None: engine = getDefaultFlareEngine()
+	setCurrentOffsetPropertyOnCamera(camera)
+	(center, directionCalculator) = (None, None)
+	if engine in rigEngines:
+		center = getCenterEmpty(camera)
+		directionCalculator = getCameraDirectionCalculator(camera)
+	
+	windowManager = bpy.context.window_manager
+	windowManager.progress_begin(0, len(targets))
+	isCreatingFlaresInBatch = True
+	flareControlers = []
+	try:
+		for index, target in enumerate(targets):
+			flareControler = newLensFlare(camera, target, engine, center, directionCalculator)
+			if flareData is not None: flareData.setDataOnFlareControler(flareControler)
+			for elementData in elementDatas:
+				newFlareElementFromData(flareControler, elementData)
+			flareControlers.append(flareControler)
+			windowManager.progress_update(index + 1)
+	finally:
+		isCreatingFlaresInBatch = False
+		windowManager.progress_end()
+	raiseTransparentBouncesForAllElements()
+	return flareControlers
+	
+def getPossibleFlareTargets(objects):
+	return [object for object in objects if not (isPartOfAnyFlareControler(object) or isCameraObject(object))]
+	
+def generateLensFlare(camera, target, flareData, elementDatas, engine = None):
+	flareControler = newLensFlareFromData(camera, target, flareData, engine)
 	for elementData in elementDatas:
 		newFlareElementFromData(flareControler, elementData)
+	return flareControler
 	
+@profiled("saveLensFlare")
 def saveLensFlare(flareControler, path):
 	flare = ET.Element("Flare")
 	flare.set("name", flareControler[flareNamePropertyName])
@@ -702,40 +1059,16 @@ def saveLensFlare(flareControler, path):
 	
 	ET.ElementTree(flare).write(path)	
 	
+@profiled("loadLensFlare")
 def loadLensFlare(path):
-	tree = ET.parse(path)
-	flareET = tree.getroot()
-	
-	flareData = LensFlareData()
-	flareData.name = getStringProperty(flareET, "name", "Lens Flare")
-	flareData.intensity = getFloatProperty(flareET, "intensity", 1.0)
-	
-	elementDatas = []
-	for elementET in flareET:
-		elementData = FlareElementData()
-		elementData.name = getStringProperty(elementET, "name", "Flare Element")
-		elementData.imageName = getStringProperty(elementET, "imageName", "circle.jpg")
-		elementData.position = getFloatProperty(elementET, "position", 0.0)
-		elementData.intensity = getFloatProperty(elementET, "intensity", 1.0)
-		elementData.rotation = getIntProperty(elementET, "rotation", 0)
-		elementData.centerRotation = getFloatProperty(elementET, "centerRotation", 0.0)
-		elementData.width = getFloatProperty(elementET, "width", 1.0)
-		elementData.height = getFloatProperty(elementET, "height", 1.0)
-		elementData.xOffset = getFloatProperty(elementET, "horizontal", 0.0)
-		elementData.yOffset = getFloatProperty(elementET, "vertical", 0.0)
-		
-		multiplyColorET = elementET.find("multiplyColor")
-		color = [1, 1, 1, 1]
-		color[0] = getFloatProperty(multiplyColorET, "red", 1.0)
-		color[1] = getFloatProperty(multiplyColorET, "green", 1.0)
-		color[2] = getFloatProperty(multiplyColorET, "blue", 1.0)
-		
-		elementData.color = color
-		
-		elementDatas.append(elementData)
-		
-
+	(flareData, elementDatas) = readLensFlareFile(path)
 	generateLensFlare(getActiveCamera(), getActive(), flareData, elementDatas)
+	
+def readLensFlareFile(path):
+	(flare, elements) = parsePresetFile(path)
+	flareData = LensFlareData(flare.name, flare.intensity)
+	elementDatas = [FlareElementData(**vars(element)) for element in elements]
+	return (flareData, elementDatas)
 
 def updateActiveFlareName():
 	flareControler = getCorrespondingFlareControler(getActive())
@@ -763,6 +1096,987 @@ def getActiveElement():
 	return None
 	
 	
+# flare registry
+##################################
+
+# flare controler name -> {"members": set of object names, "elements": ordered element empty names}
+flareRegistry = {}
+# object name -> flare controler name
+flareMemberRegistry = {}
+# object name -> element empty name
+elementMemberRegistry = {}
+flareRegistryIsBuilt = False
+# elements of all registered flares
+registeredElementCount = 0
+
+def ensureFlareRegistry():
+	if not flareRegistryIsBuilt: rebuildFlareRegistry()
+
+def rebuildFlareRegistry():
+	global flareRegistryIsBuilt
+	repairRenamedFlareControlers()
+	clearFlareRegistry()
+	flareRegistryIsBuilt = True
+	members = []
+	for object in bpy.data.objects:
+		if not hasFlareControlerAttribute(object): continue
+		if object[childOfFlarePropertyName] == object.name: newFlareRegistryEntry(object.name)
+		members.append(object)
+	for object in members:
+		flareName = object[childOfFlarePropertyName]
+		if flareName in flareRegistry: registerFlareMember(flareName, object.name)
+	for flareName in flareRegistry:
+		flareControler = bpy.data.objects[flareName]
+		container = bpy.data.objects.get(flareControler.get(elementNamesContainerPropertyName, ""))
+		if container is None: continue
+		for element in getObjectReferences(container):
+			plane = bpy.data.objects.get(element.get(elementPlainNamePropertyName, ""))
+			if plane is not None: registerFlareElement(flareControler, element, plane)
+			
+# members refer to their flare controler by name, so they have to follow a rename
+def repairRenamedFlareControlers():
+	global activeFlareName
+	newNames = {}
+	for object in bpy.data.objects:
+		if isRenamedFlareControler(object): newNames[object[childOfFlarePropertyName]] = object.name
+	if len(newNames) == 0: return
+	for object in bpy.data.objects:
+		for propertyName in (childOfFlarePropertyName, linkToFlareControlerPropertyName, instanceTemplatePropertyName):
+			if object.get(propertyName) in newNames: object[propertyName] = newNames[object[propertyName]]
+	activeFlareName = newNames.get(activeFlareName, activeFlareName)
+	
+def isRenamedFlareControler(object):
+	if elementNamesContainerPropertyName not in object or not hasFlareControlerAttribute(object): return False
+	oldName = object[childOfFlarePropertyName]
+	return oldName != object.name and bpy.data.objects.get(oldName) is None
+	
+def clearFlareRegistry():
+	global registeredElementCount
+	registeredElementCount = 0
+	changeFlareRegistryVersion()
+	flareRegistry.clear()
+	flareMemberRegistry.clear()
+	elementMemberRegistry.clear()
+	
+def newFlareRegistryEntry(flareName):
+	if flareName not in flareRegistry:
+		flareRegistry[flareName] = { "members" : set([flareName]), "elements" : [] }
+		flareMemberRegistry[flareName] = flareName
+		changeFlareRegistryVersion()
+	return flareRegistry[flareName]
+	
+def registerFlareMember(flareName, objectName):
+	newFlareRegistryEntry(flareName)["members"].add(objectName)
+	flareMemberRegistry[objectName] = flareName
+	
+def registerFlareHelpers(flareControler, helpers):
+	for helper in helpers:
+		registerFlareMember(flareControler.name, helper.name)
+	
+def registerFlareElement(flareControler, element, plane):
+	global registeredElementCount
+	entry = newFlareRegistryEntry(flareControler.name)
+	registerFlareMember(flareControler.name, element.name)
+	registerFlareMember(flareControler.name, plane.name)
+	if element.name not in entry["elements"]:
+		entry["elements"].append(element.name)
+		registeredElementCount += 1
+		changeFlareRegistryVersion()
+	elementMemberRegistry[element.name] = element.name
+	elementMemberRegistry[plane.name] = element.name
+	
+def unregisterFlareElement(flareControler, element):
+	global registeredElementCount
+	entry = flareRegistry.get(flareControler.name)
+	names = [element.name, element.get(elementPlainNamePropertyName, "")]
+	for name in names:
+		flareMemberRegistry.pop(name, None)
+		elementMemberRegistry.pop(name, None)
+		if entry is not None: entry["members"].discard(name)
+	if entry is not None and element.name in entry["elements"]:
+		entry["elements"].remove(element.name)
+		registeredElementCount -= 1
+	changeFlareRegistryVersion()
+	
+def unregisterFlare(flareName):
+	global registeredElementCount
+	entry = flareRegistry.pop(flareName, None)
+	if entry is None: return
+	registeredElementCount -= len(entry["elements"])
+	changeFlareRegistryVersion()
+	for name in entry["members"]:
+		flareMemberRegistry.pop(name, None)
+		elementMemberRegistry.pop(name, None)
+		
+# lets the interface lists know when flares or elements were added or removed
+flareRegistryVersion = 0
+
+def changeFlareRegistryVersion():
+	global flareRegistryVersion
+	flareRegistryVersion += 1
+	
+def getRegisteredFlareControler(object):
+	ensureFlareRegistry()
+	if object is None: return None
+	flareName = flareMemberRegistry.get(object.name)
+	if isRenamedFlareControler(object) or (flareName is not None and bpy.data.objects.get(flareName) is None):
+		rebuildFlareRegistry()
+		flareName = flareMemberRegistry.get(object.name)
+	if flareName is None: return None
+	return bpy.data.objects.get(flareName)
+	
+def getRegisteredElement(object):
+	ensureFlareRegistry()
+	if object is None: return None
+	elementName = elementMemberRegistry.get(object.name)
+	if elementName is None: return None
+	return bpy.data.objects.get(elementName)
+	
+def getRegisteredElements(flareControler):
+	ensureFlareRegistry()
+	entry = flareRegistry.get(flareControler.name)
+	if entry is None: return []
+	elements = []
+	for name in entry["elements"]:
+		element = bpy.data.objects.get(name)
+		if element is not None: elements.append(element)
+	return elements
+	
+def getRegisteredFlareMembers(flareControler):
+	ensureFlareRegistry()
+	entry = flareRegistry.get(flareControler.name)
+	if entry is None: return [flareControler]
+	members = []
+	for name in entry["members"]:
+		object = bpy.data.objects.get(name)
+		if object is not None: members.append(object)
+	return members
+	
+@persistent
+@profiled("rebuildIndicesHandler")
+def rebuildIndicesHandler(scene):
+	resetNameCounters()
+	resetImageCache()
+	resetFlareMaterialPool()
+	resetCameraHelperReferences()
+	rebuildFlareRegistry()
+	if flareShaderGroupName in bpy.data.node_groups: getFlareShaderGroup()
+
+	
+# handler engine
+##################################
+
+isUpdatingHandlerEngine = False
+
+# camera name -> names of its flares using the handler engine
+handlerEngineFlareNames = {}
+flareInstanceContainerNames = []
+# registry version the two caches above were built for
+handlerEngineCacheVersion = None
+
+def ensureHandlerEngineCache():
+	global handlerEngineCacheVersion
+	ensureFlareRegistry()
+	if handlerEngineCacheVersion == flareRegistryVersion: return
+	handlerEngineFlareNames.clear()
+	del flareInstanceContainerNames[:]
+	for flareControler in getAllFlares():
+		camera = getCameraFromFlareControler(flareControler)
+		if usesHandlerEngine(flareControler) and camera is not None:
+			handlerEngineFlareNames.setdefault(camera.name, []).append(flareControler.name)
+		container = getFlareInstancesContainer(flareControler)
+		if container is not None: flareInstanceContainerNames.append(container.name)
+	handlerEngineCacheVersion = flareRegistryVersion
+def resetHandlerEngineCache():
+	global handlerEngineCacheVersion
+	handlerEngineCacheVersion = None
+	
+def hasHandlerEngineUpdates():
+	ensureHandlerEngineCache()
+	return len(handlerEngineFlareNames) > 0 or len(flareInstanceContainerNames) > 0
+	
+def updateHandlerEngineFlares(onlyUpdated = False):
+	global isUpdatingHandlerEngine
+	if isUpdatingHandlerEngine: return
+	ensureHandlerEngineCache()
+	flaresByCamera = []
+	for cameraName, flareNames in handlerEngineFlareNames.items():
+		camera = bpy.data.objects.get(cameraName)
+		flareControlers = [flareControler for flareControler in map(bpy.data.objects.get, flareNames) if flareControler is not None]
+		if camera is None or len(flareControlers) == 0: continue
+		if onlyUpdated and not isAnyObjectUpdated(getHandlerEngineInputs(camera, flareControlers)): continue
+		flaresByCamera.append((camera, flareControlers))
+	isUpdatingHandlerEngine = True
+	try:
+		for camera, flareControlers in flaresByCamera:
+			updateHandlerEngineFlaresOfCamera(camera, flareControlers)
+	finally:
+		isUpdatingHandlerEngine = False
+		
+def getHandlerEngineInputs(camera, flareControlers):
+	yield camera
+	for flareControler in flareControlers:
+		yield getFlareTargetObject(flareControler)
+		for element in getDataElementsFromFlare(flareControler):
+			yield element
+			
+def isAnyObjectUpdated(objects):
+	return any(object.is_updated or object.is_updated_data for object in objects)
+		
+def updateHandlerEngineFlaresOfCamera(camera, flareControlers):
+	targetLocations = []
+	planes = []
+	rows = []
+	for flareIndex, flareControler in enumerate(flareControlers):
+		targetLocations.append(getFlareTargetLocation(flareControler))
+		for element in getDataElementsFromFlare(flareControler):
+			plane = getPlaneFromElement(element)
+			planes.append(plane)
+			rows.append((flareIndex, ) + getElementTransformRow(element, plane))
+	if len(rows) == 0: return
+	
+	cameraMatrix = numpy.array(camera.matrix_world)
+	data = numpy.array(rows, dtype = numpy.float64)
+	(locations, angles, scales) = computeElementTransforms(
+		cameraMatrix, getCenterDistance(camera), targetLocations,
+		flareIndices = data[:, 0].astype(numpy.int64),
+		positions = data[:, 1],
+		offsets = data[:, 2:5],
+		scales = data[:, 5:7],
+		widthFactors = data[:, 7],
+		rotations = data[:, 8],
+		centerInfluences = data[:, 9])
+	matrices = composePlaneMatrices(cameraMatrix, locations, angles, scales)
+	setChangedWorldMatrices(planes, matrices)
+	
+def getElementTransformRow(element, plane):
+	return (element[elementPositionName],
+			element[offsetXName], element[offsetYName], element[avoidArtefactsOffsetName],
+			element[scaleXName], element[scaleYName],
+			plane[planeWidthFactorName],
+			element[additionalRotationName],
+			element[trackToCenterInfluenceName])
+	
+def getFlareTargetLocation(flareControler):
+	return list(getFlareTargetObject(flareControler).matrix_world.translation)
+def getFlareTargetObject(flareControler):
+	targetEmpty = getTargetEmpty(flareControler)
+	target = targetEmpty.constraints[0].target if len(targetEmpty.constraints) > 0 else None
+	if target is None: target = targetEmpty
+	return target
+	
+def getCenterDistance(camera):
+	return max(getCameraFromObject(camera).dof_distance, 1)
+	
+def setChangedWorldMatrices(objects, matrices):
+	oldMatrices = numpy.array([numpy.array(object.matrix_world) for object in objects])
+	changed = numpy.abs(oldMatrices - matrices).max(axis = (1, 2)) > 1e-6
+	for index in numpy.nonzero(changed)[0]:
+		objects[index].matrix_world = mathutils.Matrix(matrices[index].tolist())
+		
+@persistent
+@profiled("handlerEngineFrameChangeHandler")
+def handlerEngineFrameChangeHandler(scene):
+	updateHandlerEngineFlares()
+	updateFlareInstances()
+	
+@persistent
+@profiled("handlerEngineSceneUpdateHandler")
+def handlerEngineSceneUpdateHandler(scene):
+	if not bpy.data.objects.is_updated or not hasHandlerEngineUpdates(): return
+	updateHandlerEngineFlares(onlyUpdated = True)
+	updateFlareInstances(onlyUpdated = True)
+
+	
+# instanced flares
+##################################
+
+# one mesh object per element of a template flare, with one quad per target
+
+# object name -> (coordinates, vertex colors) written last time
+instanceMeshDataCache = {}
+
+def newFlareInstances(templateFlare, targets):
+	container = getFlareInstancesContainer(templateFlare)
+	if container is None:
+		container = newEmpty(name = flareInstancesPrefix)
+		container.hide = True
+		makePartOfFlareControler(container, templateFlare)
+		setCustomProperty(container, instanceTemplatePropertyName, templateFlare.name)
+		setCustomProperty(templateFlare, instancesContainerPropertyName, container.name)
+		registerFlareHelpers(templateFlare, [container])
+		resetHandlerEngineCache()
+	knownNames = set(target.name for target in getObjectReferences(container))
+	for target in targets:
+		if target.name in knownNames or isPartOfAnyFlareControler(target): continue
+		appendObjectReference(container, target)
+		knownNames.add(target.name)
+	syncFlareInstanceObjects(templateFlare, container)
+	updateFlareInstancesOfContainer(container)
+	return container
+	
+def getFlareInstancesContainer(flareControler):
+	return bpy.data.objects.get(flareControler.get(instancesContainerPropertyName, ""))
+	
+def syncFlareInstanceObjects(templateFlare, container):
+	amount = len(getObjectReferences(container))
+	oldObjectNames = dict(container.get(instanceObjectsPropertyName, {}))
+	objectNames = {}
+	for element in getDataElementsFromFlare(templateFlare):
+		plane = getPlaneFromElement(element)
+		object = bpy.data.objects.get(oldObjectNames.get(element.name, ""))
+		if object is None: object = newFlareInstanceObject(templateFlare)
+		if len(object.data.vertices) != 4 * amount: setFlareInstanceMesh(object, plane, amount)
+		setObjectLevelMaterial(object, getInstancedFlareMaterial(plane.material_slots[0].material))
+		objectNames[element.name] = object.name
+	unused = [bpy.data.objects[name] for elementName, name in oldObjectNames.items() if elementName not in objectNames and name in bpy.data.objects]
+	removeObjectsAndUnusedData(unused)
+	container[instanceObjectsPropertyName] = objectNames
+	
+def newFlareInstanceObject(templateFlare):
+	object = newObject(name = flareInstancePrefix, data = newQuadsMesh(flareInstancePrefix, 0))
+	makePartOfFlareControler(object, templateFlare)
+	makeOnlyVisibleToCamera(object)
+	registerFlareHelpers(templateFlare, [object])
+	return object
+	
+def setFlareInstanceMesh(object, plane, amount):
+	oldMesh = object.data
+	mesh = newQuadsMesh(flareInstancePrefix, amount)
+	mesh.uv_textures.new()
+	mesh.uv_layers.active.data.foreach_set("uv", getPlaneMeshUVs(plane.data) * amount)
+	mesh.vertex_colors.new(name = instanceColorLayerName)
+	object.data = mesh
+	instanceMeshDataCache.pop(object.name, None)
+	if oldMesh.users == 0: bpy.data.meshes.remove(oldMesh)
+	
+def getPlaneMeshUVs(mesh):
+	if len(mesh.uv_layers) == 0: return [0, 0, 1, 0, 1, 1, 0, 1]
+	uvs = [0.0] * (2 * len(mesh.loops))
+	mesh.uv_layers.active.data.foreach_get("uv", uvs)
+	return uvs
+	
+def getInstancedFlareMaterial(material):
+	# a copy of the element material that reads generated coordinates from the uv map instead
+	instancedMaterial = bpy.data.materials.get(flareInstanceMaterialPrefix + material.name)
+	if instancedMaterial is not None: return instancedMaterial
+	instancedMaterial = material.copy()
+	instancedMaterial.name = flareInstanceMaterialPrefix + material.name
+	if flareImagePropertyName in instancedMaterial: del instancedMaterial[flareImagePropertyName]
+	nodeTree = instancedMaterial.node_tree
+	for node in nodeTree.nodes:
+		if node.type == "GROUP": node.node_tree = getFlareInstanceShaderGroup()
+		if node.type == "TEX_COORD" and node.outputs["Generated"].is_linked:
+			newNodeLink(nodeTree, node.outputs["UV"], nodeTree.nodes[imageNodeName].inputs[0])
+	return instancedMaterial
+	
+def updateFlareInstances(onlyUpdated = False):
+	ensureHandlerEngineCache()
+	for container in map(bpy.data.objects.get, flareInstanceContainerNames):
+		if container is None: continue
+		if onlyUpdated and not isAnyObjectUpdated(getFlareInstancesInputs(container)): continue
+		updateFlareInstancesOfContainer(container)
+		
+def getFlareInstancesInputs(container):
+	templateFlare = bpy.data.objects.get(container[instanceTemplatePropertyName])
+	if templateFlare is None: return
+	yield container
+	camera = getCameraFromFlareControler(templateFlare)
+	if camera is not None: yield camera
+	for target in getObjectReferences(container):
+		yield target
+	for element in getDataElementsFromFlare(templateFlare):
+		yield element
+	
+def updateFlareInstancesOfContainer(container):
+	templateFlare = bpy.data.objects[container[instanceTemplatePropertyName]]
+	camera = getCameraFromFlareControler(templateFlare)
+	targets = getObjectReferences(container)
+	(objects, planes, rows) = getFlareInstanceObjects(templateFlare, container)
+	if any(object is None or len(object.data.vertices) != 4 * len(targets) for object in objects):
+		# elements or targets were added or removed since the last update
+		syncFlareInstanceObjects(templateFlare, container)
+		(objects, planes, rows) = getFlareInstanceObjects(templateFlare, container)
+	if len(rows) == 0 or len(targets) == 0 or camera is None: return
+	
+	cameraMatrix = numpy.array(camera.matrix_world)
+	targetLocations = numpy.array([list(target.matrix_world.translation) for target in targets])
+	data = numpy.repeat(numpy.array(rows, dtype = numpy.float64), len(targets), axis = 0)
+	(locations, angles, scales) = computeElementTransforms(
+		cameraMatrix, getCenterDistance(camera), targetLocations,
+		flareIndices = numpy.tile(numpy.arange(len(targets)), len(rows)),
+		positions = data[:, 0],
+		offsets = data[:, 1:4],
+		scales = data[:, 4:6],
+		widthFactors = data[:, 6],
+		rotations = data[:, 7],
+		centerInfluences = data[:, 8])
+	matrices = composePlaneMatrices(cameraMatrix, locations, angles, scales)
+	corners = numpy.repeat(numpy.array([getMeshCoordinates(plane.data) for plane in planes]), len(targets), axis = 0)
+	coordinates = numpy.einsum("eij,ekj->eki", matrices[:, :3, :3], corners) + matrices[:, None, :3, 3]
+	coordinates = coordinates.reshape(len(objects), -1)
+	
+	# vertex colors are stored with 8 bits, so the brightest instance is moved into the object color
+	intensities = getInstanceIntensities(cameraMatrix, targets, targetLocations)
+	maxIntensity = max(intensities.max(), 1e-6)
+	vertexColors = numpy.repeat(intensities / maxIntensity, 12)
+	for object, plane, objectCoordinates in zip(objects, planes, coordinates):
+		setChangedInstanceMeshData(object, objectCoordinates, vertexColors)
+		color = [value * maxIntensity for value in getElementPlaneColor(plane)]
+		if max(abs(a - b) for a, b in zip(object.color[:3], color)) > 1e-6: object.color[:3] = color
+		
+def getFlareInstanceObjects(templateFlare, container):
+	objectNames = container.get(instanceObjectsPropertyName, {})
+	(objects, planes, rows) = ([], [], [])
+	for element in getDataElementsFromFlare(templateFlare):
+		plane = getPlaneFromElement(element)
+		objects.append(bpy.data.objects.get(objectNames.get(element.name, "")))
+		planes.append(plane)
+		rows.append(getElementTransformRow(element, plane))
+	return (objects, planes, rows)
+		
+def getInstanceIntensities(cameraMatrix, targets, targetLocations):
+	intensities = numpy.array([target.get(instanceIntensityName, 1.0) for target in targets], dtype = numpy.float64) ** 2
+	forward = -getCameraRotation(cameraMatrix)[:, 2]
+	inFront = (targetLocations - getCameraLocation(cameraMatrix)).dot(forward) > 0
+	return intensities * inFront
+	
+def getMeshCoordinates(mesh):
+	coordinates = [0.0] * (3 * len(mesh.vertices))
+	mesh.vertices.foreach_get("co", coordinates)
+	return numpy.array(coordinates).reshape(-1, 3)
+	
+def setChangedInstanceMeshData(object, coordinates, vertexColors):
+	cached = instanceMeshDataCache.get(object.name)
+	if cached is not None and numpy.allclose(cached[0], coordinates, atol = 1e-7) and numpy.allclose(cached[1], vertexColors, atol = 1e-4): return
+	mesh = object.data
+	mesh.vertices.foreach_set("co", coordinates.tolist())
+	mesh.vertex_colors[instanceColorLayerName].data.foreach_set("color", vertexColors.tolist())
+	mesh.update()
+	instanceMeshDataCache[object.name] = (coordinates, vertexColors)
+	
+	
+# bake
+##################################
+
+def bakeLensFlares(flareControlers, frameStart, frameEnd, removeRig = True):
+	scene = bpy.context.scene
+	frameBefore = scene.frame_current
+	frames = list(range(frameStart, frameEnd + 1))
+	planes = []
+	for flareControler in flareControlers:
+		for element in getDataElementsFromFlare(flareControler):
+			planes.append(getPlaneFromElement(element))
+	if len(planes) == 0 or len(frames) == 0: return
+	
+	# per plane and frame: location, rotation, scale, color, emission strength of older planes
+	samples = numpy.zeros((len(planes), len(frames), 13))
+	eulers = [None] * len(planes)
+	for frameIndex, frame in enumerate(frames):
+		scene.frame_set(frame)
+		for planeIndex, plane in enumerate(planes):
+			(location, rotation, scale) = plane.matrix_world.decompose()
+			euler = rotation.to_euler("XYZ") if eulers[planeIndex] is None else rotation.to_euler("XYZ", eulers[planeIndex])
+			eulers[planeIndex] = euler
+			strength = getEmissionStrengthSocket(plane).default_value if usesLegacyElementMaterial(plane) else 0.0
+			samples[planeIndex, frameIndex] = list(location) + list(euler) + list(scale) + getElementPlaneColor(plane) + [strength]
+	scene.frame_set(frameBefore)
+	
+	for plane, planeSamples in zip(planes, samples):
+		setBakedKeyframesOnElementPlane(plane, frames, planeSamples)
+	for flareControler in flareControlers:
+		if removeRig: removeFlareRig(flareControler)
+		flareControler[engineName] = bakedEngine
+	resetHandlerEngineCache()
+	if removeRig: removeUnusedCameraHelpers([getCameraFromFlareControler(flareControler) for flareControler in flareControlers])
+		
+def setBakedKeyframesOnElementPlane(plane, frames, samples):
+	removeAllDrivers(plane)
+	deleteConstraintsOfTypes(plane, rigConstraintTypes)
+	clearParentKeepTransform(plane)
+	plane.rotation_mode = "XYZ"
+	
+	insertKeyframesInBulk(plane, "location", frames, samples[:, 0:3].T.tolist())
+	insertKeyframesInBulk(plane, "rotation_euler", frames, samples[:, 3:6].T.tolist())
+	insertKeyframesInBulk(plane, "scale", frames, samples[:, 6:9].T.tolist())
+	if usesLegacyElementMaterial(plane):
+		socket = getEmissionStrengthSocket(plane)
+		socket.driver_remove("default_value")
+		newFCurveWithKeyframes(socket.id_data, socket.path_from_id("default_value"), 0, frames, samples[:, 12].tolist())
+	else:
+		# the keyed color already contains the intensity
+		plane.pass_index = intensityIndexScale
+		insertKeyframesInBulk(plane, "color", frames, samples[:, 9:12].T.tolist())
+	
+# planes created before the shared flare shader have their own material with a driven emission strength
+def usesLegacyElementMaterial(plane):
+	return colorMultiplyName not in plane
+def getEmissionStrengthSocket(plane):
+	return getNodeWithNameInObject(plane, emissionNodeName).inputs[1]
+	
+# the center and direction calculator of a camera keep their drivers as long as they exist
+def removeUnusedCameraHelpers(cameras):
+	usedCameraNames = set()
+	for flareControler in getAllFlares():
+		camera = getCameraFromFlareControler(flareControler)
+		if usesDriverRig(flareControler) and camera is not None: usedCameraNames.add(camera.name)
+	camerasByName = { camera.name : camera for camera in cameras if camera is not None }
+	for cameraName, camera in camerasByName.items():
+		if cameraName in usedCameraNames: continue
+		for propertyName, prefix in ((centerEmptyPropertyName, cameraCenterPrefix), (directionCalculatorPropertyName, cameraDirectionCalculatorPrefix)):
+			helper = getCameraHelper(camera, propertyName, prefix)
+			if helper is not None: removeObjects([helper])
+			if propertyName in camera: del camera[propertyName]
+			
+def removeFlareRig(flareControler):
+	for object in getRegisteredFlareMembers(flareControler):
+		removeRigFromObject(object)
+
+	
+# occlusion
+##################################
+
+def bakeLensFlareOcclusion(flareControlers, frameStart, frameEnd, radius = 0.0, samples = 1):
+	scene = bpy.context.scene
+	frameBefore = scene.frame_current
+	frames = list(range(frameStart, frameEnd + 1))
+	if len(flareControlers) == 0 or len(frames) == 0: return
+	for flareControler in flareControlers:
+		linkOcclusionToElementPlanes(flareControler)
+	
+	targets = [getFlareTargetObject(flareControler) for flareControler in flareControlers]
+	cameras = [getCameraFromFlareControler(flareControler) for flareControler in flareControlers]
+	excluded = set(object.name for object in targets)
+	visibilities = numpy.zeros((len(flareControlers), len(frames)))
+	for frameIndex, frame in enumerate(frames):
+		scene.frame_set(frame)
+		bvh = BVH(getOccluderTriangles(scene, excluded))
+		origins = [camera.matrix_world.translation for camera in cameras]
+		locations = [target.matrix_world.translation for target in targets]
+		visibleFractions = computeVisibleFractions(bvh, origins, locations, radius, samples)
+		for flareIndex, flareControler in enumerate(flareControlers):
+			visibilities[flareIndex, frameIndex] = visibleFractions[flareIndex]
+	scene.frame_set(frameBefore)
+	
+	# keyed on its own property so the animated intensity stays untouched
+	for flareControler, flareVisibilities in zip(flareControlers, visibilities):
+		newFCurveWithKeyframes(flareControler, occlusionPath, 0, frames, flareVisibilities.tolist())
+		
+def linkOcclusionToElementPlanes(flareControler):
+	# planes of flares created before the occlusion property don't read it yet
+	for element in getDataElementsFromFlare(flareControler):
+		plane = getPlaneFromElement(element)
+		if usesLegacyElementMaterial(plane):
+			socket = getEmissionStrengthSocket(plane)
+			if not driverHasVariable(socket.id_data, socket.path_from_id("default_value"), "occlusion"):
+				setLegacyIntensityDriverOnElementPlane(plane, element, flareControler)
+		elif not driverHasVariable(plane, "pass_index", "occlusion"):
+			setIntensityDriverOnElementPlane(plane, element, flareControler)
+			
+def driverHasVariable(id, dataPath, variableName):
+	if id.animation_data is None: return False
+	for fcurve in id.animation_data.drivers:
+		if fcurve.data_path == dataPath and any(variable.name == variableName for variable in fcurve.driver.variables): return True
+	return False
+		
+def getOccluderTriangles(scene, excludedNames):
+	triangles = [numpy.zeros((0, 3, 3))]
+	for object in scene.objects:
+		if object.type != "MESH" or object.hide_render or not object.is_visible(scene): continue
+		if object.name in excludedNames or isPartOfAnyFlareControler(object): continue
+		triangles.append(getObjectTriangles(object, scene))
+	return numpy.concatenate(triangles)
+	
+def getObjectTriangles(object, scene):
+	mesh = object.to_mesh(scene, True, "RENDER")
+	mesh.calc_tessface()
+	vertices = numpy.zeros(len(mesh.vertices) * 3, dtype = numpy.float32)
+	faces = numpy.zeros(len(mesh.tessfaces) * 4, dtype = numpy.int32)
+	mesh.vertices.foreach_get("co", vertices)
+	mesh.tessfaces.foreach_get("vertices_raw", faces)
+	bpy.data.meshes.remove(mesh)
+	return trianglesFromFaces(transformPoints(object.matrix_world, vertices.reshape(-1, 3)), faces)
+	
+	
+# culling
+##################################
+
+def cullLensFlares(flareControlers, frameStart, frameEnd, margin = 0.1, targetMargin = 1.0, hideInViewport = True):
+	# returns (hidden element frames, all element frames)
+	frames = list(range(frameStart, frameEnd + 1))
+	(planes, planeFlareIndices, cameraMatrices, frameBounds, targetLocations, planeCorners) = sampleFlareScreenData(flareControlers, frames)
+	if len(planes) == 0 or len(frames) == 0: return (0, 0)
+	flareIndices = numpy.array(planeFlareIndices, dtype = numpy.int64)
+	
+	(targetCoordinates, targetDepths) = getFrameCoordinates(toCameraSpace(cameraMatrices, targetLocations), frameBounds)
+	targetVisible = isPointVisible(targetCoordinates[..., 0, :], targetDepths[..., 0], targetMargin)
+	(coordinates, depths) = getFrameCoordinates(toCameraSpace(cameraMatrices[:, flareIndices], planeCorners), frameBounds[:, flareIndices])
+	(rects, inFront) = getScreenRectangles(coordinates, depths)
+	visible = isRectangleVisible(rects, inFront, margin) & targetVisible[:, flareIndices]
+	
+	# the projection only holds for perspective cameras
+	orthographic = numpy.array([getCameraFromFlareControler(flareControler).data.type != "PERSP" for flareControler in flareControlers])
+	visible |= orthographic[flareIndices]
+	
+	for planeIndex, plane in enumerate(planes):
+		setVisibilityKeyframes(plane, frames, visible[:, planeIndex], hideInViewport)
+	return (int((~visible).sum()), visible.size)
+	
+def sampleFlareScreenData(flareControlers, frames):
+	# per frame and flare: camera matrix, frame bounds, target location; per frame and plane: bounding box corners
+	scene = bpy.context.scene
+	frameBefore = scene.frame_current
+	cameras = [getCameraFromFlareControler(flareControler) for flareControler in flareControlers]
+	targets = [getFlareTargetObject(flareControler) for flareControler in flareControlers]
+	(planes, planeFlareIndices) = ([], [])
+	for flareIndex, flareControler in enumerate(flareControlers):
+		for element in getDataElementsFromFlare(flareControler):
+			planes.append(getPlaneFromElement(element))
+			planeFlareIndices.append(flareIndex)
+	localCorners = [numpy.array([list(corner) for corner in plane.bound_box]) for plane in planes]
+	
+	cameraMatrices = numpy.zeros((len(frames), len(cameras), 4, 4))
+	frameBounds = numpy.zeros((len(frames), len(cameras), 4))
+	targetLocations = numpy.zeros((len(frames), len(cameras), 1, 3))
+	planeCorners = numpy.zeros((len(frames), len(planes), 8, 3))
+	for frameIndex, frame in enumerate(frames):
+		scene.frame_set(frame)
+		for flareIndex, (camera, target) in enumerate(zip(cameras, targets)):
+			cameraMatrices[frameIndex, flareIndex] = camera.matrix_world
+			frameBounds[frameIndex, flareIndex] = getCameraFrameBounds(camera, scene)
+			targetLocations[frameIndex, flareIndex, 0] = target.matrix_world.translation
+		for planeIndex, plane in enumerate(planes):
+			planeCorners[frameIndex, planeIndex] = transformPoints(plane.matrix_world, localCorners[planeIndex])
+	scene.frame_set(frameBefore)
+	return (planes, planeFlareIndices, cameraMatrices, frameBounds, targetLocations, planeCorners)
+	
+def getCameraFrameBounds(camera, scene):
+	corners = camera.data.view_frame(scene = scene)
+	xs = [corner.x / -corner.z for corner in corners]
+	ys = [corner.y / -corner.z for corner in corners]
+	return (min(xs), max(xs), min(ys), max(ys))
+	
+def setVisibilityKeyframes(object, frames, visible, hideInViewport = True):
+	# the hide state from before the first culling is kept, so culling again starts from the user's state
+	hideStates = dict(object.get(hideBeforeCullingName, {}))
+	for dataPath in ["hide_render", "hide"]:
+		if dataPath in hideStates:
+			if hasAnimationData(object): removeFCurve(object.animation_data.action, dataPath, 0)
+			setattr(object, dataPath, bool(hideStates[dataPath]))
+		elif len(getFCurvesWithDataPath(object, dataPath)) > 0: continue
+		else: hideStates[dataPath] = int(getattr(object, dataPath))
+		if dataPath == "hide" and not hideInViewport:
+			del hideStates[dataPath]
+			continue
+		if hideStates[dataPath]: continue
+		keyframes = getVisibilityKeyframes(frames, visible)
+		if len(keyframes) == 0: continue
+		fcurve = newFCurveWithKeyframes(object, dataPath, 0, [frame for frame, hidden in keyframes], [float(hidden) for frame, hidden in keyframes])
+		setFCurveInterpolation(fcurve, "CONSTANT")
+	object[hideBeforeCullingName] = hideStates
+	
+	
+# transparent bounces
+##################################
+
+def raiseTransparentBouncesForAllElements():
+	# worst case until the budget is analyzed: every element in front of every other
+	ensureFlareRegistry()
+	amount = min(registeredElementCount + transparentBounceMargin, maxTransparentBounces)
+	if amount > getMaxTransparentBounces(): setMinMaxTransparentBounces(amount)
+	
+def analyzeTransparentBounces(frameStart, frameEnd):
+	# returns the most element planes that are stacked on one pixel in any frame
+	flareControlers = getAllFlares()
+	frames = list(range(frameStart, frameEnd + 1))
+	(planes, planeFlareIndices, cameraMatrices, frameBounds, targetLocations, planeCorners) = sampleFlareScreenData(flareControlers, frames)
+	if len(planes) == 0 or len(frames) == 0: return 0
+	flareIndices = numpy.array(planeFlareIndices, dtype = numpy.int64)
+	
+	(coordinates, depths) = getFrameCoordinates(toCameraSpace(cameraMatrices[:, flareIndices], planeCorners), frameBounds[:, flareIndices])
+	(rects, inFront) = getScreenRectangles(coordinates, depths)
+	visible = isRectangleVisible(rects, inFront) & ~getHiddenPlaneFrames(planes, frames)
+	# only planes seen by the camera of the scene stack up in the render
+	visible &= numpy.array([getCameraFromFlareControler(flareControler) == bpy.context.scene.camera for flareControler in flareControlers])[flareIndices]
+	return int(computeMaxOverlaps(rects, visible).max())
+	
+def getHiddenPlaneFrames(planes, frames):
+	hidden = numpy.zeros((len(frames), len(planes)), dtype = bool)
+	for planeIndex, plane in enumerate(planes):
+		if plane.animation_data is None or plane.animation_data.action is None:
+			hidden[:, planeIndex] = plane.hide_render
+			continue
+		fcurve = plane.animation_data.action.fcurves.find("hide_render", 0)
+		if fcurve is None: hidden[:, planeIndex] = plane.hide_render
+		else: hidden[:, planeIndex] = [fcurve.evaluate(frame) > 0.5 for frame in frames]
+	return hidden
+	
+def setAnalyzedTransparentBounces(frameStart, frameEnd, margin = transparentBounceMargin):
+	# returns (bounces before, bounces after)
+	before = getMaxTransparentBounces()
+	after = analyzeTransparentBounces(frameStart, frameEnd) + margin
+	setMinMaxTransparentBounces(after)
+	return (before, after)
+	
+	
+# compact rig
+##################################
+
+def convertFlareToCompactRig(flareControler):
+	if not usesDriverEngine(flareControler): return False
+	flareControler[engineName] = compactEngine
+	camera = getCameraFromFlareControler(flareControler)
+	startElement = getStartElement(flareControler)
+	endElement = getEndElement(flareControler)
+	
+	removeRigFromObject(startElement)
+	clearParentKeepTransform(startElement)
+	setCompactStartLocationDrivers(startElement, camera, flareControler, getStartDistanceCalculator(flareControler))
+	
+	removeRigFromObject(endElement)
+	clearParentKeepTransform(endElement)
+	setCompactEndLocationDrivers(endElement, startElement, getCenterEmpty(camera))
+	
+	for element in getDataElementsFromFlare(flareControler):
+		plane = getPlaneFromElement(element)
+		removeRigFromObject(element)
+		clearParentKeepTransform(element)
+		setCompactRigOnFlareElement(element, startElement, endElement, camera)
+		removeRigFromObject(plane)
+		setCompactRigOnElementPlane(plane, element, camera)
+		# older planes keep their intensity driver on the material
+		if not usesLegacyElementMaterial(plane): setIntensityDriverOnElementPlane(plane, element, flareControler)
+	return True
+	
+def removeRigFromObject(object):
+	removeAllDrivers(object)
+	deleteConstraintsOfTypes(object, rigConstraintTypes)
+	
+def getStartDistanceCalculator(flareControler):
+	startDistanceCalculator = bpy.data.objects.get(flareControler.get(startDistanceNamePropertyName, ""))
+	if startDistanceCalculator is not None: return startDistanceCalculator
+	for object in getRegisteredFlareMembers(flareControler):
+		if hasPrefix(object.name, startDistanceCalculatorPrefix):
+			setCustomProperty(flareControler, startDistanceNamePropertyName, object.name)
+			return object
+	return None
+
+	
+# preview
+##################################
+
+def renderLensFlarePreview(path, lightPosition = (0.4, 0.3), width = 256, height = 256):
+	(flareData, elementDatas) = readLensFlareFile(path)
+	return renderFlare(flareData, elementDatas, lightPosition, getElementPreviewPixels, width, height)
+	
+def getElementPreviewPixels(elementData):
+	if isProceduralSpec(elementData.imageName): return getProceduralTexture(elementData.imageName, previewTextureResolution)
+	path = os.path.join(elementsFolder, elementData.imageName)
+	try: return loadImagePixels(path)
+	except ImportError: return getImagePixels(getImage(path))
+	
+def showLensFlarePreview(pixels):
+	return setPixelsOnImage(previewImageName, pixels)
+	
+def setPixelsOnImage(name, pixels):
+	(height, width) = pixels.shape[:2]
+	image = bpy.data.images.get(name)
+	if image is None: image = bpy.data.images.new(name, width, height, float_buffer = True)
+	elif tuple(image.size) != (width, height): image.scale(width, height)
+	rgba = numpy.ones((height, width, 4), dtype = numpy.float32)
+	rgba[..., :3] = pixels[::-1]
+	image.pixels = rgba.ravel().tolist()
+	return image
+	
+def packAsOpenEXR(image):
+	# packing as png would cut the float pixels to 8 bit
+	path = os.path.join(bpy.app.tempdir, hashlib.sha1(image.name.encode()).hexdigest() + ".exr")
+	image.filepath_raw = path
+	image.file_format = "OPEN_EXR"
+	image.save()
+	image.pack()
+	os.remove(path)
+	
+# preset thumbnails
+
+presetPreviews = None
+presetPreviewItems = []
+presetPreviewsAreListed = False
+
+def getPresetPreviewItems(self, context):
+	return presetPreviewItems
+	
+def updatePresetPreviewItems():
+	global presetPreviewsAreListed
+	items = []
+	jobs = getThumbnailJobs(getPresetIndex(), getFilteredPresetPaths(), elementsFolder, thumbnailsFolder)
+	for index, (presetPath, thumbnailPath, outdated) in enumerate(jobs):
+		icon = 0 if outdated else getPresetPreview(thumbnailPath).icon_id
+		items.append((presetPath, getFileName(presetPath), presetPath, icon, index))
+	presetPreviewItems[:] = items
+	presetPreviewsAreListed = True
+	
+def getFilteredPresetPaths():
+	windowManager = bpy.context.window_manager
+	return queryPresets(getPresetIndex(),
+		imageName = windowManager.lens_flare_preset_image,
+		minElements = windowManager.lens_flare_preset_min_elements,
+		name = windowManager.lens_flare_preset_name)
+		
+def updatePresetFilter(self, context):
+	updatePresetPreviewItems()
+	
+# preset index
+
+presetIndex = None
+
+def getPresetIndex():
+	global presetIndex
+	if presetIndex is None:
+		presetIndex = openPresetIndex(presetIndexPath)
+		updatePresetIndex(presetIndex, presetsFolder)
+	return presetIndex
+	
+def rescanPresetIndex():
+	return updatePresetIndex(getPresetIndex(), presetsFolder)
+	
+def closePresetIndex():
+	global presetIndex
+	if presetIndex is not None: presetIndex.close()
+	presetIndex = None
+	
+def getPresetPreview(thumbnailPath):
+	if thumbnailPath in presetPreviews: return presetPreviews[thumbnailPath]
+	return presetPreviews.load(thumbnailPath, thumbnailPath, "IMAGE")
+	
+def getOutdatedThumbnailJobs():
+	jobs = getThumbnailJobs(getPresetIndex(), getFilteredPresetPaths(), elementsFolder, thumbnailsFolder)
+	return [(presetPath, thumbnailPath) for presetPath, thumbnailPath, outdated in jobs if outdated]
+	
+def decodeElementImagesForWorkers(presetPaths):
+	# only images that were never decoded before cost time here
+	for imagePath in getUndecodedElementPaths(presetPaths, elementsFolder, decodedElementsFolder):
+		writeDecodedElement(decodedElementsFolder, imagePath, getImagePixels(getImage(imagePath)))
+		
+def newThumbnailExecutor():
+	import multiprocessing, concurrent.futures
+	multiprocessing.set_executable(bpy.app.binary_path_python)
+	return concurrent.futures.ProcessPoolExecutor()
+
+	
+# procedural element images
+##################################
+
+def getProceduralImage(spec, resolution = previewTextureResolution):
+	# only grows, so elements that share the spec never lose detail
+	name = getProceduralImageName(spec)
+	image = bpy.data.images.get(name)
+	if image is None or image.size[0] < resolution:
+		image = setPixelsOnImage(name, getProceduralTexture(spec, resolution))
+		image[proceduralSpecPropertyName] = spec
+		packAsOpenEXR(image)
+	return image
+	
+def getProceduralImageName(spec):
+	# blender cuts longer names, so they would no longer find their image
+	if len(spec) <= maxIDNameLength: return spec
+	return "procedural " + hashlib.sha1(spec.encode()).hexdigest()[:24]
+	
+# the spec for procedural images, the file name otherwise
+def getElementImageName(image):
+	return image.get(proceduralSpecPropertyName, image.name)
+	
+def getElementTextureResolution(width, height):
+	render = bpy.context.scene.render
+	frameWidth = render.resolution_x * render.resolution_percentage / 100
+	return getTextureResolution(max(width, height) * planeSize / (2 * defaultHalfWidthTan) * frameWidth)
+	
+# texture atlas
+##################################
+
+def buildElementAtlas(imageNames):
+	textures = []
+	for imageName in imageNames:
+		if isProceduralSpec(imageName): textures.append(getProceduralTexture(imageName, getProceduralImage(imageName).size[0]))
+		else: textures.append(getImagePixels(getImage(os.path.join(elementsFolder, imageName))))
+	(pixels, rects) = buildAtlas(textures)
+	atlas = setPixelsOnImage(atlasImageName, pixels)
+	packAsOpenEXR(atlas)
+	atlas[atlasRectsPropertyName] = { imageName : list(rect) for imageName, rect in zip(imageNames, rects) }
+	return atlas
+	
+def getAtlasRect(imageName):
+	atlas = bpy.data.images.get(atlasImageName)
+	if atlas is None: return None
+	rects = atlas.get(atlasRectsPropertyName, {})
+	if imageName not in rects: return None
+	return list(rects[imageName])
+	
+def setAtlasOnElementPlane(plane, imageName, rect):
+	atlas = bpy.data.images[atlasImageName]
+	plane[imageNamePropertyName] = imageName
+	plane.data = getAtlasPlaneMesh(imageName, rect)
+	setObjectLevelMaterial(plane, getAtlasMaterial(atlas))
+	plane[planeWidthFactorName] = getRectAspect(rect, atlas.size)
+	
+def getAtlasPlaneMesh(imageName, rect):
+	mesh = bpy.data.meshes.get(atlasMeshPrefix + imageName)
+	if mesh is None: mesh = newPlaneMesh(atlasMeshPrefix + imageName, elementPlaneSize)
+	setPlaneMeshUVRect(mesh, rect)
+	return mesh
+	
+def getAtlasMaterial(atlas):
+	material = bpy.data.materials.get(atlasMaterialName)
+	if material is None:
+		material = newCyclesMaterial(name = atlasMaterialName)
+		cleanMaterial(material)
+		nodeTree = material.node_tree
+		textureCoordinatesNode = newTextureCoordinatesNode(nodeTree)
+		imageNode = newImageTextureNode(nodeTree)
+		shader = newGroupNode(nodeTree, getFlareShaderGroup())
+		output = newOutputNode(nodeTree)
+		imageNode.name = imageNodeName
+		newNodeLink(nodeTree, textureCoordinatesNode.outputs["UV"], imageNode.inputs[0])
+		newNodeLink(nodeTree, imageNode.outputs[0], shader.inputs[0])
+		newNodeLink(nodeTree, shader.outputs[0], output.inputs[0])
+	material.node_tree.nodes[imageNodeName].image = atlas
+	return material
+	
+def getSceneElementImageNames():
+	imageNames = set()
+	for flareControler in getAllFlares():
+		for element in getDataElementsFromFlare(flareControler):
+			imageNames.add(getImageNameOfElementPlane(getPlaneFromElement(element)))
+	return imageNames
+def getFolderElementImageNames():
+	return set(name for name in os.listdir(elementsFolder) if os.path.splitext(name)[1].lower() in (".jpg", ".jpeg", ".png"))
+	
+def useElementAtlas(includeElementsFolder = False):
+	imageNames = getSceneElementImageNames()
+	if includeElementsFolder: imageNames |= getFolderElementImageNames()
+	buildElementAtlas(sorted(imageNames))
+	
+	planes = []
+	for flareControler in getAllFlares():
+		for element in getDataElementsFromFlare(flareControler):
+			planes.append(getPlaneFromElement(element))
+	oldMaterials = set(slot.material for plane in planes for slot in plane.material_slots if slot.material is not None)
+	for plane in planes:
+		if colorMultiplyName in plane:
+			imageName = getImageNameOfElementPlane(plane)
+			setAtlasOnElementPlane(plane, imageName, getAtlasRect(imageName))
+	
+	oldImages = set()
+	for material in oldMaterials:
+		node = material.node_tree.nodes.get(imageNodeName)
+		if node is not None and node.image is not None and node.image.name != atlasImageName: oldImages.add(node.image)
+	oldMaterials.discard(bpy.data.materials.get(atlasMaterialName))
+	removeUnusedDatablocks(bpy.data.materials, oldMaterials)
+	removeUnusedDatablocks(bpy.data.images, oldImages)
+	resetImageCache()
+	resetFlareMaterialPool()
+
+	
 class LensFlareData:
 	def __init__(self, 	name = "lens flare",
 						intensity = 1.0):
@@ -819,7 +2133,8 @@ class FlareElementData:
 		element[trackToCenterInfluenceName] = self.centerRotation
 		element[intensityName] = self.intensity
 		element[additionalRotationName] = self.rotation
-		setImagePathOnElementPlane(plane, self.getImagePath())
+		if isProceduralSpec(self.imageName): setProceduralImageOnElementPlane(plane, self.imageName, getElementTextureResolution(self.width, self.height))
+		else: setImagePathOnElementPlane(plane, self.getImagePath())
 		setMultiplyColorOnElementPlane(plane, self.color)
 		
 	def fromElement(element):
@@ -827,7 +2142,7 @@ class FlareElementData:
 	
 		elementData = FlareElementData()
 		elementData.name = element[elementNamePropertyName]
-		elementData.imageName = getImageFromElementEmpty(element).name
+		elementData.imageName = getImageNameOfElementPlane(plane)
 		elementData.position = element[elementPositionName]
 		elementData.intensity = element[intensityName]
 		elementData.rotation = element[additionalRotationName]
@@ -836,7 +2151,7 @@ class FlareElementData:
 		elementData.height = element[scaleYName]
 		elementData.xOffset = element[offsetXName]
 		elementData.yOffset = element[offsetYName]
-		elementData.color = getNodeWithNameInObject(plane, colorMultiplyNodeName).inputs[2].default_value
+		elementData.color = getMultiplyColorOfElementPlane(plane)
 		
 		return elementData
 	FromElement = staticmethod(fromElement)
@@ -844,9 +2159,187 @@ class FlareElementData:
 
 	
 	
+# interface lists
+##################################
+
+# the lists in the panels show these cached items; they are only rebuilt when the registry changes or an item's object is gone
+# and the active flare and element follow the active object here instead of in the panels
+
+listedFlareRegistryVersion = -1
+listedElementsFlareName = ""
+lastActiveObjectName = ""
+isSyncingListIndices = False
+
+@persistent
+@profiled("flareListsSceneUpdateHandler")
+def flareListsSceneUpdateHandler(scene):
+	global lastActiveObjectName
+	windowManager = bpy.context.window_manager
+	if windowManager is None or not hasattr(windowManager, "lens_flare_items"): return
+	ensureFlareRegistry()
+	activeObject = getActive()
+	activeObjectName = activeObject.name if activeObject is not None else ""
+	if activeObjectName != lastActiveObjectName:
+		lastActiveObjectName = activeObjectName
+		updateActiveFlareName()
+		updateActiveElementName()
+	
+	activeFlare = getActiveFlare()
+	activeFlareName = activeFlare.name if activeFlare is not None else ""
+	if listedFlareRegistryVersion != flareRegistryVersion or listedElementsFlareName != activeFlareName or hasMissingListObjects(windowManager):
+		refreshFlareListItems(windowManager)
+	elif bpy.data.objects.is_updated:
+		updateFlareListValues(windowManager)
+	syncFlareListIndices(windowManager)
+	
+def hasMissingListObjects(windowManager):
+	# deleted or renamed in the outliner or by undo, the registry version does not see that
+	for items in (windowManager.lens_flare_items, windowManager.lens_flare_element_items):
+		if any(bpy.data.objects.get(item.objectName) is None for item in items): return True
+	return False
+	
+def refreshFlareListItems(windowManager):
+	global listedFlareRegistryVersion, listedElementsFlareName
+	windowManager.lens_flare_items.clear()
+	for flareControler in getAllFlares():
+		item = windowManager.lens_flare_items.add()
+		item.objectName = flareControler.name
+	windowManager.lens_flare_element_items.clear()
+	activeFlare = getActiveFlare()
+	if activeFlare is not None:
+		for element in getDataElementsFromFlare(activeFlare):
+			item = windowManager.lens_flare_element_items.add()
+			item.objectName = element.name
+	updateFlareListValues(windowManager)
+	listedFlareRegistryVersion = flareRegistryVersion
+	listedElementsFlareName = activeFlare.name if activeFlare is not None else ""
+	
+def updateFlareListValues(windowManager):
+	for item in windowManager.lens_flare_items:
+		flareControler = bpy.data.objects.get(item.objectName)
+		if flareControler is None: continue
+		setChangedListItemValues(item, flareControler.get(flareNamePropertyName, ""), flareControler.get(intensityName, 0.0), 0.0)
+	for item in windowManager.lens_flare_element_items:
+		element = bpy.data.objects.get(item.objectName)
+		if element is None: continue
+		setChangedListItemValues(item, element.get(elementNamePropertyName, ""), element.get(intensityName, 0.0), element.get(elementPositionName, 0.0))
+		
+def setChangedListItemValues(item, name, intensity, position):
+	# writing equal values would still redraw the panels
+	if item.name != name: item.name = name
+	if item.intensity != intensity: item.intensity = intensity
+	if item.position != position: item.position = position
+	
+def syncFlareListIndices(windowManager):
+	global isSyncingListIndices
+	isSyncingListIndices = True
+	try:
+		setChangedListIndex(windowManager, "lens_flare_items", "lens_flare_index", activeFlareName)
+		setChangedListIndex(windowManager, "lens_flare_element_items", "lens_flare_element_index", activeElementName)
+	finally:
+		isSyncingListIndices = False
+		
+def setChangedListIndex(windowManager, itemsName, indexName, objectName):
+	items = getattr(windowManager, itemsName)
+	index = getattr(windowManager, indexName)
+	if 0 <= index < len(items) and items[index].objectName == objectName: return
+	for newIndex, item in enumerate(items):
+		if item.objectName == objectName:
+			setattr(windowManager, indexName, newIndex)
+			return
+	if index != -1: setattr(windowManager, indexName, -1)
+	
+def activeFlareListIndexChanged(windowManager, context):
+	items = windowManager.lens_flare_items
+	if isSyncingListIndices or not 0 <= windowManager.lens_flare_index < len(items): return
+	setActiveFlareName(items[windowManager.lens_flare_index].objectName)
+	onlySelect(bpy.data.objects.get(activeFlareName))
+def activeElementListIndexChanged(windowManager, context):
+	items = windowManager.lens_flare_element_items
+	if isSyncingListIndices or not 0 <= windowManager.lens_flare_element_index < len(items): return
+	setActiveElementName(items[windowManager.lens_flare_element_index].objectName)
+	onlySelect(bpy.data.objects.get(activeElementName))
+	
+	
+# profiling
+##################################
+
+@persistent
+def profilingFrameChangePreHandler(scene):
+	startFrameEvaluation()
+	
+# runs before the other frame change handlers so only the evaluation of the scene is measured
+@persistent
+def profilingFrameChangePostHandler(scene):
+	endFrameEvaluation(scene.frame_current)
+	
+def profilingChanged(windowManager, context):
+	setProfilingEnabled(windowManager.lens_flare_profiling)
+	
+def formatMilliseconds(seconds):
+	return "{:.2f}".format(seconds * 1000)
+	
+	
 # interface
 ##################################
 
+class LensFlareListItem(bpy.types.PropertyGroup):
+	objectName = bpy.props.StringProperty()
+	intensity = bpy.props.FloatProperty()
+	position = bpy.props.FloatProperty()
+	
+listSortItems = [
+	("NONE", "Default", ""),
+	("NAME", "Name", ""),
+	("INTENSITY", "Intensity", ""),
+	("POSITION", "Position", "")]
+	
+class LensFlareListBase:
+	sortBy = bpy.props.EnumProperty(name = "Sort By", items = listSortItems, default = "NONE")
+	
+	def draw_filter(self, context, layout):
+		row = layout.row(align = True)
+		row.prop(self, "filter_name", text = "")
+		row.prop(self, "use_filter_invert", text = "", icon = "ARROW_LEFTRIGHT")
+		row = layout.row(align = True)
+		row.prop(self, "sortBy", text = "")
+		row.prop(self, "use_filter_sort_reverse", text = "", icon = "SORT_DESC" if self.use_filter_sort_reverse else "SORT_ASC")
+		
+	def filter_items(self, context, data, propname):
+		items = getattr(data, propname)
+		helper = bpy.types.UI_UL_list
+		flags = []
+		if self.filter_name != "":
+			flags = helper.filter_items_by_name(self.filter_name, self.bitflag_filter_item, items, "name")
+		order = []
+		if self.sortBy == "NAME": order = helper.sort_items_by_name(items, "name")
+		elif self.sortBy in ("INTENSITY", "POSITION"):
+			attribute = self.sortBy.lower()
+			order = helper.sort_items_helper([(index, getattr(item, attribute)) for index, item in enumerate(items)], key = lambda pair: pair[1])
+		return (flags, order)
+	
+class LENS_FLARES_UL_flares(LensFlareListBase, bpy.types.UIList):
+	def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
+		row = layout.row(align = True)
+		row.label(item.name, icon = "LAMP_SUN")
+		flareControler = bpy.data.objects.get(item.objectName)
+		if flareControler is None: return
+		row.prop(flareControler, intensityPath, text = "", emboss = False)
+		saveFlare = row.operator("lens_flares.save_lens_flare", text = "", icon = "SAVE_COPY", emboss = False)
+		saveFlare.flareName = item.objectName
+		deleteFlare = row.operator("lens_flares.delete_lens_flare", text = "", icon = "X", emboss = False)
+		deleteFlare.flareName = item.objectName
+		
+class LENS_FLARES_UL_elements(LensFlareListBase, bpy.types.UIList):
+	def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
+		row = layout.row(align = True)
+		row.label(item.name)
+		element = bpy.data.objects.get(item.objectName)
+		if element is None: return
+		row.prop(element, elementPositionPath, text = "", emboss = False)
+		deleteElement = row.operator("lens_flares.delete_flare_element", text = "", icon = "X", emboss = False)
+		deleteElement.elementName = item.objectName
+
 class LensFlaresPanel(bpy.types.Panel):
 	bl_space_type = "VIEW_3D"
 	bl_region_type = "TOOLS"
@@ -854,34 +2347,56 @@ class LensFlaresPanel(bpy.types.Panel):
 	bl_label = "Lens Flares"
 	bl_context = "objectmode"
 	
+	@profiledDraw("LensFlaresPanel.draw")
 	def draw(self, context):
-		layout = self.layout	
-
-		updateActiveFlareName()
-		updateActiveElementName()
+		layout = self.layout
+		windowManager = context.window_manager
 		
-		flares = getAllFlares()
-		activeFlare = getActiveFlare()
-		if len(flares) == 0: layout.label("no flares in this scene", icon = "INFO")
-		else:
-			col = layout.column(align = True)
-			for flare in flares:
-				row = col.row(align = True)
-				row.scale_y = 1.35
-				if activeFlare == flare: 
-					selectFlare = row.operator("lens_flares.select_flare", text = flare[flareNamePropertyName], icon = "PINNED")
-				else: selectFlare = row.operator("lens_flares.select_flare", text = flare[flareNamePropertyName])
-				selectFlare.flareName = flare.name
-				
-				saveFlare = row.operator("lens_flares.save_lens_flare", text = "", icon = "SAVE_COPY")
-				saveFlare.flareName = flare.name
-				deleteFlare = row.operator("lens_flares.delete_lens_flare", text = "", icon = "X")
-				deleteFlare.flareName = flare.name
+		if len(windowManager.lens_flare_items) == 0: layout.label("no flares in this scene", icon = "INFO")
+		else: layout.template_list("LENS_FLARES_UL_flares", "", windowManager, "lens_flare_items", windowManager, "lens_flare_index", rows = 5)
 				
 		row = layout.row(align = True)
 		row.operator("lens_flares.new_lens_flare", icon = 'NEW', text = "New")
+		row.operator("lens_flares.new_lens_flares_on_selected", icon = 'GROUP', text = "On Selected").filepath = ""
 		row.operator("lens_flares.load_lens_flare", icon = 'FILE_FOLDER', text = "Load")
+		row.operator("lens_flares.preview_lens_flare", icon = 'IMAGE_COL', text = "Preview")
+		layout.prop(context.scene, "lens_flare_engine", text = "Engine")
+		row = layout.row(align = True)
+		row.operator("lens_flares.bake_lens_flares", icon = "REC", text = "Bake")
+		row.operator("lens_flares.bake_lens_flare_occlusion", icon = "SOLO_OFF", text = "Occlusion")
+		row.operator("lens_flares.compact_lens_flare_rigs", icon = "DRIVER", text = "Compact")
+		row.operator("lens_flares.cull_lens_flares", icon = "RESTRICT_RENDER_ON", text = "Cull")
+		layout.operator("lens_flares.instance_lens_flare_on_selected", icon = "GROUP", text = "Instance on Selected")
+		layout.operator("lens_flares.analyze_transparent_bounces", icon = "MOD_TRIANGULATE", text = "Fit Transparent Bounces")
+		layout.operator("lens_flares.delete_selected_lens_flares", icon = "X", text = "Delete Selected")
+		layout.operator("lens_flares.use_element_atlas", icon = "IMAGE_COL", text = "Use Atlas")
 				
+class LensFlarePresetsPanel(bpy.types.Panel):
+	bl_space_type = "VIEW_3D"
+	bl_region_type = "TOOLS"
+	bl_category = "Lens Flares"
+	bl_label = "Presets"
+	bl_context = "objectmode"
+	bl_options = {"DEFAULT_CLOSED"}
+	
+	@profiledDraw("LensFlarePresetsPanel.draw")
+	def draw(self, context):
+		layout = self.layout
+		windowManager = context.window_manager
+		if not presetPreviewsAreListed: updatePresetPreviewItems()
+		
+		col = layout.column(align = True)
+		col.prop(windowManager, "lens_flare_preset_name", text = "", icon = "VIEWZOOM")
+		col.prop(windowManager, "lens_flare_preset_image", text = "Image")
+		col.prop(windowManager, "lens_flare_preset_min_elements", text = "Min Elements")
+		
+		if len(presetPreviewItems) == 0: layout.label("no presets found", icon = "INFO")
+		else: layout.template_icon_view(context.window_manager, "lens_flare_preset")
+		row = layout.row(align = True)
+		row.operator("lens_flares.load_selected_preset", icon = "FILE_FOLDER", text = "Load")
+		row.operator("lens_flares.new_lens_flares_on_selected", icon = "GROUP", text = "On Selected").filepath = windowManager.lens_flare_preset
+		row.operator("lens_flares.refresh_preset_previews", icon = "FILE_REFRESH", text = "Refresh")
+		
 class LensFlareSettingsPanel(bpy.types.Panel):
 	bl_space_type = "VIEW_3D"
 	bl_region_type = "TOOLS"
@@ -893,6 +2408,7 @@ class LensFlareSettingsPanel(bpy.types.Panel):
 	def poll(self, context):
 		return isFlareActive()
 	
+	@profiledDraw("LensFlareSettingsPanel.draw")
 	def draw(self, context):
 		layout = self.layout
 		
@@ -909,22 +2425,15 @@ class LensFlareSettingsPanel(bpy.types.Panel):
 		layout.prop(target.constraints[0], 'target', text = "Target")
 		layout.prop(flare, intensityPath, text = "Intensity")
 				
-		elements = getDataElementsFromFlare(flare)
-		activeElement = getActiveElement()
+		windowManager = context.window_manager
 		box = layout.box()
-		if len(elements) == 0: box.label("no elements on this flare", icon = "INFO")
-		else:
-			col = box.column(align = True)
-			for element in elements:
-				row = col.row(align = True)
-				row.scale_y = 1.35
-				if element == activeElement: 
-					selectElement = row.operator("lens_flares.select_flare_element", text = element[elementNamePropertyName], icon = "PINNED")
-				else: selectElement = row.operator("lens_flares.select_flare_element", text = element[elementNamePropertyName])
-				selectElement.elementName = element.name
-				deleteElement = row.operator("lens_flares.delete_flare_element", text = "", icon = "X")
-				deleteElement.elementName = element.name
-		newElement = box.operator("lens_flares.new_flare_element", icon = 'PLUS')
+		if len(windowManager.lens_flare_element_items) == 0: box.label("no elements on this flare", icon = "INFO")
+		else: box.template_list("LENS_FLARES_UL_elements", "", windowManager, "lens_flare_element_items", windowManager, "lens_flare_element_index", rows = 5)
+		row = box.row(align = True)
+		row.enabled = not usesBakedEngine(flare)
+		newElement = row.operator("lens_flares.new_flare_element", icon = 'PLUS')
+		newElement.flareName = flare.name
+		newElement = row.operator("lens_flares.new_procedural_flare_element", icon = 'MESH_CIRCLE', text = "")
 		newElement.flareName = flare.name
 				
 class LensFlareElementSettingsPanel(bpy.types.Panel):
@@ -938,6 +2447,7 @@ class LensFlareElementSettingsPanel(bpy.types.Panel):
 	def poll(self, context):
 		return isElementActive()
 	
+	@profiledDraw("LensFlareElementSettingsPanel.draw")
 	def draw(self, context):
 		layout = self.layout
 		
@@ -965,7 +2475,36 @@ class LensFlareElementSettingsPanel(bpy.types.Panel):
 		col.prop(element, scaleXPath, text = "Width")
 		col.prop(element, scaleYPath, text = "Height")
 		
-		layout.prop(getNodeWithNameInObject(plane, colorMultiplyNodeName).inputs[2], "default_value", text = "Color")
+		if colorMultiplyName in plane: layout.prop(plane, colorMultiplyPath, text = "Color")
+		else: layout.prop(getNodeWithNameInObject(plane, colorMultiplyNodeName).inputs[2], "default_value", text = "Color")
+		
+class LensFlareProfilingPanel(bpy.types.Panel):
+	bl_space_type = "VIEW_3D"
+	bl_region_type = "TOOLS"
+	bl_category = "Lens Flares"
+	bl_label = "Profiling"
+	bl_context = "objectmode"
+	bl_options = {"DEFAULT_CLOSED"}
+	
+	def draw(self, context):
+		layout = self.layout
+		
+		row = layout.row(align = True)
+		row.prop(context.window_manager, "lens_flare_profiling", text = "Record")
+		row.operator("lens_flares.reset_profile", text = "", icon = "X")
+		row.operator("lens_flares.export_profile_trace", text = "", icon = "EXPORT")
+		
+		statistics = getProfileStatistics()
+		if len(statistics) == 0:
+			layout.label("nothing recorded yet", icon = "INFO")
+			return
+		for name, calls, total, mean, p50, p90, p99, maximum in statistics:
+			col = layout.column(align = True)
+			col.label(name, icon = "TIME")
+			col.label("{} calls, {} ms total, {} ms mean".format(calls, formatMilliseconds(total), formatMilliseconds(mean)))
+			col.label("p50 {}  p90 {}  p99 {}  max {} ms".format(formatMilliseconds(p50), formatMilliseconds(p90), formatMilliseconds(p99), formatMilliseconds(maximum)))
+		droppedEvents = getDroppedTraceEventCount()
+		if droppedEvents > 0: layout.label("trace is full, {} events dropped".format(droppedEvents), icon = "ERROR")
 		
 		
 # operators
@@ -984,6 +2523,31 @@ class NewLensFlare(bpy.types.Operator):
 				setActiveFlareName(flareControler.name)
 		return{"FINISHED"}
 		
+# the lists can still show an object that was deleted or renamed outside of the addon
+def cancelForMissingObject(operator, objectName):
+	operator.report({"WARNING"}, "Object '" + objectName + "' does not exist anymore")
+	return {"CANCELLED"}
+# baked flares have no rig the new element could be attached to
+def cancelForBakedFlare(operator):
+	operator.report({"WARNING"}, "Elements can't be added to a baked flare")
+	return {"CANCELLED"}
+	
+class NewLensFlaresOnSelected(bpy.types.Operator):
+	bl_idname = "lens_flares.new_lens_flares_on_selected"
+	bl_label = "New Lens Flares on Selected"
+	bl_description = "Create a Lens Flare on every selected object."
+	
+	filepath = bpy.props.StringProperty(subtype = "FILE_PATH", description = "Preset to create the flares from. Empty flares are created when this is empty.", options = {"SKIP_SAVE"})
+	
+	def execute(self, context):
+		camera = getActiveCamera()
+		targets = getPossibleFlareTargets(getSelectedObjects())
+		if camera is None or len(targets) == 0: return{"CANCELLED"}
+		flareControlers = newLensFlares(camera, targets, self.filepath if self.filepath != "" else None)
+		setActiveFlareName(flareControlers[-1].name)
+		self.report({"INFO"}, "Created " + str(len(flareControlers)) + " flares")
+		return{"FINISHED"}
+		
 class NewFlareElement(bpy.types.Operator):
 	bl_idname = "lens_flares.new_flare_element"
 	bl_label = "New Flare Element"
@@ -993,7 +2557,11 @@ class NewFlareElement(bpy.types.Operator):
 	filepath = bpy.props.StringProperty(subtype="FILE_PATH")
 
 	def execute(self, context):
-		(element, flareElement) = newFlareElement(bpy.data.objects[self.flareName], getImage(self.filepath), getFileName(self.filepath))
+		flareControler = bpy.data.objects.get(self.flareName)
+		if flareControler is None: return cancelForMissingObject(self, self.flareName)
+		if usesBakedEngine(flareControler): return cancelForBakedFlare(self)
+		(element, flareElement) = newFlareElement(flareControler, None, getFileName(self.filepath))
+		setImagePathOnElementPlane(flareElement, self.filepath)
 		setActiveElementName(element.name)
 		return {'FINISHED'}
 
@@ -1002,6 +2570,35 @@ class NewFlareElement(bpy.types.Operator):
 		context.window_manager.fileselect_add(self)
 		return {'RUNNING_MODAL'}
 		
+class NewProceduralFlareElement(bpy.types.Operator):
+	bl_idname = "lens_flares.new_procedural_flare_element"
+	bl_label = "New Procedural Element"
+	bl_description = "Create a new Element with a generated image in active Lens Flare."
+	
+	flareName = bpy.props.StringProperty()
+	shape = bpy.props.EnumProperty(name = "Shape", items = [
+		("polygon", "Polygon", ""),
+		("ring", "Ring", ""),
+		("glow", "Glow", ""),
+		("streak", "Streak", "")])
+	sides = bpy.props.IntProperty(name = "Sides", default = 6, min = 0, max = 16, description = "Less than 3 sides give a circle.")
+	softness = bpy.props.FloatProperty(name = "Softness", default = 0.0, min = 0.0, max = 1.0)
+	
+	def execute(self, context):
+		flareControler = bpy.data.objects.get(self.flareName)
+		if flareControler is None: return cancelForMissingObject(self, self.flareName)
+		if usesBakedEngine(flareControler): return cancelForBakedFlare(self)
+		if self.shape == "polygon": spec = newProceduralSpec("polygon", sides = self.sides, softness = self.softness)
+		elif self.shape == "ring": spec = newProceduralSpec("ring", softness = self.softness)
+		else: spec = newProceduralSpec(self.shape)
+		(element, flareElement) = newFlareElement(flareControler, None, self.shape)
+		setProceduralImageOnElementPlane(flareElement, spec, getElementTextureResolution(1.0, 1.0))
+		setActiveElementName(element.name)
+		return {'FINISHED'}
+		
+	def invoke(self, context, event):
+		return context.window_manager.invoke_props_dialog(self)
+		
 class SaveLensFlare(bpy.types.Operator):
 	bl_idname = "lens_flares.save_lens_flare"
 	bl_label = "Save Lens Flare"
@@ -1011,7 +2608,9 @@ class SaveLensFlare(bpy.types.Operator):
 	filepath = bpy.props.StringProperty(subtype="FILE_PATH")
 	
 	def execute(self, context):
-		saveLensFlare(bpy.data.objects[self.flareName], self.filepath)
+		flareControler = bpy.data.objects.get(self.flareName)
+		if flareControler is None: return cancelForMissingObject(self, self.flareName)
+		saveLensFlare(flareControler, self.filepath)
 		return{"FINISHED"}
 		
 	def invoke(self, context, event):
@@ -1035,6 +2634,60 @@ class LoadLensFlare(bpy.types.Operator):
 		context.window_manager.fileselect_add(self)
 		return {'RUNNING_MODAL'}
 		
+class PreviewLensFlare(bpy.types.Operator):
+	bl_idname = "lens_flares.preview_lens_flare"
+	bl_label = "Preview Lens Flare"
+	bl_description = "Render a preset into the lens flare preview image without creating it."
+	
+	filepath = bpy.props.StringProperty(subtype="FILE_PATH")
+	
+	def execute(self, context):
+		showLensFlarePreview(renderLensFlarePreview(self.filepath))
+		return{"FINISHED"}
+		
+	def invoke(self, context, event):
+		self.filepath = presetsFolder
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+		
+class RefreshPresetPreviews(bpy.types.Operator):
+	bl_idname = "lens_flares.refresh_preset_previews"
+	bl_label = "Refresh Preset Previews"
+	bl_description = "Render thumbnails of all presets that changed since the last refresh."
+	
+	def invoke(self, context, event):
+		rescanPresetIndex()
+		jobs = getOutdatedThumbnailJobs()
+		if len(jobs) == 0:
+			updatePresetPreviewItems()
+			return{"FINISHED"}
+		decodeElementImagesForWorkers([presetPath for presetPath, thumbnailPath in jobs])
+		self.executor = newThumbnailExecutor()
+		self.futures = [self.executor.submit(renderThumbnailJob, presetPath, elementsFolder, thumbnailPath, decodedElementsFolder) for presetPath, thumbnailPath in jobs]
+		self.timer = context.window_manager.event_timer_add(0.25, context.window)
+		context.window_manager.modal_handler_add(self)
+		return{"RUNNING_MODAL"}
+		
+	def modal(self, context, event):
+		if event.type != "TIMER": return{"PASS_THROUGH"}
+		if not all(future.done() for future in self.futures): return{"PASS_THROUGH"}
+		context.window_manager.event_timer_remove(self.timer)
+		self.executor.shutdown()
+		failed = [future for future in self.futures if future.exception() is not None]
+		if len(failed) > 0: self.report({"WARNING"}, str(len(failed)) + " previews could not be rendered")
+		updatePresetPreviewItems()
+		return{"FINISHED"}
+		
+class LoadSelectedPreset(bpy.types.Operator):
+	bl_idname = "lens_flares.load_selected_preset"
+	bl_label = "Load Selected Preset"
+	bl_description = "Create a Lens Flare from the preset selected in the browser."
+	
+	def execute(self, context):
+		path = context.window_manager.lens_flare_preset
+		if path != "": loadLensFlare(path)
+		return{"FINISHED"}
+		
 class SelectFlare(bpy.types.Operator):
 	bl_idname = "lens_flares.select_flare"
 	bl_label = "Select Flare"
@@ -1067,9 +2720,18 @@ class DeleteLensFlare(bpy.types.Operator):
 	flareName = bpy.props.StringProperty()
 	
 	def execute(self, context):
-		selectionBefore = getSelectedObjects()
-		deleteFlare(bpy.data.objects[self.flareName])
-		setSelectedObjects(selectionBefore)
+		flareControler = bpy.data.objects.get(self.flareName)
+		if flareControler is None: return cancelForMissingObject(self, self.flareName)
+		deleteFlare(flareControler)
+		return{"FINISHED"}
+		
+class DeleteSelectedLensFlares(bpy.types.Operator):
+	bl_idname = "lens_flares.delete_selected_lens_flares"
+	bl_label = "Delete Selected Lens Flares"
+	bl_description = "Delete all Lens Flares that have a selected part."
+	
+	def execute(self, context):
+		deleteFlares(getSelectedFlares())
 		return{"FINISHED"}
 		
 class DeleteFlareElement(bpy.types.Operator):
@@ -1080,9 +2742,9 @@ class DeleteFlareElement(bpy.types.Operator):
 	elementName = bpy.props.StringProperty()
 	
 	def execute(self, context):
-		selectionBefore = getSelectedObjects()
-		deleteFlareElement(bpy.data.objects[self.elementName])
-		setSelectedObjects(selectionBefore)
+		element = bpy.data.objects.get(self.elementName)
+		if element is None: return cancelForMissingObject(self, self.elementName)
+		deleteFlareElement(element)
 		return{"FINISHED"}
 
 class DuplicateFlareElement(bpy.types.Operator):
@@ -1093,8 +2755,134 @@ class DuplicateFlareElement(bpy.types.Operator):
 	elementName = bpy.props.StringProperty()
 	
 	def execute(self, context):
-		element = duplicateFlareElement(bpy.data.objects[self.elementName])
-		setActiveElementName(element.name)
+		element = bpy.data.objects.get(self.elementName)
+		if element is None: return cancelForMissingObject(self, self.elementName)
+		if usesBakedEngine(getCorrespondingFlareControler(element)): return cancelForBakedFlare(self)
+		newElement = duplicateFlareElement(element)
+		setActiveElementName(newElement.name)
+		return{"FINISHED"}
+		
+class BakeLensFlares(bpy.types.Operator):
+	bl_idname = "lens_flares.bake_lens_flares"
+	bl_label = "Bake Lens Flares"
+	bl_description = "Write the animation of all flare elements into keyframes and remove the driver rig."
+	
+	frameStart = bpy.props.IntProperty(name = "Start Frame")
+	frameEnd = bpy.props.IntProperty(name = "End Frame")
+	onlySelected = bpy.props.BoolProperty(name = "Only Selected Flares", default = False)
+	removeRig = bpy.props.BoolProperty(name = "Remove Drivers", default = True, description = "Remove drivers and constraints of the baked flares.")
+	
+	def execute(self, context):
+		if self.onlySelected: flareControlers = getSelectedFlares()
+		else: flareControlers = getAllFlares()
+		bakeLensFlares(flareControlers, self.frameStart, self.frameEnd, self.removeRig)
+		return{"FINISHED"}
+		
+	def invoke(self, context, event):
+		self.frameStart = context.scene.frame_start
+		self.frameEnd = context.scene.frame_end
+		return context.window_manager.invoke_props_dialog(self)
+	
+class BakeLensFlareOcclusion(bpy.types.Operator):
+	bl_idname = "lens_flares.bake_lens_flare_occlusion"
+	bl_label = "Bake Lens Flare Occlusion"
+	bl_description = "Key the occlusion of the flares so they fade out when their target is hidden behind geometry."
+	
+	frameStart = bpy.props.IntProperty(name = "Start Frame")
+	frameEnd = bpy.props.IntProperty(name = "End Frame")
+	onlySelected = bpy.props.BoolProperty(name = "Only Selected Flares", default = False)
+	radius = bpy.props.FloatProperty(name = "Radius", default = 0.0, min = 0.0, description = "Size of the light source. Bigger sources fade out softly.")
+	samples = bpy.props.IntProperty(name = "Samples", default = 1, min = 1, max = 256, description = "Rays per flare and frame.")
+	
+	def execute(self, context):
+		if self.onlySelected: flareControlers = getSelectedFlares()
+		else: flareControlers = getAllFlares()
+		bakeLensFlareOcclusion(flareControlers, self.frameStart, self.frameEnd, self.radius, self.samples)
+		return{"FINISHED"}
+		
+	def invoke(self, context, event):
+		self.frameStart = context.scene.frame_start
+		self.frameEnd = context.scene.frame_end
+		return context.window_manager.invoke_props_dialog(self)
+	
+class CullLensFlares(bpy.types.Operator):
+	bl_idname = "lens_flares.cull_lens_flares"
+	bl_label = "Cull Lens Flares"
+	bl_description = "Hide elements in the frames where they are outside of the camera view."
+	
+	frameStart = bpy.props.IntProperty(name = "Start Frame")
+	frameEnd = bpy.props.IntProperty(name = "End Frame")
+	onlySelected = bpy.props.BoolProperty(name = "Only Selected Flares", default = False)
+	margin = bpy.props.FloatProperty(name = "Margin", default = 0.1, min = 0.0, description = "Extra space around the frame in which elements stay visible. 1 is half the frame.")
+	targetMargin = bpy.props.FloatProperty(name = "Target Margin", default = 1.0, min = 0.0, description = "Hide the whole flare when its target is further outside of the frame.")
+	hideInViewport = bpy.props.BoolProperty(name = "Hide in Viewport", default = True)
+	
+	def execute(self, context):
+		if self.onlySelected: flareControlers = getSelectedFlares()
+		else: flareControlers = getAllFlares()
+		(hidden, total) = cullLensFlares(flareControlers, self.frameStart, self.frameEnd, self.margin, self.targetMargin, self.hideInViewport)
+		self.report({"INFO"}, "Hid " + str(hidden) + " of " + str(total) + " element frames")
+		return{"FINISHED"}
+		
+	def invoke(self, context, event):
+		self.frameStart = context.scene.frame_start
+		self.frameEnd = context.scene.frame_end
+		return context.window_manager.invoke_props_dialog(self)
+	
+class AnalyzeTransparentBounces(bpy.types.Operator):
+	bl_idname = "lens_flares.analyze_transparent_bounces"
+	bl_label = "Analyze Transparent Bounces"
+	bl_description = "Set the transparent bounces to the most elements that overlap in any frame, instead of a worst case."
+	
+	frameStart = bpy.props.IntProperty(name = "Start Frame")
+	frameEnd = bpy.props.IntProperty(name = "End Frame")
+	margin = bpy.props.IntProperty(name = "Margin", default = transparentBounceMargin, min = 0, description = "Bounces left for other transparent objects in the scene.")
+	
+	def execute(self, context):
+		(before, after) = setAnalyzedTransparentBounces(self.frameStart, self.frameEnd, self.margin)
+		self.report({"INFO"}, "Transparent bounces: " + str(before) + " -> " + str(after) + " (saved " + str(before - after) + ")")
+		return{"FINISHED"}
+		
+	def invoke(self, context, event):
+		self.frameStart = context.scene.frame_start
+		self.frameEnd = context.scene.frame_end
+		return context.window_manager.invoke_props_dialog(self)
+	
+class InstanceLensFlareOnSelected(bpy.types.Operator):
+	bl_idname = "lens_flares.instance_lens_flare_on_selected"
+	bl_label = "Instance Lens Flare on Selected"
+	bl_description = "Use the active flare as template for all selected objects. The amount of objects and drivers does not grow with the selection."
+	
+	@classmethod
+	def poll(cls, context):
+		return isFlareActive()
+	
+	def execute(self, context):
+		targets = [object for object in getSelectedObjects() if not isCameraObject(object)]
+		newFlareInstances(getActiveFlare(), targets)
+		return{"FINISHED"}
+	
+class CompactLensFlareRigs(bpy.types.Operator):
+	bl_idname = "lens_flares.compact_lens_flare_rigs"
+	bl_label = "Compact Lens Flare Rigs"
+	bl_description = "Convert the driver rigs of all flares to compact rigs with fewer drivers."
+	
+	def execute(self, context):
+		amount = 0
+		for flareControler in getAllFlares():
+			if convertFlareToCompactRig(flareControler): amount += 1
+		self.report({"INFO"}, "Converted " + str(amount) + " flares")
+		return{"FINISHED"}
+		
+class UseElementAtlas(bpy.types.Operator):
+	bl_idname = "lens_flares.use_element_atlas"
+	bl_label = "Use Element Atlas"
+	bl_description = "Pack all element images into one texture that is shared by every flare."
+	
+	includeElementsFolder = bpy.props.BoolProperty(name = "Include Elements Folder", default = False, description = "Also pack images that no flare in this scene uses yet.")
+	
+	def execute(self, context):
+		useElementAtlas(self.includeElementsFolder)
 		return{"FINISHED"}
 		
 class DuplicateLensFlare(bpy.types.Operator):
@@ -1105,18 +2893,89 @@ class DuplicateLensFlare(bpy.types.Operator):
 	flareName = bpy.props.StringProperty()
 	
 	def execute(self, context):
-		duplicateLensFlare(bpy.data.objects[self.flareName])
+		flareControler = bpy.data.objects.get(self.flareName)
+		if flareControler is None: return cancelForMissingObject(self, self.flareName)
+		duplicateLensFlare(flareControler)
 		return{"FINISHED"}
 		
+class ResetLensFlareProfile(bpy.types.Operator):
+	bl_idname = "lens_flares.reset_profile"
+	bl_label = "Reset Profile"
+	bl_description = "Forget all recorded timings."
+	
+	def execute(self, context):
+		resetProfile()
+		return{"FINISHED"}
+		
+class ExportLensFlareProfileTrace(bpy.types.Operator):
+	bl_idname = "lens_flares.export_profile_trace"
+	bl_label = "Export Profile Trace"
+	bl_description = "Write the recorded timings as Chrome trace events, e.g. for chrome://tracing."
+	
+	filepath = bpy.props.StringProperty(subtype="FILE_PATH")
+	
+	def execute(self, context):
+		path = self.filepath
+		if not path.endswith(".json"): path += ".json"
+		writeTraceEvents(path)
+		return{"FINISHED"}
+		
+	def invoke(self, context, event):
+		folder = os.path.dirname(bpy.data.filepath) if bpy.data.filepath != "" else os.path.expanduser("~")
+		self.filepath = os.path.join(folder, "lens flare trace.json")
+		context.window_manager.fileselect_add(self)
+		return {'RUNNING_MODAL'}
+		
 		
 		
 # register
 ##################################
 
 def register():
+	global presetPreviews
 	bpy.utils.register_module(__name__)
+	presetPreviews = bpy.utils.previews.new()
+	bpy.types.WindowManager.lens_flare_preset = bpy.props.EnumProperty(name = "Preset", items = getPresetPreviewItems)
+	bpy.types.WindowManager.lens_flare_preset_name = bpy.props.StringProperty(name = "Name", update = updatePresetFilter, description = "Only show presets whose flare name contains this text.")
+	bpy.types.WindowManager.lens_flare_preset_image = bpy.props.StringProperty(name = "Image", update = updatePresetFilter, description = "Only show presets that use this element image, e.g. streak1.jpg.")
+	bpy.types.WindowManager.lens_flare_preset_min_elements = bpy.props.IntProperty(name = "Min Elements", min = 0, update = updatePresetFilter, description = "Only show presets with at least this many elements.")
+	bpy.types.Scene.lens_flare_engine = bpy.props.EnumProperty(name = "Engine", items = engineItems, default = driverEngine, description = "How new flares are evaluated.")
+	bpy.types.WindowManager.lens_flare_items = bpy.props.CollectionProperty(type = LensFlareListItem)
+	bpy.types.WindowManager.lens_flare_index = bpy.props.IntProperty(default = -1, update = activeFlareListIndexChanged)
+	bpy.types.WindowManager.lens_flare_element_items = bpy.props.CollectionProperty(type = LensFlareListItem)
+	bpy.types.WindowManager.lens_flare_element_index = bpy.props.IntProperty(default = -1, update = activeElementListIndexChanged)
+	bpy.types.WindowManager.lens_flare_profiling = bpy.props.BoolProperty(name = "Profiling", default = False, update = profilingChanged, description = "Record how long flare creation, handlers and panels take.")
+	bpy.app.handlers.load_post.append(rebuildIndicesHandler)
+	bpy.app.handlers.undo_post.append(rebuildIndicesHandler)
+	bpy.app.handlers.redo_post.append(rebuildIndicesHandler)
+	bpy.app.handlers.frame_change_post.append(handlerEngineFrameChangeHandler)
+	bpy.app.handlers.scene_update_post.append(handlerEngineSceneUpdateHandler)
+	bpy.app.handlers.scene_update_post.append(flareListsSceneUpdateHandler)
+	bpy.app.handlers.frame_change_pre.append(profilingFrameChangePreHandler)
+	bpy.app.handlers.frame_change_post.insert(0, profilingFrameChangePostHandler)
 
 def unregister():
+	bpy.app.handlers.load_post.remove(rebuildIndicesHandler)
+	bpy.app.handlers.undo_post.remove(rebuildIndicesHandler)
+	bpy.app.handlers.redo_post.remove(rebuildIndicesHandler)
+	bpy.app.handlers.frame_change_post.remove(handlerEngineFrameChangeHandler)
+	bpy.app.handlers.scene_update_post.remove(handlerEngineSceneUpdateHandler)
+	bpy.app.handlers.scene_update_post.remove(flareListsSceneUpdateHandler)
+	bpy.app.handlers.frame_change_pre.remove(profilingFrameChangePreHandler)
+	bpy.app.handlers.frame_change_post.remove(profilingFrameChangePostHandler)
+	del bpy.types.Scene.lens_flare_engine
+	del bpy.types.WindowManager.lens_flare_preset
+	del bpy.types.WindowManager.lens_flare_preset_name
+	del bpy.types.WindowManager.lens_flare_preset_image
+	del bpy.types.WindowManager.lens_flare_preset_min_elements
+	del bpy.types.WindowManager.lens_flare_items
+	del bpy.types.WindowManager.lens_flare_index
+	del bpy.types.WindowManager.lens_flare_element_items
+	del bpy.types.WindowManager.lens_flare_element_index
+	del bpy.types.WindowManager.lens_flare_profiling
+	setProfilingEnabled(False)
+	closePresetIndex()
+	bpy.utils.previews.remove(presetPreviews)
 	bpy.utils.unregister_module(__name__)
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+# measures how rig construction and object lookups scale without starting blender:
+#   python benchmarks/bench_lens_flares.py [--quick] [--output results.json] [--baseline old.json]
+#
+# the addon runs against fake_bpy, so the seconds only compare runs on the same machine;
+# the counters (operators, drivers, constraints, lookups, scans) are exact and machine independent
+# with --baseline the exit code is 1 when any counter grew or a timing got slower than the tolerance
+
+import sys, os, json, time, argparse, platform, importlib.util
+
+benchmarkFolder = os.path.dirname(os.path.abspath(__file__))
+addonFolder = os.path.dirname(benchmarkFolder)
+sys.path.insert(0, benchmarkFolder)
+import fake_bpy
+
+flareAmounts = [1, 10, 100]
+elementAmounts = [5, 20, 100]
+sceneSizes = [1000, 10000, 50000]
+quickFlareAmounts = [1, 10]
+quickElementAmounts = [5, 20]
+quickSceneSizes = [1000, 10000]
+lookupRepetitions = 100
+sceneSizeFlares = 10
+sceneSizeElements = 5
+elementImageNames = ["circle.jpg", "glow1.jpg", "hexagon_soft_1.jpg", "streak1.jpg", "ring1.jpg"]
+# timings below this many seconds are noise
+timeNoiseFloor = 0.005
+
+def loadAddon():
+	fake_bpy.install()
+	spec = importlib.util.spec_from_file_location("lens_flares", os.path.join(addonFolder, "__init__.py"), submodule_search_locations = [addonFolder])
+	addon = importlib.util.module_from_spec(spec)
+	sys.modules["lens_flares"] = addon
+	spec.loader.exec_module(addon)
+	addon.register()
+	return addon
+	
+def measure(results, parameters, operation, function, calls = 1):
+	fake_bpy.resetCounters()
+	start = time.perf_counter()
+	for i in range(calls):
+		result = function()
+	seconds = time.perf_counter() - start
+	record = dict(parameters)
+	record.update(operation = operation, calls = calls, seconds = round(seconds, 6), counters = dict(sorted(fake_bpy.counters.items())))
+	results.append(record)
+	return result
+	
+	
+# scenes
+##################################
+
+def newScene(addon, fillerAmount = 0):
+	fake_bpy.resetData()
+	fake_bpy.loadFile()
+	bpy = fake_bpy.bpyModule
+	camera = addon.newCamera()
+	bpy.context.scene.camera = camera
+	newFillerObjects(fillerAmount)
+	return camera
+	
+def newFillerObjects(amount):
+	# half empties, half meshes sharing one mesh, like a set dressed scene
+	bpy = fake_bpy.bpyModule
+	mesh = bpy.data.meshes.new("filler mesh")
+	for index in range(amount):
+		object = bpy.data.objects.new("filler " + str(index), mesh if index % 2 == 0 else None)
+		bpy.context.scene.objects.link(object)
+		
+def newTargets(amount):
+	bpy = fake_bpy.bpyModule
+	targets = []
+	for index in range(amount):
+		target = bpy.data.objects.new("light " + str(index), None)
+		target.location = (index, 10.0, 2.0)
+		bpy.context.scene.objects.link(target)
+		targets.append(target)
+	return targets
+	
+def getElementDatas(addon, amount):
+	return [addon.FlareElementData(name = "element " + str(index), imageName = elementImageNames[index % len(elementImageNames)], position = index / amount)
+		for index in range(amount)]
+		
+def newFlaresWithElements(addon, camera, targets, elementAmount, engine):
+	flareControlers = [addon.newLensFlare(camera, target, engine) for target in targets]
+	for flareControler in flareControlers:
+		for elementData in getElementDatas(addon, elementAmount):
+			addon.newFlareElementFromData(flareControler, elementData)
+	return flareControlers
+	
+	
+# scenarios
+##################################
+
+def benchmarkConstruction(addon, results, flareAmount, elementAmount, engine):
+	parameters = { "scenario" : "construction", "engine" : engine, "flares" : flareAmount, "elements" : elementAmount, "sceneObjects" : 0 }
+	camera = newScene(addon)
+	targets = newTargets(flareAmount)
+	flareControlers = measure(results, parameters, "newLensFlare", lambda: [addon.newLensFlare(camera, target, engine) for target in targets])
+	
+	def newElements():
+		for flareControler in flareControlers:
+			for elementData in getElementDatas(addon, elementAmount):
+				addon.newFlareElementFromData(flareControler, elementData)
+	measure(results, parameters, "newFlareElement", newElements)
+	measure(results, parameters, "getAllFlares", addon.getAllFlares, calls = lookupRepetitions)
+	measure(results, parameters, "deleteFlare", lambda: [addon.deleteFlare(flareControler) for flareControler in flareControlers])
+	
+def benchmarkSceneSize(addon, results, sceneSize, engine):
+	parameters = { "scenario" : "sceneSize", "engine" : engine, "flares" : sceneSizeFlares, "elements" : sceneSizeElements, "sceneObjects" : sceneSize }
+	camera = newScene(addon, sceneSize)
+	flareControlers = newFlaresWithElements(addon, camera, newTargets(sceneSizeFlares), sceneSizeElements, engine)
+	scene = fake_bpy.bpyModule.context.scene
+	scene.objects.active = addon.getPlaneFromElement(addon.getDataElementsFromFlare(flareControlers[0])[0])
+	scene.objects.active.select = True
+	
+	measure(results, parameters, "loadFile", fake_bpy.loadFile)
+	measure(results, parameters, "getAllFlares", addon.getAllFlares, calls = lookupRepetitions)
+	measure(results, parameters, "getSelectedFlares", addon.getSelectedFlares, calls = lookupRepetitions)
+	measure(results, parameters, "sceneUpdate", fake_bpy.updateScene, calls = lookupRepetitions)
+	measure(results, parameters, "drawPanels", lambda: drawPanels(addon), calls = lookupRepetitions)
+	target = newTargets(1)[0]
+	measure(results, parameters, "newLensFlare", lambda: newFlaresWithElements(addon, camera, [target], sceneSizeElements, engine))
+	measure(results, parameters, "deleteFlare", lambda: addon.deleteFlare(flareControlers[0]))
+	
+def drawPanels(addon):
+	context = fake_bpy.bpyModule.context
+	for panelClass in [addon.LensFlaresPanel, addon.LensFlareSettingsPanel, addon.LensFlareElementSettingsPanel]:
+		panelClass().draw(context)
+		
+def runBenchmarks(addon, quick, engines):
+	results = []
+	for engine in engines:
+		for flareAmount in (quickFlareAmounts if quick else flareAmounts):
+			for elementAmount in (quickElementAmounts if quick else elementAmounts):
+				benchmarkConstruction(addon, results, flareAmount, elementAmount, engine)
+		for sceneSize in (quickSceneSizes if quick else sceneSizes):
+			benchmarkSceneSize(addon, results, sceneSize, engine)
+	return results
+	
+	
+# regressions
+##################################
+
+def getRecordKey(record):
+	return (record["scenario"], record["engine"], record["flares"], record["elements"], record["sceneObjects"], record["operation"])
+	
+def findRegressions(results, baselineResults, tolerance):
+	baseline = { getRecordKey(record) : record for record in baselineResults }
+	regressions = []
+	for record in results:
+		old = baseline.get(getRecordKey(record))
+		if old is None: continue
+		for name, value in record["counters"].items():
+			if value > old["counters"].get(name, 0):
+				regressions.append(dict(key = list(getRecordKey(record)), counter = name, before = old["counters"].get(name, 0), after = value))
+		if record["seconds"] > old["seconds"] * (1 + tolerance) and record["seconds"] - old["seconds"] > timeNoiseFloor:
+			regressions.append(dict(key = list(getRecordKey(record)), counter = "seconds", before = old["seconds"], after = record["seconds"]))
+	return regressions
+	
+	
+# main
+##################################
+
+def parseArguments():
+	parser = argparse.ArgumentParser(description = "Benchmark lens flare construction and lookups against a fake bpy.")
+	parser.add_argument("--output", help = "write the results to this json file instead of stdout")
+	parser.add_argument("--quick", action = "store_true", help = "skip the largest flare, element and scene sizes")
+	parser.add_argument("--engines", default = "DRIVERS", help = "comma separated flare engines, e.g. DRIVERS,COMPACT,HANDLER")
+	parser.add_argument("--baseline", help = "results of an earlier run to check for regressions")
+	parser.add_argument("--tolerance", type = float, default = 0.25, help = "allowed relative slowdown against the baseline")
+	return parser.parse_args()
+	
+def main():
+	arguments = parseArguments()
+	addon = loadAddon()
+	results = runBenchmarks(addon, arguments.quick, arguments.engines.split(","))
+	report = { "benchmark" : "lens flares", "python" : platform.python_version(), "quick" : arguments.quick, "results" : results }
+	
+	exitCode = 0
+	if arguments.baseline is not None:
+		with open(arguments.baseline) as file:
+			report["regressions"] = findRegressions(results, json.load(file)["results"], arguments.tolerance)
+		if len(report["regressions"]) > 0: exitCode = 1
+		
+	if arguments.output is None: print(json.dumps(report, indent = 1))
+	else:
+		with open(arguments.output, "w") as file:
+			json.dump(report, file, indent = 1)
+	return exitCode
+	
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,1095 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import sys, os, types, tempfile
+
+# in-process stand-in for the parts of bpy the addon touches; it models data, not evaluation
+# everything that is expensive in blender (operators, drivers, constraints, object lookups and scans) is counted
+
+counters = {}
+
+def count(name, amount = 1):
+	counters[name] = counters.get(name, 0) + amount
+def resetCounters():
+	counters.clear()
+	
+class Struct:
+	def __init__(self, **attributes):
+		self.__dict__.update(attributes)
+		
+def setUser(old, new):
+	if old is not None: old._users -= 1
+	if new is not None: new._users += 1
+	
+	
+# mathutils
+##################################
+
+class Vector(list):
+	def copy(self):
+		return type(self)(self)
+	def getX(self): return self[0]
+	def setX(self, value): self[0] = value
+	def getY(self): return self[1]
+	def setY(self, value): self[1] = value
+	def getZ(self): return self[2]
+	def setZ(self, value): self[2] = value
+	x = property(getX, setX)
+	y = property(getY, setY)
+	z = property(getZ, setZ)
+	
+class Euler(Vector): pass
+class Color(Vector): pass
+	
+def getIdentityRows():
+	return [[1.0 if row == column else 0.0 for column in range(4)] for row in range(4)]
+	
+class Matrix(list):
+	def __init__(self, rows = None):
+		list.__init__(self, [list(row) for row in (getIdentityRows() if rows is None else rows)])
+	def identity(self):
+		self[:] = getIdentityRows()
+	def copy(self):
+		return Matrix(self)
+	@property
+	def translation(self):
+		return Vector(row[3] for row in self[:3])
+		
+		
+# rna properties
+##################################
+
+propertyFallbacks = {
+	"BoolProperty" : False,
+	"IntProperty" : 0,
+	"FloatProperty" : 0.0,
+	"StringProperty" : "" }
+	
+class Property:
+	def __init__(self, kind, options):
+		self.kind = kind
+		self.options = options
+		
+	def getDefault(self):
+		if self.kind == "CollectionProperty": return PropertyCollection(self.options["type"])
+		if self.kind == "PointerProperty": return self.options["type"]()
+		if "default" in self.options: return self.options["default"]
+		if self.kind == "EnumProperty":
+			items = self.options.get("items", [])
+			return items[0][0] if isinstance(items, list) and len(items) > 0 else ""
+		return propertyFallbacks.get(self.kind, 0.0)
+		
+	def __get__(self, instance, owner):
+		if instance is None: return self
+		values = instance.__dict__.setdefault("rnaValues", {})
+		if self not in values: values[self] = self.getDefault()
+		return values[self]
+		
+	def __set__(self, instance, value):
+		count("rnaPropertyWrites")
+		instance.__dict__.setdefault("rnaValues", {})[self] = value
+		update = self.options.get("update")
+		if update is not None: update(instance, context)
+		
+class PropertyCollection(list):
+	def __init__(self, type):
+		list.__init__(self)
+		self.type = type
+	def add(self):
+		item = self.type()
+		self.append(item)
+		return item
+	def remove(self, index):
+		del self[index]
+		
+def newPropertyFunction(kind):
+	return lambda **options: Property(kind, options)
+	
+	
+# id data
+##################################
+
+class ID:
+	def __init__(self, name):
+		self._name = name
+		self._users = 0
+		self.collection = None
+		self.properties = {}
+		self.animation_data = None
+		self.use_fake_user = False
+		self.is_updated = False
+		self.library = None
+		
+	def getName(self):
+		return self._name
+	def setName(self, name):
+		if self.collection is None: self._name = name
+		else: self.collection.rename(self, name)
+	name = property(getName, setName)
+	
+	@property
+	def users(self):
+		return self._users
+		
+	def __getitem__(self, key):
+		return self.properties[key]
+	def __setitem__(self, key, value):
+		count("customPropertyWrites")
+		self.properties[key] = value
+	def __delitem__(self, key):
+		del self.properties[key]
+	def __contains__(self, key):
+		return key in self.properties
+	def get(self, key, fallback = None):
+		return self.properties.get(key, fallback)
+	def keys(self):
+		return self.properties.keys()
+	def items(self):
+		return self.properties.items()
+		
+	def animation_data_create(self):
+		if self.animation_data is None: self.animation_data = AnimationData()
+		return self.animation_data
+	def animation_data_clear(self):
+		if self.animation_data is not None: self.animation_data.action = None
+		self.animation_data = None
+		
+	def driver_add(self, path, index = -1):
+		drivers = self.animation_data_create().drivers
+		fcurve = drivers.find(path, index)
+		if fcurve is None:
+			count("drivers")
+			fcurve = drivers.new(path, index)
+			fcurve.driver = Driver()
+		return fcurve
+	def driver_remove(self, path, index = -1):
+		if self.animation_data is None: return False
+		fcurve = self.animation_data.drivers.find(path, index)
+		if fcurve is not None: self.animation_data.drivers.remove(fcurve)
+		return fcurve is not None
+		
+	def keyframe_insert(self, data_path, index = -1, frame = None, group = ""):
+		count("keyframeInserts")
+		action = self.animation_data_create().action
+		if action is None:
+			action = data.actions.new(self.name + "Action")
+			self.animation_data.action = action
+		fcurve = action.fcurves.find(data_path, max(index, 0))
+		if fcurve is None: fcurve = action.fcurves.new(data_path, index = max(index, 0))
+		fcurve.keyframe_points.insert(context.scene.frame_current if frame is None else frame, 0.0)
+		return True
+		
+	def freeReferences(self):
+		if self.animation_data is not None: self.animation_data.action = None
+		
+class IDCollection:
+	def __init__(self, countName, newID):
+		self.countName = countName
+		self.newID = newID
+		self.ids = {}
+		self.is_updated = False
+		
+	def new(self, name, *args, **kwargs):
+		id = self.newID(self.getUniqueName(name), *args, **kwargs)
+		count(self.countName + "Creations")
+		self.link(id)
+		return id
+		
+	def link(self, id):
+		id.collection = self
+		self.ids[id._name] = id
+		
+	def getUniqueName(self, name, ignore = None):
+		if self.ids.get(name, ignore) is ignore: return name
+		index = 1
+		while self.ids.get("{}.{:03d}".format(name, index), ignore) is not ignore:
+			index += 1
+		return "{}.{:03d}".format(name, index)
+		
+	def rename(self, id, name):
+		name = self.getUniqueName(name, ignore = id)
+		del self.ids[id._name]
+		id._name = name
+		self.ids[name] = id
+		
+	def remove(self, id):
+		count(self.countName + "Removals")
+		del self.ids[id._name]
+		id.collection = None
+		id.freeReferences()
+		
+	def get(self, name, fallback = None):
+		count(self.countName + "Lookups")
+		return self.ids.get(name, fallback)
+		
+	def __getitem__(self, key):
+		count(self.countName + "Lookups")
+		if isinstance(key, int): return list(self.ids.values())[key]
+		return self.ids[key]
+		
+	def __contains__(self, key):
+		if isinstance(key, str): return key in self.ids
+		return key in self.ids.values()
+		
+	def __iter__(self):
+		count(self.countName + "Scans")
+		return iter(list(self.ids.values()))
+		
+	def __len__(self):
+		return len(self.ids)
+		
+	def keys(self):
+		return list(self.ids.keys())
+	def values(self):
+		return list(self.ids.values())
+		
+		
+# objects
+##################################
+
+class Object(ID):
+	def __init__(self, name, objectData):
+		ID.__init__(self, name)
+		self._data = None
+		self.data = objectData
+		self.type = getObjectType(objectData)
+		self.location = (0.0, 0.0, 0.0)
+		self.rotation_euler = (0.0, 0.0, 0.0)
+		self.scale = (1.0, 1.0, 1.0)
+		self.matrix_world = Matrix()
+		self.matrix_parent_inverse = Matrix()
+		self.parent = None
+		self.constraints = ConstraintCollection()
+		self.color = [1.0, 1.0, 1.0, 1.0]
+		self.hide = False
+		self.hide_render = False
+		self.hide_select = False
+		self.select = False
+		self.empty_draw_type = "PLAIN_AXES"
+		self.layers = [True] + [False] * 19
+		self.is_updated_data = False
+		self.empty_draw_size = 1.0
+		self.draw_type = "TEXTURED"
+		self.cycles_visibility = Struct(camera = True, diffuse = True, glossy = True, transmission = True, shadow = True, scatter = True)
+		self.users_scene = []
+		self.slots = []
+		
+	def getData(self):
+		return self._data
+	def setData(self, objectData):
+		setUser(self._data, objectData)
+		self._data = objectData
+	data = property(getData, setData)
+	
+	def setLocation(self, location): self._location = Vector(location)
+	def setRotation(self, rotation): self._rotation = Euler(rotation)
+	def setScale(self, scale): self._scale = Vector(scale)
+	def setMatrixWorld(self, matrix): self._matrixWorld = Matrix(matrix)
+	location = property(lambda self: self._location, setLocation)
+	rotation_euler = property(lambda self: self._rotation, setRotation)
+	scale = property(lambda self: self._scale, setScale)
+	matrix_world = property(lambda self: self._matrixWorld, setMatrixWorld)
+	
+	@property
+	def material_slots(self):
+		materials = getattr(self._data, "materials", [])
+		while len(self.slots) < len(materials):
+			self.slots.append(MaterialSlot(self, len(self.slots)))
+		del self.slots[len(materials):]
+		return self.slots
+		
+	@property
+	def children(self):
+		return [object for object in data.objects.ids.values() if object.parent is self]
+		
+	def freeReferences(self):
+		ID.freeReferences(self)
+		for scene in list(self.users_scene):
+			scene.objects.unlink(self)
+		for slot in self.slots:
+			slot.setObjectMaterial(None)
+		self.data = None
+		
+def getObjectType(objectData):
+	if objectData is None: return "EMPTY"
+	return objectData.objectType
+	
+class MaterialSlot:
+	def __init__(self, object, index):
+		self.object = object
+		self.index = index
+		self.link = "DATA"
+		self.objectMaterial = None
+		
+	def setObjectMaterial(self, material):
+		setUser(self.objectMaterial, material)
+		self.objectMaterial = material
+		
+	def getMaterial(self):
+		if self.link == "OBJECT": return self.objectMaterial
+		return self.object.data.materials[self.index]
+	def setMaterial(self, material):
+		if self.link == "OBJECT": self.setObjectMaterial(material)
+		else: self.object.data.materials[self.index] = material
+	material = property(getMaterial, setMaterial)
+	
+	
+# constraints
+##################################
+
+class Constraint:
+	def __init__(self, type, name):
+		self.type = type
+		self.name = name
+		self.target = None
+		self.influence = 1.0
+		self.mute = False
+		self.show_expanded = True
+		self.owner_space = "WORLD"
+		self.target_space = "WORLD"
+		
+class ConstraintCollection:
+	def __init__(self):
+		self.constraints = []
+		
+	def new(self, type):
+		count("constraints")
+		name = type.replace("_", " ").title()
+		names = set(constraint.name for constraint in self.constraints)
+		uniqueName = name
+		index = 1
+		while uniqueName in names:
+			uniqueName = "{}.{:03d}".format(name, index)
+			index += 1
+		constraint = Constraint(type, uniqueName)
+		self.constraints.append(constraint)
+		return constraint
+		
+	def remove(self, constraint):
+		count("constraintRemovals")
+		self.constraints.remove(constraint)
+		
+	def find(self, name):
+		for constraint in self.constraints:
+			if constraint.name == name: return constraint
+		return None
+		
+	def get(self, name, fallback = None):
+		constraint = self.find(name)
+		return fallback if constraint is None else constraint
+		
+	def __getitem__(self, key):
+		if isinstance(key, int): return self.constraints[key]
+		constraint = self.find(key)
+		if constraint is None: raise KeyError(key)
+		return constraint
+		
+	def __contains__(self, name):
+		return self.find(name) is not None
+	def __iter__(self):
+		return iter(list(self.constraints))
+	def __len__(self):
+		return len(self.constraints)
+		
+		
+# animation and drivers
+##################################
+
+class AnimationData:
+	def __init__(self):
+		self._action = None
+		self.drivers = FCurveCollection()
+		
+	def getAction(self):
+		return self._action
+	def setAction(self, action):
+		setUser(self._action, action)
+		self._action = action
+	action = property(getAction, setAction)
+	
+class FCurveCollection:
+	def __init__(self):
+		self.fcurves = []
+		
+	def new(self, data_path, index = 0, action_group = ""):
+		fcurve = FCurve(data_path, index)
+		self.fcurves.append(fcurve)
+		return fcurve
+		
+	def find(self, data_path, index = 0):
+		for fcurve in self.fcurves:
+			if fcurve.data_path == data_path and fcurve.array_index == index: return fcurve
+		return None
+		
+	def remove(self, fcurve):
+		self.fcurves.remove(fcurve)
+		
+	def __iter__(self):
+		return iter(list(self.fcurves))
+	def __len__(self):
+		return len(self.fcurves)
+	def __getitem__(self, index):
+		return self.fcurves[index]
+		
+class FCurve:
+	def __init__(self, data_path, index):
+		self.data_path = data_path
+		self.array_index = index
+		self.driver = None
+		self.keyframe_points = KeyframePoints()
+		self.modifiers = FCurveModifiers()
+		self.mute = False
+		
+	def update(self):
+		self.keyframe_points.points.sort(key = lambda keyframe: keyframe.co[0])
+		
+	def evaluate(self, frame):
+		points = self.keyframe_points.points
+		if len(points) == 0: return 0.0
+		for point in reversed(points):
+			if point.co[0] <= frame: return point.co[1]
+		return points[0].co[1]
+		
+class FCurveModifiers(list):
+	def new(self, type):
+		modifier = Struct(type = type)
+		self.append(modifier)
+		return modifier
+		
+class Keyframe:
+	def __init__(self, frame = 0.0, value = 0.0):
+		self.co = Vector((frame, value))
+		self.handle_left = Vector((frame, value))
+		self.handle_right = Vector((frame, value))
+		self.handle_left_type = "AUTO_CLAMPED"
+		self.handle_right_type = "AUTO_CLAMPED"
+		self.interpolation = "BEZIER"
+		self.select_control_point = False
+		self.select_left_handle = False
+		self.select_right_handle = False
+		
+class KeyframePoints:
+	def __init__(self):
+		self.points = []
+		
+	def add(self, amount = 1):
+		count("keyframes", amount)
+		self.points.extend(Keyframe() for i in range(amount))
+		
+	def insert(self, frame, value, options = set()):
+		count("keyframes")
+		for point in self.points:
+			if point.co[0] == frame:
+				point.co[1] = value
+				return point
+		point = Keyframe(frame, value)
+		self.points.append(point)
+		return point
+		
+	def foreach_set(self, attribute, values):
+		if attribute != "co": raise AttributeError(attribute)
+		for index, point in enumerate(self.points):
+			point.co[:] = values[2 * index:2 * index + 2]
+			
+	def __iter__(self):
+		return iter(self.points)
+	def __len__(self):
+		return len(self.points)
+	def __getitem__(self, index):
+		return self.points[index]
+		
+class Driver:
+	def __init__(self):
+		self.type = "SCRIPTED"
+		self.expression = ""
+		self.variables = DriverVariables()
+		self.is_valid = True
+		self.use_self = False
+		
+class DriverVariables(list):
+	def new(self):
+		count("driverVariables")
+		variable = Struct(name = "var", type = "SINGLE_PROP", targets = [DriverTarget(), DriverTarget()])
+		self.append(variable)
+		return variable
+		
+class DriverTarget:
+	def __init__(self):
+		self.id = None
+		self.id_type = "OBJECT"
+		self.data_path = ""
+		self.transform_type = "LOC_X"
+		self.transform_space = "WORLD_SPACE"
+		self.bone_target = ""
+		
+		
+# object data
+##################################
+
+class Mesh(ID):
+	objectType = "MESH"
+	
+	def __init__(self, name):
+		ID.__init__(self, name)
+		self.vertices = []
+		self.polygons = []
+		self.materials = MeshMaterials()
+		self.uv_textures = LayerCollection()
+		self.uv_layers = self.uv_textures
+		self.vertex_colors = LayerCollection()
+		
+	def from_pydata(self, vertices, edges, faces):
+		self.vertices = [Struct(co = Vector(vertex)) for vertex in vertices]
+		self.polygons = [Struct(vertices = list(face)) for face in faces]
+		
+	def update(self, calc_edges = False):
+		pass
+		
+	@property
+	def loopAmount(self):
+		return sum(len(polygon.vertices) for polygon in self.polygons)
+		
+	def freeReferences(self):
+		ID.freeReferences(self)
+		for index in range(len(self.materials)):
+			self.materials[index] = None
+			
+class MeshMaterials(list):
+	def append(self, material):
+		setUser(None, material)
+		list.append(self, material)
+	def __setitem__(self, index, material):
+		setUser(self[index], material)
+		list.__setitem__(self, index, material)
+		
+class LayerCollection(list):
+	def __init__(self):
+		list.__init__(self)
+		self.active = None
+		
+	def new(self, name = "", mesh = None):
+		layer = Struct(name = name, data = [])
+		self.append(layer)
+		if self.active is None: self.active = layer
+		return layer
+		
+class Camera(ID):
+	objectType = "CAMERA"
+	
+	def __init__(self, name):
+		ID.__init__(self, name)
+		self.type = "PERSP"
+		self.lens = 35.0
+		self.sensor_width = 32.0
+		self.sensor_height = 18.0
+		self.sensor_fit = "AUTO"
+		self.shift_x = 0.0
+		self.shift_y = 0.0
+		self.dof_distance = 0.0
+		self.dof_object = None
+		
+class Curve(ID):
+	objectType = "CURVE"
+	
+	def __init__(self, name, type = "CURVE"):
+		ID.__init__(self, name)
+		if type == "FONT": self.body = ""
+		
+class Lamp(ID):
+	objectType = "LAMP"
+	
+	def __init__(self, name, type = "POINT"):
+		ID.__init__(self, name)
+		self.type = type
+		
+class Action(ID):
+	def __init__(self, name):
+		ID.__init__(self, name)
+		self.fcurves = FCurveCollection()
+		
+class Image(ID):
+	def __init__(self, name, width = 256, height = 256, alpha = False, float_buffer = False):
+		ID.__init__(self, name)
+		self.size = [width, height]
+		self.filepath = ""
+		self.filepath_raw = ""
+		self.source = "GENERATED"
+		self.channels = 4
+		self.packed_file = None
+		self.file_format = "PNG"
+		self.pixels = [0.0] * (4 * width * height)
+		
+	def scale(self, width, height):
+		self.size = [width, height]
+		self.pixels = [0.0] * (4 * width * height)
+		
+	def save(self):
+		open(self.filepath_raw, "wb").close()
+		
+	def pack(self, as_png = False):
+		self.packed_file = Struct(size = len(self.pixels))
+		
+	def reload(self):
+		pass
+		
+		
+# materials and nodes
+##################################
+
+class Material(ID):
+	def __init__(self, name):
+		ID.__init__(self, name)
+		self._useNodes = False
+		self.node_tree = None
+		self.diffuse_color = Color((0.8, 0.8, 0.8))
+		
+	def getUseNodes(self):
+		return self._useNodes
+	def setUseNodes(self, useNodes):
+		self._useNodes = useNodes
+		if useNodes and self.node_tree is None:
+			self.node_tree = NodeTree("Shader Nodetree", "ShaderNodeTree")
+			self.node_tree.nodes.new("ShaderNodeBsdfDiffuse")
+			self.node_tree.nodes.new("ShaderNodeOutputMaterial")
+	use_nodes = property(getUseNodes, setUseNodes)
+	
+	def freeReferences(self):
+		ID.freeReferences(self)
+		if self.node_tree is not None: self.node_tree.freeReferences()
+		
+class NodeTree(ID):
+	def __init__(self, name, type = "ShaderNodeTree"):
+		ID.__init__(self, name)
+		self.type = type
+		self.nodes = NodeCollection()
+		self.links = NodeLinks()
+		self.inputs = SocketCollection()
+		self.outputs = SocketCollection()
+		
+	def freeReferences(self):
+		ID.freeReferences(self)
+		for node in self.nodes:
+			self.nodes.remove(node)
+			
+class NodeCollection:
+	def __init__(self):
+		self.nodes = []
+		
+	def new(self, type):
+		count("nodes")
+		name = type
+		names = set(node.name for node in self.nodes)
+		index = 1
+		while name in names:
+			name = "{}.{:03d}".format(type, index)
+			index += 1
+		node = Node(type, name)
+		self.nodes.append(node)
+		return node
+		
+	def remove(self, node):
+		node.image = None
+		node.node_tree = None
+		self.nodes.remove(node)
+		
+	def get(self, name, fallback = None):
+		for node in self.nodes:
+			if node.name == name: return node
+		return fallback
+		
+	def __iter__(self):
+		return iter(list(self.nodes))
+	def __len__(self):
+		return len(self.nodes)
+	def __contains__(self, name):
+		return self.get(name) is not None
+	def __getitem__(self, key):
+		if isinstance(key, int): return self.nodes[key]
+		node = self.get(key)
+		if node is None: raise KeyError(key)
+		return node
+		
+class Node:
+	def __init__(self, type, name):
+		self.type = type
+		self.name = name
+		self.label = ""
+		self.location = Vector((0.0, 0.0))
+		self.inputs = SocketCollection()
+		self.outputs = SocketCollection()
+		self._image = None
+		self._nodeTree = None
+		
+	def getImage(self):
+		return self._image
+	def setImage(self, image):
+		setUser(self._image, image)
+		self._image = image
+	image = property(getImage, setImage)
+	
+	def getNodeTree(self):
+		return self._nodeTree
+	def setNodeTree(self, nodeTree):
+		setUser(self._nodeTree, nodeTree)
+		self._nodeTree = nodeTree
+	node_tree = property(getNodeTree, setNodeTree)
+	
+class SocketCollection:
+	# sockets are created on first access since the fake nodes don't know their layout
+	def __init__(self):
+		self.sockets = []
+		
+	def new(self, type, name):
+		socket = Struct(type = type, name = name, default_value = 0.0, is_linked = False)
+		self.sockets.append(socket)
+		return socket
+		
+	def __getitem__(self, key):
+		if isinstance(key, int):
+			while len(self.sockets) <= key:
+				self.new("", "Socket " + str(len(self.sockets)))
+			return self.sockets[key]
+		for socket in self.sockets:
+			if socket.name == key: return socket
+		return self.new("", key)
+		
+	def __iter__(self):
+		return iter(self.sockets)
+	def __len__(self):
+		return len(self.sockets)
+		
+class NodeLinks(list):
+	def new(self, input, output):
+		count("nodeLinks")
+		input.is_linked = True
+		output.is_linked = True
+		link = Struct(from_socket = output, to_socket = input)
+		self.append(link)
+		return link
+		
+		
+# scene and context
+##################################
+
+class SceneObjects:
+	def __init__(self, scene):
+		self.scene = scene
+		# object -> None, keeps the link order
+		self.objects = {}
+		self.active = None
+		
+	def link(self, object):
+		count("sceneLinks")
+		self.objects[object] = None
+		object.users_scene.append(self.scene)
+		
+	def unlink(self, object):
+		del self.objects[object]
+		object.users_scene.remove(self.scene)
+		if self.active is object: self.active = None
+		
+	def get(self, name, fallback = None):
+		object = data.objects.ids.get(name)
+		return object if object in self.objects else fallback
+		
+	def __iter__(self):
+		count("sceneObjectScans")
+		return iter(list(self.objects))
+	def __len__(self):
+		return len(self.objects)
+	def __contains__(self, object):
+		return object in self.objects
+		
+class Scene(ID):
+	def __init__(self, name):
+		ID.__init__(self, name)
+		self.objects = SceneObjects(self)
+		self.camera = None
+		self.layers = [True] + [False] * 19
+		self.frame_current = 1
+		self.frame_start = 1
+		self.frame_end = 250
+		self.render = Struct(resolution_x = 1920, resolution_y = 1080, resolution_percentage = 100, pixel_aspect_x = 1.0, pixel_aspect_y = 1.0, engine = "CYCLES")
+		self.cycles = Struct(transparent_min_bounces = 8, transparent_max_bounces = 8)
+		
+	def frame_set(self, frame, subframe = 0.0):
+		count("frameSets")
+		self.frame_current = frame
+		callHandlers("frame_change_pre", self)
+		callHandlers("frame_change_post", self)
+		
+	def update(self):
+		count("sceneUpdates")
+		
+class WindowManager:
+	def __init__(self):
+		self.windows = []
+		self.progress = None
+	def progress_begin(self, min, max):
+		self.progress = min
+	def progress_update(self, value):
+		self.progress = value
+	def progress_end(self):
+		self.progress = None
+		
+class Context:
+	def __init__(self):
+		self.scene = None
+		self.window_manager = WindowManager()
+		self.area = None
+		self.region = None
+		self.mode = "OBJECT"
+		
+	@property
+	def screen(self):
+		return Struct(scene = self.scene, areas = [])
+	@property
+	def active_object(self):
+		return self.scene.objects.active
+	@property
+	def object(self):
+		return self.scene.objects.active
+	@property
+	def selected_objects(self):
+		return [object for object in self.scene.objects if object.select]
+		
+class BlendData:
+	def __init__(self):
+		self.filepath = ""
+		self.is_dirty = False
+		self.objects = IDCollection("object", Object)
+		self.meshes = IDCollection("mesh", Mesh)
+		self.cameras = IDCollection("camera", Camera)
+		self.curves = IDCollection("curve", Curve)
+		self.lamps = IDCollection("lamp", Lamp)
+		self.materials = IDCollection("material", Material)
+		self.node_groups = IDCollection("nodeGroup", NodeTree)
+		self.images = IDCollection("image", Image)
+		self.actions = IDCollection("action", Action)
+		self.scenes = IDCollection("scene", Scene)
+		
+		
+# interface
+##################################
+
+class Layout:
+	# every call returns something that can be drawn into again
+	def __init__(self):
+		self.active = True
+		self.enabled = True
+		self.alignment = "EXPAND"
+		self.scale_x = 1.0
+		self.scale_y = 1.0
+		
+	def __getattr__(self, name):
+		def draw(*args, **kwargs):
+			count("layoutCalls")
+			return Layout()
+		return draw
+		
+class Operator:
+	bl_idname = ""
+	bl_label = ""
+	bl_description = ""
+	bl_options = set()
+	
+	def report(self, type, message):
+		count("operatorReports")
+		
+class Panel:
+	bl_space_type = ""
+	bl_region_type = ""
+	bl_label = ""
+	
+	def __init__(self):
+		self.layout = Layout()
+		
+class PropertyGroup:
+	name = Property("StringProperty", {})
+	
+class UIList:
+	filter_name = ""
+	use_filter_invert = False
+	use_filter_sort_reverse = False
+	bitflag_filter_item = 1 << 30
+	
+class UI_UL_list(UIList):
+	@staticmethod
+	def filter_items_by_name(pattern, bitflag, items, propname = "name", flags = None, reverse = False):
+		return [bitflag if pattern.lower() in getattr(item, propname).lower() else 0 for item in items]
+	@staticmethod
+	def sort_items_helper(sortData, key, reverse = False):
+		order = [0] * len(sortData)
+		for newIndex, (index, value) in enumerate(sorted(sortData, key = key, reverse = reverse)):
+			order[index] = newIndex
+		return order
+	@staticmethod
+	def sort_items_by_name(items, propname = "name"):
+		return UI_UL_list.sort_items_helper([(index, getattr(item, propname)) for index, item in enumerate(items)], key = lambda pair: pair[1].lower())
+		
+		
+# operators
+##################################
+
+def selectAllObjects(action = "TOGGLE"):
+	for object in context.scene.objects:
+		object.select = action == "SELECT"
+	return {"FINISHED"}
+	
+def deleteSelectedObjects(use_global = False):
+	for object in context.selected_objects:
+		data.objects.remove(object)
+	return {"FINISHED"}
+	
+# operator id -> implementation; all others only get counted
+operatorImplementations = {
+	"object.select_all" : selectAllObjects,
+	"object.delete" : deleteSelectedObjects }
+	
+class OperatorCall:
+	def __init__(self, idname):
+		self.idname = idname
+	def __call__(self, *args, **kwargs):
+		count("ops")
+		count("ops." + self.idname)
+		implementation = operatorImplementations.get(self.idname)
+		if implementation is None: return {"FINISHED"}
+		return implementation(**kwargs)
+	def poll(self):
+		return True
+		
+class OperatorModule:
+	def __init__(self, name):
+		self.name = name
+	def __getattr__(self, name):
+		if name.startswith("__"): raise AttributeError(name)
+		return OperatorCall(self.name + "." + name)
+		
+class OperatorModules:
+	def __getattr__(self, name):
+		if name.startswith("__"): raise AttributeError(name)
+		return OperatorModule(name)
+		
+		
+# handlers
+##################################
+
+handlerNames = ["load_pre", "load_post", "save_pre", "save_post", "undo_pre", "undo_post", "redo_pre", "redo_post",
+	"frame_change_pre", "frame_change_post", "scene_update_pre", "scene_update_post", "render_pre", "render_post"]
+	
+def persistent(function):
+	function._bpy_persistent = True
+	return function
+	
+def callHandlers(name, scene = None):
+	for handler in list(getattr(handlersModule, name)):
+		handler(context.scene if scene is None else scene)
+		
+		
+# modules
+##################################
+
+data = None
+context = Context()
+
+class TypesModule(types.ModuleType):
+	# unknown types are only subclassed or extended with properties by the addon
+	def __getattr__(self, name):
+		if name.startswith("__"): raise AttributeError(name)
+		newType = type(name, (), {})
+		setattr(self, name, newType)
+		return newType
+		
+def newModule(name, **attributes):
+	module = types.ModuleType(name)
+	module.__dict__.update(attributes)
+	return module
+	
+class PreviewCollection(dict):
+	def load(self, name, path, type):
+		self[name] = Struct(icon_id = len(self) + 1, image_size = (0, 0))
+		return self[name]
+	def new(self, name):
+		return self.load(name, "", "IMAGE")
+	def close(self):
+		self.clear()
+		
+def loadImage(imagepath, dirname = "", place_holder = False, recursive = False, ncase_cmp = True, convert_callback = None, verbose = False, relpath = None, check_existing = False, force_reload = False):
+	count("imageLoads")
+	image = data.images.new(os.path.basename(imagepath), 256, 256)
+	image.filepath = imagepath
+	image.source = "FILE"
+	return image
+	
+def getAbsolutePath(path, start = None, library = None):
+	if not path.startswith("//"): return path
+	folder = start if start is not None else os.path.dirname(data.filepath)
+	return os.path.join(folder, path[2:])
+	
+def getRelativePath(path, start = None):
+	folder = start if start is not None else os.path.dirname(data.filepath)
+	return "//" + os.path.relpath(path, folder)
+	
+handlersModule = newModule("bpy.app.handlers", persistent = persistent, **{ name : [] for name in handlerNames })
+appModule = newModule("bpy.app", handlers = handlersModule, version = (2, 71, 0), binary_path_python = sys.executable, tempdir = tempfile.gettempdir(), background = True, debug = False)
+propsModule = newModule("bpy.props", **{ kind : newPropertyFunction(kind) for kind in ["BoolProperty", "IntProperty", "FloatProperty", "StringProperty", "EnumProperty",
+	"CollectionProperty", "PointerProperty", "BoolVectorProperty", "IntVectorProperty", "FloatVectorProperty"] })
+previewsModule = newModule("bpy.utils.previews", new = PreviewCollection, remove = lambda previews: previews.close())
+utilsModule = newModule("bpy.utils", previews = previewsModule,
+	register_module = lambda name, verbose = False: count("registerModule"),
+	unregister_module = lambda name, verbose = False: count("unregisterModule"),
+	register_class = lambda cls: count("registerClass"),
+	unregister_class = lambda cls: count("unregisterClass"))
+pathModule = newModule("bpy.path", abspath = getAbsolutePath, relpath = getRelativePath, basename = os.path.basename)
+typesModule = TypesModule("bpy.types")
+typesModule.__dict__.update({ type.__name__ : type for type in [ID, Object, Mesh, Camera, Curve, Lamp, Action, Image, Material, NodeTree,
+	Scene, WindowManager, Context, Operator, Panel, PropertyGroup, UIList, UI_UL_list] })
+bpyModule = newModule("bpy", app = appModule, props = propsModule, utils = utilsModule, path = pathModule, types = typesModule, ops = OperatorModules(), data = None, context = context)
+mathutilsModule = newModule("mathutils", Vector = Vector, Matrix = Matrix, Euler = Euler, Color = Color)
+imageUtilsModule = newModule("bpy_extras.image_utils", load_image = loadImage)
+bpyExtrasModule = newModule("bpy_extras", image_utils = imageUtilsModule)
+
+def install():
+	# has to run before the addon is imported
+	sys.modules.update({ module.__name__ : module for module in [bpyModule, appModule, handlersModule, propsModule, utilsModule,
+		previewsModule, pathModule, typesModule, mathutilsModule, bpyExtrasModule, imageUtilsModule] })
+	resetData()
+	return bpyModule
+	
+def resetData():
+	# an empty file with one scene, like opening a new blend file
+	global data
+	data = BlendData()
+	bpyModule.data = data
+	context.scene = data.scenes.new("Scene")
+	context.window_manager = typesModule.WindowManager()
+	resetCounters()
+	
+def loadFile():
+	# what blender does after a file was opened
+	callHandlers("load_post")
+	
+def updateScene():
+	callHandlers("scene_update_pre")
+	callHandlers("scene_update_post")
+	data.objects.is_updated = False
+	
+def setFrame(frame):
+	context.scene.frame_set(frame)
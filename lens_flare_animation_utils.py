@@ -89,4 +89,40 @@ def selectKeyframes(keyframes, keyframeFrames):
 def setKeyframeSelection(keyframe, select):
 	keyframe.select_control_point = select
 	keyframe.select_left_handle = select
-	keyframe.select_right_handle = select
\ No newline at end of file
+	keyframe.select_right_handle = select
+	
+def getOrCreateAction(object):
+	if object.animation_data is None: object.animation_data_create()
+	if object.animation_data.action is None:
+		object.animation_data.action = bpy.data.actions.new(name = object.name + "Action")
+	return object.animation_data.action
+	
+def removeFCurve(action, dataPath, index):
+	fcurve = action.fcurves.find(dataPath, index)
+	if fcurve is not None: action.fcurves.remove(fcurve)
+	
+def newFCurveWithKeyframes(object, dataPath, index, frames, values):
+	action = getOrCreateAction(object)
+	removeFCurve(action, dataPath, index)
+	fcurve = action.fcurves.new(dataPath, index = index)
+	fcurve.keyframe_points.add(len(frames))
+	coordinates = [0.0] * (2 * len(frames))
+	coordinates[0::2] = frames
+	coordinates[1::2] = values
+	fcurve.keyframe_points.foreach_set("co", coordinates)
+	fcurve.update()
+	return fcurve
+	
+def insertKeyframesInBulk(object, dataPath, frames, valuesPerIndex):
+	for index, values in enumerate(valuesPerIndex):
+		newFCurveWithKeyframes(object, dataPath, index, frames, values)
+		
+def removeAllDrivers(object):
+	if object.animation_data is None: return
+	drivers = object.animation_data.drivers
+	for fcurve in list(drivers):
+		drivers.remove(fcurve)
+		
+def setFCurveInterpolation(fcurve, interpolation):
+	for keyframe in fcurve.keyframe_points:
+		keyframe.interpolation = interpolation
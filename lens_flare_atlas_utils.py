@@ -0,0 +1,60 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import math, numpy
+
+# packs many textures into one; rects are (u, v, width, height) with v going up
+
+atlasPadding = 2
+
+def packRectangles(sizes, maxWidth, padding = atlasPadding):
+	# shelf packing, tallest rectangles first
+	order = sorted(range(len(sizes)), key = lambda index: -sizes[index][1])
+	positions = [None] * len(sizes)
+	(x, y, shelfHeight, width) = (0, 0, 0, 0)
+	for index in order:
+		(w, h) = sizes[index]
+		if x > 0 and x + w > maxWidth:
+			y += shelfHeight
+			(x, shelfHeight) = (0, 0)
+		positions[index] = (x, y)
+		x += w + padding
+		shelfHeight = max(shelfHeight, h + padding)
+		width = max(width, x)
+	return (positions, (width, y + shelfHeight))
+
+def getAtlasMaxWidth(sizes):
+	area = sum(w * h for w, h in sizes)
+	return max(max(w for w, h in sizes), int(math.sqrt(area) * 1.2))
+
+def buildAtlas(textures, padding = atlasPadding):
+	# textures: float arrays with rows from top to bottom
+	sizes = [(texture.shape[1], texture.shape[0]) for texture in textures]
+	(positions, (width, height)) = packRectangles(sizes, getAtlasMaxWidth(sizes), padding)
+	atlas = numpy.zeros((height, width, 3), dtype = numpy.float32)
+	rects = []
+	for texture, (x, y), (w, h) in zip(textures, positions, sizes):
+		atlas[y:y + h, x:x + w] = texture[:, :, :3]
+		# half a texel inside the rect so neighbours never bleed in
+		rects.append(((x + 0.5) / width, 1 - (y + h - 0.5) / height, (w - 1) / width, (h - 1) / height))
+	return (atlas, rects)
+
+def getRectAspect(rect, atlasSize):
+	return (rect[2] * atlasSize[0]) / (rect[3] * atlasSize[1])
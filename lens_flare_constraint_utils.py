@@ -23,22 +23,24 @@ from lens_flare_utils import *
 from lens_flare_driver_utils import *
 
 def setTrackTo(child, trackTo):
-	deselectAll()
-	child.select = True
-	setActive(trackTo)
-	bpy.ops.object.track_set(type = "TRACKTO")   
+	constraint = child.constraints.new(type = "TRACK_TO")
+	constraint.target = trackTo
+	constraint.track_axis = "TRACK_NEGATIVE_Z"
+	constraint.up_axis = "UP_Y"
+	return constraint
 
 def setParent(child, parent):
 	child.parent = parent
 	
+def clearParentKeepTransform(object):
+	matrix = object.matrix_world.copy()
+	object.parent = None
+	object.matrix_world = matrix
+	
 def setParentWithoutInverse(child, parent):
-	hide = (child.hide, parent.hide)
-	child.hide = parent.hide = False
-	deselectAll()
-	child.select = True
-	setActive(parent)
-	bpy.ops.object.parent_no_inverse_set()
-	(child.hide, parent.hide) = hide
+	child.parent = parent
+	child.matrix_parent_inverse.identity()
+	child.location = [0, 0, 0]
 
 def isObjectReferenceSet(object, name):
 	if name in object.constraints:
@@ -106,7 +108,6 @@ def lockCurrentTransforms(object):
 	lockCurrentLocalScale(object)
 		
 def lockCurrentLocalLocation(object, xAxes = True, yAxes = True, zAxes = True):
-	setActive(object)
 	constraint = object.constraints.new(type = "LIMIT_LOCATION")
 	constraint.owner_space = "LOCAL"
 	
@@ -120,7 +121,6 @@ def lockCurrentLocalLocation(object, xAxes = True, yAxes = True, zAxes = True):
 	constraint.use_max_z = zAxes
 	
 def lockCurrentLocalRotation(object, xAxes = True, yAxes = True, zAxes = True):
-	setActive(object)
 	constraint = object.constraints.new(type = "LIMIT_ROTATION")
 	constraint.owner_space = "LOCAL"
 	
@@ -131,7 +131,6 @@ def lockCurrentLocalRotation(object, xAxes = True, yAxes = True, zAxes = True):
 	constraint.use_limit_z = zAxes
 	
 def lockCurrentLocalScale(object, xAxes = True, yAxes = True, zAxes = True):
-	setActive(object)
 	constraint = object.constraints.new(type = "LIMIT_SCALE")
 	constraint.owner_space = "LOCAL"
 	
@@ -162,8 +161,11 @@ def setUseMinMaxToTrue(constraint):
 	constraint.use_max_z = True
 	
 def deleteAllConstraints(object):
-	for constraint in object.constraints:
+	for constraint in list(object.constraints):
 		object.constraints.remove(constraint)
+def deleteConstraintsOfTypes(object, types):
+	for constraint in list(object.constraints):
+		if constraint.type in types: object.constraints.remove(constraint)
 		
 def getConstraintPath(constraint):
 	return 'constraints["' + constraint.name + '"]'
\ No newline at end of file
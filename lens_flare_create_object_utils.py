@@ -21,31 +21,55 @@ Created by Jacques Lucke
 import bpy
 from lens_flare_utils import *
 
+def newObject(name = "Object", data = None, location = [0, 0, 0]):
+	object = bpy.data.objects.new(getPossibleName(name), data)
+	object.location = location
+	scene = bpy.context.scene
+	scene.objects.link(object)
+	# like bpy.ops.object.add, show it on the active layers instead of only the first one
+	object.layers = scene.layers
+	return object
+
 def newEmpty(name = "Empty", location = [0, 0, 0], hide = False, type = "PLAIN_AXES"):
-	bpy.ops.object.empty_add(location = location, type = type)
-	empty = bpy.context.object
-	empty.name = getPossibleName(name)
-	if hide:
-		bpy.ops.object.hide_view_set(unselected = False)
+	empty = newObject(name, None, location)
+	empty.empty_draw_type = type
+	empty.hide = hide
 	return empty
 	
 def newText(name = "Text", location = [0, 0, 0], text = "text"):
-	bpy.ops.object.text_add(location = location)
-	textObject = bpy.context.object
-	textObject.name = getPossibleName(name)
-	textObject.data.body = text
-	return textObject
+	textData = bpy.data.curves.new(name, "FONT")
+	textData.body = text
+	return newObject(name, textData, location)
 	
-def newPlane(name = "Plane", location = [0, 0, 0], size = 1):
-	bpy.ops.mesh.primitive_plane_add(location = location)
-	plane = bpy.context.object
-	plane.name = getPossibleName(name)
-	plane.scale = [size, size, size]
-	bpy.ops.object.transform_apply(scale = True)
-	return plane
+def newPlane(name = "Plane", location = [0, 0, 0], size = 1, shareMesh = False):
+	if shareMesh: mesh = getSharedPlaneMesh(size)
+	else: mesh = newPlaneMesh(name, size)
+	return newObject(name, mesh, location)
 	
 def newCamera(name = "Camera", location = [0, 0, 0]):
-	bpy.ops.object.camera_add(location = location)
-	camera = bpy.context.object
-	camera.name = getPossibleName(name)
-	return camera
\ No newline at end of file
+	return newObject(name, bpy.data.cameras.new(name), location)
+	
+def getSharedPlaneMesh(size):
+	name = "shared plane " + str(size)
+	mesh = bpy.data.meshes.get(name)
+	if mesh is None: mesh = newPlaneMesh(name, size)
+	return mesh
+def newPlaneMesh(name, size):
+	mesh = bpy.data.meshes.new(name)
+	vertices = [(-size, -size, 0), (size, -size, 0), (size, size, 0), (-size, size, 0)]
+	mesh.from_pydata(vertices, [], [(0, 1, 2, 3)])
+	mesh.update()
+	return mesh
+def newQuadsMesh(name, amount):
+	mesh = bpy.data.meshes.new(name)
+	vertices = [(0, 0, 0)] * (4 * amount)
+	faces = [(4 * index, 4 * index + 1, 4 * index + 2, 4 * index + 3) for index in range(amount)]
+	mesh.from_pydata(vertices, [], faces)
+	mesh.update()
+	return mesh
+def setPlaneMeshUVRect(mesh, rect):
+	(u, v, width, height) = rect
+	if len(mesh.uv_textures) == 0: mesh.uv_textures.new()
+	coordinates = [(u, v), (u + width, v), (u + width, v + height), (u, v + height)]
+	for loop, coordinate in zip(mesh.uv_layers.active.data, coordinates):
+		loop.uv = coordinate
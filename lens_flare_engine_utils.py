@@ -0,0 +1,103 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import numpy
+
+# same math as the driver rig, evaluated for many flares of one camera at once
+
+def getCameraAxes(cameraMatrix):
+	cameraMatrix = numpy.asarray(cameraMatrix, dtype = numpy.float64)
+	return cameraMatrix[:3, :3]
+def getCameraRotation(cameraMatrix):
+	axes = getCameraAxes(cameraMatrix)
+	return axes / numpy.maximum(numpy.linalg.norm(axes, axis = 0), 1e-12)
+def getCameraLocation(cameraMatrix):
+	return numpy.asarray(cameraMatrix, dtype = numpy.float64)[:3, 3]
+
+def normalizeRows(vectors):
+	lengths = numpy.linalg.norm(vectors, axis = -1)
+	return vectors / numpy.maximum(lengths, 1e-12)[..., None]
+def getRowLengths(vectors):
+	return numpy.linalg.norm(vectors, axis = -1)
+def safeDivisor(values, epsilon = 1e-6):
+	return numpy.where(numpy.abs(values) < epsilon, numpy.copysign(epsilon, values), values)
+
+def computeFlareCenter(cameraMatrix, centerDistance):
+	backward = getCameraRotation(cameraMatrix)[:, 2]
+	return getCameraLocation(cameraMatrix) - backward * centerDistance
+
+def computeStartAndEndLocations(cameraMatrix, centerDistance, targetLocations):
+	cameraLocation = getCameraLocation(cameraMatrix)
+	backward = getCameraRotation(cameraMatrix)[:, 2]
+	center = computeFlareCenter(cameraMatrix, centerDistance)
+	targetDirections = normalizeRows(numpy.asarray(targetLocations, dtype = numpy.float64).reshape(-1, 3) - cameraLocation)
+
+	# start distance: -distance/cos(angle)
+	startDistances = -centerDistance / safeDivisor(targetDirections.dot(backward))
+	starts = cameraLocation + targetDirections * startDistances[:, None]
+	ends = 2 * center - starts
+	return (starts, ends)
+
+def computeElementLocations(starts, ends, flareIndices, positions):
+	positions = numpy.asarray(positions, dtype = numpy.float64)[:, None]
+	return starts[flareIndices] * (1 - positions) + ends[flareIndices] * positions
+
+def computeElementTransforms(cameraMatrix, centerDistance, targetLocations, flareIndices, positions, offsets, scales, widthFactors, rotations, centerInfluences):
+	# per element: flareIndices, positions, widthFactors, rotations (degrees), centerInfluences
+	# offsets: (horizontal, vertical, artefact offset); scales: (width, height)
+	flareIndices = numpy.asarray(flareIndices, dtype = numpy.int64)
+	offsets = numpy.asarray(offsets, dtype = numpy.float64).reshape(-1, 3)
+	scales = numpy.asarray(scales, dtype = numpy.float64).reshape(-1, 2)
+	cameraLocation = getCameraLocation(cameraMatrix)
+
+	(starts, ends) = computeStartAndEndLocations(cameraMatrix, centerDistance, targetLocations)
+	elementLocations = computeElementLocations(starts, ends, flareIndices, positions)
+
+	elementDistances = getRowLengths(elementLocations - cameraLocation)
+	planeLocations = elementLocations + (offsets * elementDistances[:, None]).dot(getCameraAxes(cameraMatrix).T)
+
+	planeDistances = getRowLengths(planeLocations - cameraLocation)
+	planeScales = numpy.column_stack((numpy.asarray(widthFactors) * scales[:, 0], scales[:, 1], numpy.ones(len(scales))))
+	planeScales *= planeDistances[:, None]
+
+	toCenter = (computeFlareCenter(cameraMatrix, centerDistance) - planeLocations).dot(getCameraRotation(cameraMatrix))
+	trackAngles = numpy.arctan2(toCenter[:, 1], toCenter[:, 0])
+	baseAngles = numpy.radians(numpy.asarray(rotations, dtype = numpy.float64))
+	angleDifferences = (trackAngles - baseAngles + numpy.pi) % (2 * numpy.pi) - numpy.pi
+	angles = baseAngles + numpy.asarray(centerInfluences, dtype = numpy.float64) * angleDifferences
+
+	return (planeLocations, angles, planeScales)
+
+def composePlaneMatrices(cameraMatrix, locations, angles, scales):
+	amount = len(locations)
+	cos = numpy.cos(angles)
+	sin = numpy.sin(angles)
+	zRotations = numpy.zeros((amount, 3, 3))
+	zRotations[:, 0, 0] = cos
+	zRotations[:, 0, 1] = -sin
+	zRotations[:, 1, 0] = sin
+	zRotations[:, 1, 1] = cos
+	zRotations[:, 2, 2] = 1
+
+	matrices = numpy.zeros((amount, 4, 4))
+	matrices[:, :3, :3] = numpy.einsum("ij,ejk->eik", getCameraRotation(cameraMatrix), zRotations) * scales[:, None, :]
+	matrices[:, :3, 3] = locations
+	matrices[:, 3, 3] = 1
+	return matrices
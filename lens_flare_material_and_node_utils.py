@@ -22,7 +22,7 @@ import bpy
 from lens_flare_utils import *
 
 def newCyclesMaterial(name = "Material"):
-	material = newMaterial()
+	material = newMaterial(name)
 	material.use_nodes = True
 	return material
 def newMaterial(name = "Material"):
@@ -36,6 +36,22 @@ def removeNodes(nodeTree):
 		
 def setMaterialOnObject(object, material):
 	object.data.materials.append(material)
+def setObjectLevelMaterial(object, material):
+	if len(object.material_slots) == 0: object.data.materials.append(None)
+	slot = object.material_slots[0]
+	slot.link = "OBJECT"
+	slot.material = material
+	
+def newShaderNodeGroup(name):
+	return bpy.data.node_groups.new(name, "ShaderNodeTree")
+def newGroupInputNode(nodeTree):
+	return nodeTree.nodes.new("NodeGroupInput")
+def newGroupOutputNode(nodeTree):
+	return nodeTree.nodes.new("NodeGroupOutput")
+def newGroupNode(nodeTree, group):
+	node = nodeTree.nodes.new("ShaderNodeGroup")
+	node.node_tree = group
+	return node
 		
 def newOutputNode(nodeTree):
 	return nodeTree.nodes.new("ShaderNodeOutputMaterial")
@@ -70,6 +86,12 @@ def newRerouteNode(nodeTree):
 	return nodeTree.nodes.new("NodeReroute")
 def newColorRampNode(nodeTree):
 	return nodeTree.nodes.new("ShaderNodeValToRGB")
+def newObjectInfoNode(nodeTree):
+	return nodeTree.nodes.new("ShaderNodeObjectInfo")
+def newAttributeNode(nodeTree, attributeName = ""):
+	node = nodeTree.nodes.new("ShaderNodeAttribute")
+	node.attribute_name = attributeName
+	return node
 	
 def linkToMixShader(nodeTree, socket1, socket2, mixShader, factor = None):
 	if factor is not None: newNodeLink(nodeTree, mixShader.inputs[0], factor)
@@ -89,6 +111,7 @@ def makeOnlyVisibleToCamera(object):
 	
 def getNodeWithNameInObject(object, name):
 	for slot in object.material_slots:
+		if slot.material is None or slot.material.node_tree is None: continue
 		node = slot.material.node_tree.nodes.get(name)
 		if node is not None: return node
 	return None
\ No newline at end of file
@@ -0,0 +1,162 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import math, numpy
+
+# ray casting against triangles for occlusion; does not need bpy
+# all rays of one frame go through the bvh together instead of one by one
+
+bvhLeafSize = 8
+rayEpsilon = 1e-4
+
+def transformPoints(matrix, points):
+	matrix = numpy.asarray(matrix, dtype = numpy.float64)
+	return points.dot(matrix[:3, :3].T) + matrix[:3, 3]
+
+def trianglesFromFaces(vertices, faces):
+	# faces: four vertex indices per face, the last one is 0 for triangles
+	vertices = numpy.asarray(vertices, dtype = numpy.float64).reshape(-1, 3)
+	faces = numpy.asarray(faces, dtype = numpy.int64).reshape(-1, 4)
+	quads = faces[faces[:, 3] != 0]
+	indices = numpy.concatenate((faces[:, :3], quads[:, [0, 2, 3]]))
+	return vertices[indices]
+
+class BVH:
+	def __init__(self, triangles):
+		self.triangles = numpy.zeros((0, 3, 3))
+		self.boundsMin = numpy.zeros((0, 3))
+		self.boundsMax = numpy.zeros((0, 3))
+		self.children = numpy.zeros((0, 2), dtype = numpy.int64)
+		self.starts = numpy.zeros(0, dtype = numpy.int64)
+		self.counts = numpy.zeros(0, dtype = numpy.int64)
+		triangles = numpy.asarray(triangles, dtype = numpy.float64).reshape(-1, 3, 3)
+		if len(triangles) > 0: self.build(triangles)
+		
+	def build(self, triangles):
+		centers = triangles.mean(axis = 1)
+		lower = triangles.min(axis = 1)
+		upper = triangles.max(axis = 1)
+		order = numpy.arange(len(triangles))
+		
+		(boundsMin, boundsMax, children, starts, counts) = ([], [], [], [], [])
+		# (node index, start, end) of nodes whose children are not created yet
+		stack = [(0, 0, len(triangles))]
+		boundsMin.append(None); boundsMax.append(None); children.append([-1, -1]); starts.append(0); counts.append(0)
+		while len(stack) > 0:
+			(node, start, end) = stack.pop()
+			indices = order[start:end]
+			boundsMin[node] = lower[indices].min(axis = 0)
+			boundsMax[node] = upper[indices].max(axis = 0)
+			(starts[node], counts[node]) = (start, end - start)
+			if end - start <= bvhLeafSize: continue
+			
+			nodeCenters = centers[indices]
+			axis = numpy.argmax(nodeCenters.max(axis = 0) - nodeCenters.min(axis = 0))
+			middle = (end - start) // 2
+			order[start:end] = indices[numpy.argpartition(nodeCenters[:, axis], middle)]
+			for side, (childStart, childEnd) in enumerate(((start, start + middle), (start + middle, end))):
+				children[node][side] = len(boundsMin)
+				stack.append((len(boundsMin), childStart, childEnd))
+				boundsMin.append(None); boundsMax.append(None); children.append([-1, -1]); starts.append(0); counts.append(0)
+			
+		self.triangles = triangles[order]
+		self.boundsMin = numpy.array(boundsMin)
+		self.boundsMax = numpy.array(boundsMax)
+		self.children = numpy.array(children, dtype = numpy.int64)
+		self.starts = numpy.array(starts, dtype = numpy.int64)
+		self.counts = numpy.array(counts, dtype = numpy.int64)
+		
+	def findOccludedSegments(self, origins, ends):
+		# True for every segment that hits a triangle between its origin and end
+		origins = numpy.asarray(origins, dtype = numpy.float64).reshape(-1, 3)
+		directions = numpy.asarray(ends, dtype = numpy.float64).reshape(-1, 3) - origins
+		occluded = numpy.zeros(len(origins), dtype = bool)
+		if len(self.triangles) == 0: return occluded
+		inverseDirections = 1 / numpy.where(numpy.abs(directions) < 1e-12, 1e-12, directions)
+		
+		rays = numpy.arange(len(origins))
+		nodes = numpy.zeros(len(origins), dtype = numpy.int64)
+		while len(rays) > 0:
+			hit = intersectBoxes(self.boundsMin[nodes], self.boundsMax[nodes], origins[rays], inverseDirections[rays])
+			(rays, nodes) = (rays[hit], nodes[hit])
+			isLeaf = self.children[nodes, 0] < 0
+			
+			(leafRays, triangleIndices) = expandRanges(rays[isLeaf], self.starts[nodes[isLeaf]], self.counts[nodes[isLeaf]])
+			hit = intersectTriangles(self.triangles[triangleIndices], origins[leafRays], directions[leafRays])
+			occluded[leafRays[hit]] = True
+			
+			(rays, nodes) = (rays[~isLeaf], nodes[~isLeaf])
+			rays = numpy.concatenate((rays, rays))
+			nodes = numpy.concatenate((self.children[nodes, 0], self.children[nodes, 1]))
+			unfinished = ~occluded[rays]
+			(rays, nodes) = (rays[unfinished], nodes[unfinished])
+		return occluded
+		
+def expandRanges(rays, starts, counts):
+	# one (ray, index) pair for every index in start .. start + count
+	total = counts.sum()
+	offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+	return (numpy.repeat(rays, counts), numpy.repeat(starts, counts) + offsets)
+		
+def intersectBoxes(boundsMin, boundsMax, origins, inverseDirections):
+	# segments go from t = 0 to t = 1
+	t1 = (boundsMin - origins) * inverseDirections
+	t2 = (boundsMax - origins) * inverseDirections
+	near = numpy.minimum(t1, t2).max(axis = 1)
+	far = numpy.maximum(t1, t2).min(axis = 1)
+	return (near <= far) & (far >= 0) & (near <= 1)
+	
+def intersectTriangles(triangles, origins, directions):
+	# Moeller-Trumbore without culling back faces
+	edges1 = triangles[:, 1] - triangles[:, 0]
+	edges2 = triangles[:, 2] - triangles[:, 0]
+	p = numpy.cross(directions, edges2)
+	determinants = (edges1 * p).sum(axis = 1)
+	valid = numpy.abs(determinants) > 1e-12
+	inverse = 1 / numpy.where(valid, determinants, 1)
+	s = origins - triangles[:, 0]
+	u = (s * p).sum(axis = 1) * inverse
+	q = numpy.cross(s, edges1)
+	v = (directions * q).sum(axis = 1) * inverse
+	t = (edges2 * q).sum(axis = 1) * inverse
+	return valid & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > rayEpsilon) & (t < 1 - rayEpsilon)
+	
+def getJitterOffsets(samples):
+	# the center first, the others evenly spread inside the unit sphere; fixed so baked frames do not flicker
+	offsets = numpy.zeros((max(samples, 1), 3))
+	amount = samples - 1
+	if amount > 0:
+		indices = numpy.arange(amount) + 0.5
+		heights = 1 - 2 * indices / amount
+		angles = indices * math.pi * (3 - math.sqrt(5))
+		radii = numpy.sqrt(1 - heights ** 2)
+		directions = numpy.column_stack((radii * numpy.cos(angles), radii * numpy.sin(angles), heights))
+		offsets[1:] = directions * numpy.cbrt(indices / amount)[:, None]
+	return offsets
+	
+def computeVisibleFractions(bvh, origins, targets, radius = 0.0, samples = 1):
+	# origins and targets: one row per flare; returns the visible fraction of every target
+	origins = numpy.asarray(origins, dtype = numpy.float64).reshape(-1, 3)
+	targets = numpy.asarray(targets, dtype = numpy.float64).reshape(-1, 3)
+	offsets = getJitterOffsets(samples) * radius
+	ends = (targets[:, None, :] + offsets[None, :, :]).reshape(-1, 3)
+	occluded = bvh.findOccludedSegments(numpy.repeat(origins, len(offsets), axis = 0), ends)
+	return 1 - occluded.reshape(len(targets), len(offsets)).mean(axis = 1)
@@ -0,0 +1,233 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os, hashlib, struct, zlib, sqlite3, numpy
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+from lens_flare_raster_utils import *
+from lens_flare_procedural_utils import *
+
+# preset files and their thumbnails; does not need bpy so it can run in worker processes
+
+presetExtension = ".lf"
+thumbnailSize = 128
+thumbnailLightPosition = (0.4, 0.3)
+previewTextureResolution = 256
+
+def getPresetPaths(folder):
+	if not os.path.isdir(folder): return []
+	names = sorted(name for name in os.listdir(folder) if name.endswith(presetExtension))
+	return [os.path.join(folder, name) for name in names]
+
+def parsePresetFile(path):
+	flareET = ET.parse(path).getroot()
+	flare = SimpleNamespace(
+		name = getAttribute(flareET, "name", "Lens Flare", str),
+		intensity = getAttribute(flareET, "intensity", 1.0, float))
+	elements = []
+	for elementET in flareET:
+		colorET = elementET.find("multiplyColor")
+		elements.append(SimpleNamespace(
+			name = getAttribute(elementET, "name", "Flare Element", str),
+			imageName = getAttribute(elementET, "imageName", "circle.jpg", str),
+			position = getAttribute(elementET, "position", 0.0, float),
+			intensity = getAttribute(elementET, "intensity", 1.0, float),
+			rotation = getAttribute(elementET, "rotation", 0, int),
+			centerRotation = getAttribute(elementET, "centerRotation", 0.0, float),
+			width = getAttribute(elementET, "width", 1.0, float),
+			height = getAttribute(elementET, "height", 1.0, float),
+			xOffset = getAttribute(elementET, "horizontal", 0.0, float),
+			yOffset = getAttribute(elementET, "vertical", 0.0, float),
+			color = [getAttribute(colorET, "red", 1.0, float),
+					getAttribute(colorET, "green", 1.0, float),
+					getAttribute(colorET, "blue", 1.0, float), 1.0]))
+	return (flare, elements)
+
+def getAttribute(tree, name, fallback, type):
+	if tree is None: return fallback
+	value = tree.get(name)
+	if value is None: return fallback
+	return type(float(value)) if type is int else type(value)
+
+# thumbnail cache
+
+# (path, mtime, size) -> content hash
+fileHashes = {}
+
+def getFileContentHash(path):
+	if not os.path.isfile(path): return "missing"
+	status = os.stat(path)
+	key = (path, status.st_mtime, status.st_size)
+	if key not in fileHashes:
+		with open(path, "rb") as file:
+			fileHashes[key] = hashlib.sha1(file.read()).hexdigest()
+	return fileHashes[key]
+
+def getPresetKey(connection, presetPath, elementsFolder):
+	# built from the preset index so listing presets never parses their files
+	row = connection.execute("SELECT hash FROM presets WHERE path = ?", (presetPath, )).fetchone()
+	presetHash = row[0] if row is not None else getFileContentHash(presetPath)
+	hash = hashlib.sha1(presetHash.encode())
+	for (imageName, ) in connection.execute("SELECT imageName FROM presetImages WHERE path = ? ORDER BY imageName", (presetPath, )):
+		hash.update(imageName.encode())
+		hash.update(getFileContentHash(os.path.join(elementsFolder, imageName)).encode())
+	return hash.hexdigest()
+	
+def getThumbnailPath(cacheFolder, key):
+	return os.path.join(cacheFolder, key + ".png")
+	
+def getThumbnailJobs(connection, presetPaths, elementsFolder, cacheFolder):
+	# (preset path, thumbnail path, needs rendering)
+	jobs = []
+	for presetPath in presetPaths:
+		thumbnailPath = getThumbnailPath(cacheFolder, getPresetKey(connection, presetPath, elementsFolder))
+		jobs.append((presetPath, thumbnailPath, not os.path.isfile(thumbnailPath)))
+	return jobs
+	
+def renderPresetThumbnail(presetPath, getElementPixels, size = thumbnailSize):
+	(flare, elements) = parsePresetFile(presetPath)
+	return renderFlare(flare, elements, thumbnailLightPosition, getElementPixels, size, size)
+
+def renderThumbnailJob(presetPath, elementsFolder, thumbnailPath, decodedFolder, size = thumbnailSize):
+	getElementPixels = lambda element: loadElementPixels(elementsFolder, element.imageName, decodedFolder)
+	writePNG(thumbnailPath, renderPresetThumbnail(presetPath, getElementPixels, size))
+	return thumbnailPath
+	
+def loadElementPixels(elementsFolder, imageName, decodedFolder = None):
+	if isProceduralSpec(imageName): return getProceduralTexture(imageName, previewTextureResolution)
+	path = os.path.join(elementsFolder, imageName)
+	if decodedFolder is not None:
+		decodedPath = getDecodedElementPath(decodedFolder, path)
+		if os.path.isfile(decodedPath): return numpy.load(decodedPath)
+	return loadImagePixels(path)
+	
+# blender has no image library the workers could use, so element images are decoded once in blender
+# and stored as arrays named after the content hash of the image file
+
+def getDecodedElementPath(decodedFolder, imagePath):
+	return os.path.join(decodedFolder, getFileContentHash(imagePath) + ".npy")
+	
+def getUndecodedElementPaths(presetPaths, elementsFolder, decodedFolder):
+	imageNames = set()
+	for presetPath in presetPaths:
+		(flare, elements) = parsePresetFile(presetPath)
+		imageNames.update(element.imageName for element in elements if not isProceduralSpec(element.imageName))
+	paths = [os.path.join(elementsFolder, imageName) for imageName in sorted(imageNames)]
+	return [path for path in paths if os.path.isfile(path) and not os.path.isfile(getDecodedElementPath(decodedFolder, path))]
+	
+def writeDecodedElement(decodedFolder, imagePath, pixels):
+	if not os.path.isdir(decodedFolder): os.makedirs(decodedFolder)
+	path = getDecodedElementPath(decodedFolder, imagePath)
+	temporaryPath = path[:-len(".npy")] + ".tmp.npy"
+	numpy.save(temporaryPath, numpy.asarray(pixels, dtype = numpy.float32))
+	os.replace(temporaryPath, path)
+	
+def writePNG(path, pixels):
+	folder = os.path.dirname(path)
+	if not os.path.isdir(folder): os.makedirs(folder)
+	# compress the hdr values into the displayable range
+	values = 1 - numpy.exp(-numpy.maximum(pixels, 0))
+	data = (numpy.clip(values, 0, 1) * 255 + 0.5).astype(numpy.uint8)
+	(height, width) = data.shape[:2]
+	rows = b"".join(b"\x00" + data[y].tobytes() for y in range(height))
+
+	def chunk(type, content):
+		return struct.pack(">I", len(content)) + type + content + struct.pack(">I", zlib.crc32(type + content) & 0xffffffff)
+	temporaryPath = path + ".tmp"
+	with open(temporaryPath, "wb") as file:
+		file.write(b"\x89PNG\r\n\x1a\n")
+		file.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+		file.write(chunk(b"IDAT", zlib.compress(rows, 6)))
+		file.write(chunk(b"IEND", b""))
+	os.replace(temporaryPath, path)
+
+# preset index
+
+presetIndexSchema = """
+CREATE TABLE IF NOT EXISTS presets (
+	path TEXT PRIMARY KEY,
+	mtime REAL,
+	size INTEGER,
+	hash TEXT,
+	name TEXT,
+	intensity REAL,
+	elementCount INTEGER);
+CREATE TABLE IF NOT EXISTS presetImages (
+	path TEXT,
+	imageName TEXT);
+CREATE INDEX IF NOT EXISTS presetImagesByName ON presetImages (imageName);
+CREATE INDEX IF NOT EXISTS presetImagesByPath ON presetImages (path);
+"""
+
+def openPresetIndex(databasePath):
+	folder = os.path.dirname(databasePath)
+	if not os.path.isdir(folder): os.makedirs(folder)
+	connection = sqlite3.connect(databasePath)
+	connection.executescript(presetIndexSchema)
+	return connection
+
+def updatePresetIndex(connection, folder):
+	# returns the amount of presets that had to be parsed again
+	paths = getPresetPaths(folder)
+	known = {}
+	for path, mtime, size, hash in connection.execute("SELECT path, mtime, size, hash FROM presets"):
+		known[path] = (mtime, size, hash)
+	parsed = 0
+	with connection:
+		for path in set(known) - set(paths):
+			removePresetFromIndex(connection, path)
+		for path in paths:
+			status = os.stat(path)
+			if path in known and known[path][:2] == (status.st_mtime, status.st_size): continue
+			hash = getFileContentHash(path)
+			if path in known and known[path][2] == hash:
+				connection.execute("UPDATE presets SET mtime = ?, size = ? WHERE path = ?", (status.st_mtime, status.st_size, path))
+				continue
+			insertPresetIntoIndex(connection, path, status, hash)
+			parsed += 1
+	return parsed
+
+def insertPresetIntoIndex(connection, path, status, hash):
+	removePresetFromIndex(connection, path)
+	try: (flare, elements) = parsePresetFile(path)
+	except ET.ParseError: (flare, elements) = (SimpleNamespace(name = "", intensity = 0.0), [])
+	connection.execute("INSERT INTO presets VALUES (?, ?, ?, ?, ?, ?, ?)",
+		(path, status.st_mtime, status.st_size, hash, flare.name, flare.intensity, len(elements)))
+	imageNames = set(element.imageName for element in elements)
+	connection.executemany("INSERT INTO presetImages VALUES (?, ?)", [(path, imageName) for imageName in imageNames])
+
+def removePresetFromIndex(connection, path):
+	connection.execute("DELETE FROM presets WHERE path = ?", (path, ))
+	connection.execute("DELETE FROM presetImages WHERE path = ?", (path, ))
+
+def queryPresets(connection, imageName = "", minElements = 0, maxElements = -1, name = ""):
+	query = "SELECT path FROM presets WHERE elementCount >= ?"
+	parameters = [minElements]
+	if maxElements >= 0:
+		query += " AND elementCount <= ?"
+		parameters.append(maxElements)
+	if name != "":
+		query += " AND name LIKE ?"
+		parameters.append("%" + name + "%")
+	if imageName != "":
+		query += " AND path IN (SELECT path FROM presetImages WHERE imageName = ?)"
+		parameters.append(imageName)
+	query += " ORDER BY path"
+	return [row[0] for row in connection.execute(query, parameters)]
@@ -0,0 +1,126 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import math, numpy
+
+# element textures generated from a short spec like "procedural:polygon sides=6 softness=0.2"
+# coordinates go from -1 to 1 over the texture, values are white on black like the files in elements/
+
+proceduralPrefix = "procedural:"
+minTextureResolution = 32
+maxTextureResolution = 2048
+
+def isProceduralSpec(imageName):
+	return imageName[:len(proceduralPrefix)] == proceduralPrefix
+
+def newProceduralSpec(shape, **parameters):
+	defaults = proceduralShapes[shape][1]
+	parts = [shape]
+	for name in sorted(parameters):
+		if name not in defaults: raise ValueError("unknown parameter for " + shape + ": " + name)
+		parts.append(name + "=" + formatParameter(parameters[name]))
+	return proceduralPrefix + " ".join(parts)
+def formatParameter(value):
+	return ("%.4f" % value).rstrip("0").rstrip(".")
+
+def parseProceduralSpec(spec):
+	parts = spec[len(proceduralPrefix):].split()
+	if len(parts) == 0 or parts[0] not in proceduralShapes: raise ValueError("unknown procedural shape: " + spec)
+	shape = parts[0]
+	parameters = dict(proceduralShapes[shape][1])
+	for part in parts[1:]:
+		(name, separator, value) = part.partition("=")
+		if name not in parameters: raise ValueError("unknown parameter for " + shape + ": " + name)
+		parameters[name] = float(value)
+	return (shape, parameters)
+
+def getProceduralKey(spec):
+	(shape, parameters) = parseProceduralSpec(spec)
+	return (shape, tuple(sorted(parameters.items())))
+
+def getTextureResolution(pixelSize):
+	# next power of two, so similar sizes share one texture
+	resolution = 2 ** int(math.ceil(math.log(max(pixelSize, 1), 2)))
+	return min(max(resolution, minTextureResolution), maxTextureResolution)
+
+# (shape, parameters, resolution) -> float pixels (rows from top to bottom, rgb)
+proceduralTextures = {}
+
+def getProceduralTexture(spec, resolution):
+	key = getProceduralKey(spec) + (resolution, )
+	if key not in proceduralTextures:
+		(shape, parameters) = parseProceduralSpec(spec)
+		values = proceduralShapes[shape][0](getTextureCoordinates(resolution), **parameters)
+		texture = numpy.repeat(numpy.clip(values, 0, 1).astype(numpy.float32)[..., None], 3, axis = 2)
+		texture.flags.writeable = False
+		proceduralTextures[key] = texture
+	return proceduralTextures[key]
+
+def getTextureCoordinates(resolution):
+	# pixel centers; y goes up although the rows go from top to bottom
+	steps = (numpy.arange(resolution) + 0.5) / resolution * 2 - 1
+	(y, x) = numpy.meshgrid(-steps, steps, indexing = "ij")
+	return (x, y, 2 / resolution)
+
+def fromCenterPixels(distances, pixelWidth, dimensions = 1):
+	# even resolutions have no pixel on the center, the pixels around it sample the peak instead
+	return numpy.maximum(distances - pixelWidth / 2 * math.sqrt(dimensions), 0)
+
+def smoothEdge(distances, edge, softness, pixelWidth):
+	# 1 inside the edge, fading to 0 over the softness but never sharper than one pixel
+	width = max(softness, pixelWidth)
+	t = numpy.clip((edge - distances) / width + 0.5, 0, 1)
+	return t * t * (3 - 2 * t)
+
+def generatePolygon(coordinates, sides, softness, rotation, radius):
+	(x, y, pixelWidth) = coordinates
+	angles = numpy.arctan2(y, x) - math.radians(rotation) - math.pi / 2
+	lengths = numpy.hypot(x, y)
+	if sides < 3: distances = lengths
+	else:
+		segment = 2 * math.pi / int(sides)
+		distances = lengths * numpy.cos(angles % segment - segment / 2) / math.cos(segment / 2)
+	return smoothEdge(distances, radius - softness / 2, softness, pixelWidth)
+
+def generateRing(coordinates, radius, width, softness):
+	(x, y, pixelWidth) = coordinates
+	distances = numpy.abs(numpy.hypot(x, y) - radius)
+	return smoothEdge(distances, width / 2, softness, pixelWidth)
+
+def generateGlow(coordinates, falloff, core):
+	(x, y, pixelWidth) = coordinates
+	distances = fromCenterPixels(numpy.hypot(x, y), pixelWidth, 2)
+	values = numpy.clip(1 - distances, 0, 1) ** falloff
+	if core > 0: values += numpy.exp(-(distances / core) ** 2) * (1 - values)
+	return values
+
+def generateStreak(coordinates, thickness, falloff):
+	(x, y, pixelWidth) = coordinates
+	thickness = max(thickness, pixelWidth)
+	(x, y) = (fromCenterPixels(numpy.abs(x), pixelWidth), fromCenterPixels(numpy.abs(y), pixelWidth))
+	return numpy.exp(-(y / thickness) ** 2) * numpy.clip(1 - x, 0, 1) ** falloff
+
+# shape -> (generator, default parameters)
+proceduralShapes = {
+	"polygon" : (generatePolygon, { "sides" : 6.0, "softness" : 0.0, "rotation" : 0.0, "radius" : 0.95 }),
+	"ring" : (generateRing, { "radius" : 0.8, "width" : 0.1, "softness" : 0.05 }),
+	"glow" : (generateGlow, { "falloff" : 2.0, "core" : 0.0 }),
+	"streak" : (generateStreak, { "thickness" : 0.02, "falloff" : 1.0 }) }
@@ -0,0 +1,130 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os, json, time, random, threading, functools
+
+# opt-in timings of the addon entry points; does not need bpy
+# the trace can be opened in chrome://tracing or https://ui.perfetto.dev
+
+profilingEnabled = False
+frameEvaluationName = "frame evaluation"
+traceCategory = "lens flares"
+maxTraceEvents = 500000
+maxProfileSamples = 2048
+
+# name -> [calls, total seconds, max seconds] of all calls
+profileTotals = {}
+# name -> uniform sample of at most maxProfileSamples durations for the percentiles
+profileSamples = {}
+traceEvents = []
+droppedTraceEvents = 0
+frameEvaluationStart = None
+
+def setProfilingEnabled(enabled):
+	global profilingEnabled, frameEvaluationStart
+	profilingEnabled = enabled
+	frameEvaluationStart = None
+	
+def resetProfile():
+	global droppedTraceEvents
+	profileTotals.clear()
+	profileSamples.clear()
+	del traceEvents[:]
+	droppedTraceEvents = 0
+	
+def getDroppedTraceEventCount():
+	return droppedTraceEvents
+	
+def profiled(name):
+	def decorator(function):
+		@functools.wraps(function)
+		def wrapper(*args, **kwargs):
+			if not profilingEnabled: return function(*args, **kwargs)
+			start = time.perf_counter()
+			try: return function(*args, **kwargs)
+			finally: recordDuration(name, start, time.perf_counter())
+		return wrapper
+	return decorator
+	
+# blender checks the argument count of registered draw functions
+def profiledDraw(name):
+	def decorator(draw):
+		@functools.wraps(draw)
+		def wrapper(self, context):
+			if not profilingEnabled: return draw(self, context)
+			start = time.perf_counter()
+			try: return draw(self, context)
+			finally: recordDuration(name, start, time.perf_counter())
+		return wrapper
+	return decorator
+	
+def recordDuration(name, start, end, category = traceCategory, arguments = None):
+	global droppedTraceEvents
+	recordSample(name, end - start)
+	if len(traceEvents) >= maxTraceEvents:
+		droppedTraceEvents += 1
+		return
+	event = { "name" : name, "cat" : category, "ph" : "X", "ts" : start * 1e6, "dur" : (end - start) * 1e6,
+		"pid" : os.getpid(), "tid" : threading.get_ident() }
+	if arguments is not None: event["args"] = arguments
+	traceEvents.append(event)
+	
+def recordSample(name, duration):
+	totals = profileTotals.setdefault(name, [0, 0.0, 0.0])
+	totals[0] += 1
+	totals[1] += duration
+	totals[2] = max(totals[2], duration)
+	# reservoir sampling, handlers that run all the time must not grow the memory
+	samples = profileSamples.setdefault(name, [])
+	if len(samples) < maxProfileSamples: samples.append(duration)
+	else:
+		index = random.randrange(totals[0])
+		if index < maxProfileSamples: samples[index] = duration
+	
+# the scene is evaluated between the pre and post frame change handlers
+def startFrameEvaluation():
+	global frameEvaluationStart
+	if profilingEnabled: frameEvaluationStart = time.perf_counter()
+def endFrameEvaluation(frame):
+	global frameEvaluationStart
+	if not profilingEnabled or frameEvaluationStart is None: return
+	recordDuration(frameEvaluationName, frameEvaluationStart, time.perf_counter(), "depsgraph", { "frame" : frame })
+	frameEvaluationStart = None
+	
+def getPercentile(sortedDurations, percentile):
+	index = int(round(percentile / 100 * (len(sortedDurations) - 1)))
+	return sortedDurations[index]
+	
+def getProfileStatistics():
+	# (name, calls, total, mean, p50, p90, p99, max) with the most expensive first
+	statistics = []
+	for name, (calls, total, maximum) in profileTotals.items():
+		durations = sorted(profileSamples[name])
+		statistics.append((name, calls, total, total / calls,
+			getPercentile(durations, 50), getPercentile(durations, 90), getPercentile(durations, 99), maximum))
+	statistics.sort(key = lambda row: -row[2])
+	return statistics
+	
+def writeTraceEvents(path):
+	metadata = { "droppedEvents" : droppedTraceEvents, "statistics" : [dict(zip(["name", "calls", "total", "mean", "p50", "p90", "p99", "max"], row)) for row in getProfileStatistics()] }
+	temporaryPath = path + ".tmp"
+	with open(temporaryPath, "w") as file:
+		json.dump({ "traceEvents" : traceEvents, "displayTimeUnit" : "ms", "otherData" : metadata }, file)
+	os.replace(temporaryPath, path)
@@ -0,0 +1,122 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import os.path, numpy
+
+# software preview of a flare without building a rig; does not need bpy
+# screen space is measured in tangent units: 1 is 45 degrees from the view axis
+
+planeSize = 0.2
+defaultHalfWidthTan = 16 / 35
+
+# path -> float pixels (rows from top to bottom, rgb)
+imagePixelsCache = {}
+
+def loadImagePixels(path):
+	path = os.path.abspath(path)
+	if path not in imagePixelsCache:
+		from PIL import Image
+		image = Image.open(path).convert("RGB")
+		imagePixelsCache[path] = numpy.asarray(image, dtype = numpy.float32) / 255.0
+	return imagePixelsCache[path]
+
+def getImagePixels(image):
+	(width, height) = image.size
+	pixels = numpy.array(image.pixels[:], dtype = numpy.float32).reshape(height, width, image.channels)
+	return pixels[::-1, :, :3]
+
+# same weights as the color ramp node of the flare shader
+def getLuminance(pixels):
+	return pixels[..., 0] * 0.35 + pixels[..., 1] * 0.45 + pixels[..., 2] * 0.2
+
+def computeElementPlacements(lightPosition, positions, offsets, sizes, rotations, centerInfluences):
+	# element on the line from the light through the screen center to the mirrored point
+	lightPosition = numpy.asarray(lightPosition, dtype = numpy.float64)
+	positions = numpy.asarray(positions, dtype = numpy.float64)
+	centers = lightPosition * (1 - 2 * positions)[:, None] + numpy.asarray(offsets, dtype = numpy.float64).reshape(-1, 2)
+	sizes = numpy.asarray(sizes, dtype = numpy.float64).reshape(-1, 2) * planeSize
+
+	trackAngles = numpy.arctan2(-centers[:, 1], -centers[:, 0])
+	baseAngles = numpy.radians(numpy.asarray(rotations, dtype = numpy.float64))
+	angleDifferences = (trackAngles - baseAngles + numpy.pi) % (2 * numpy.pi) - numpy.pi
+	angles = baseAngles + numpy.asarray(centerInfluences, dtype = numpy.float64) * angleDifferences
+	return (centers, sizes, angles)
+
+def renderFlare(flareData, elementDatas, lightPosition, getElementPixels, width = 256, height = 256, halfWidthTan = defaultHalfWidthTan):
+	# lightPosition: (-1, -1) is the bottom left and (1, 1) the top right corner of the frame
+	result = numpy.zeros((height, width, 3), dtype = numpy.float32)
+	if len(elementDatas) == 0: return result
+
+	halfHeightTan = halfWidthTan * height / width
+	lightTan = numpy.asarray(lightPosition, dtype = numpy.float64) * [halfWidthTan, halfHeightTan]
+	textures = [getElementPixels(elementData) for elementData in elementDatas]
+	aspects = [texture.shape[1] / texture.shape[0] for texture in textures]
+
+	(centers, sizes, angles) = computeElementPlacements(
+		lightTan,
+		positions = [elementData.position for elementData in elementDatas],
+		offsets = [(elementData.xOffset, elementData.yOffset) for elementData in elementDatas],
+		sizes = [(aspect * elementData.width, elementData.height) for aspect, elementData in zip(aspects, elementDatas)],
+		rotations = [elementData.rotation for elementData in elementDatas],
+		centerInfluences = [elementData.centerRotation for elementData in elementDatas])
+
+	pixelsPerTan = width / (2 * halfWidthTan)
+	for index, elementData in enumerate(elementDatas):
+		strength = (elementData.intensity * flareData.intensity) ** 2
+		color = numpy.asarray(elementData.color[:3], dtype = numpy.float32) * strength
+		addElement(result, textures[index], color, centers[index] * pixelsPerTan, sizes[index] * pixelsPerTan, angles[index])
+	return result
+
+def addElement(result, texture, color, center, size, angle):
+	(height, width) = result.shape[:2]
+	pixelCenter = (center[0] + width / 2, height / 2 - center[1])
+	radius = numpy.hypot(size[0], size[1]) / 2
+	xMin = max(int(pixelCenter[0] - radius), 0)
+	xMax = min(int(pixelCenter[0] + radius) + 1, width)
+	yMin = max(int(pixelCenter[1] - radius), 0)
+	yMax = min(int(pixelCenter[1] + radius) + 1, height)
+	if xMin >= xMax or yMin >= yMax or size[0] <= 0 or size[1] <= 0: return
+
+	(ys, xs) = numpy.mgrid[yMin:yMax, xMin:xMax]
+	dx = xs + 0.5 - pixelCenter[0]
+	dy = pixelCenter[1] - (ys + 0.5)
+	cos = numpy.cos(angle)
+	sin = numpy.sin(angle)
+	u = (dx * cos + dy * sin) / size[0] + 0.5
+	v = (-dx * sin + dy * cos) / size[1] + 0.5
+	inside = (u >= 0) & (u <= 1) & (v >= 0) & (v <= 1)
+
+	values = numpy.zeros(u.shape, dtype = numpy.float32)
+	values[inside] = sampleBilinear(getLuminance(texture), u[inside], v[inside])
+	result[yMin:yMax, xMin:xMax] += values[..., None] * color
+
+def sampleBilinear(values, u, v):
+	(height, width) = values.shape
+	x = numpy.clip(u * (width - 1), 0, width - 1)
+	y = numpy.clip((1 - v) * (height - 1), 0, height - 1)
+	x0 = numpy.floor(x).astype(numpy.int64)
+	y0 = numpy.floor(y).astype(numpy.int64)
+	x1 = numpy.minimum(x0 + 1, width - 1)
+	y1 = numpy.minimum(y0 + 1, height - 1)
+	fx = x - x0
+	fy = y - y0
+	top = values[y0, x0] * (1 - fx) + values[y0, x1] * fx
+	bottom = values[y1, x0] * (1 - fx) + values[y1, x1] * fx
+	return top * (1 - fy) + bottom * fy
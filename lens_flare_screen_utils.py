@@ -0,0 +1,97 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+import numpy
+
+# camera space projections of flare parts, vectorized over frames and objects
+# frame coordinates go from -1 to 1 inside the camera frame; frame bounds are (x min, x max, y min, y max) at distance 1
+
+def toCameraSpace(cameraMatrices, points):
+	# cameraMatrices: (..., 4, 4) world matrices; points: (..., k, 3)
+	inverted = numpy.linalg.inv(numpy.asarray(cameraMatrices, dtype = numpy.float64))
+	points = numpy.asarray(points, dtype = numpy.float64)
+	return numpy.einsum("...ij,...kj->...ki", inverted[..., :3, :3], points) + inverted[..., None, :3, 3]
+
+def getFrameCoordinates(cameraPoints, frameBounds):
+	frameBounds = numpy.asarray(frameBounds, dtype = numpy.float64)[..., None, :]
+	depths = -cameraPoints[..., 2]
+	safeDepths = numpy.where(depths > 1e-6, depths, 1e-6)
+	x = cameraPoints[..., 0] / safeDepths
+	y = cameraPoints[..., 1] / safeDepths
+	u = (2 * x - frameBounds[..., 0] - frameBounds[..., 1]) / (frameBounds[..., 1] - frameBounds[..., 0])
+	v = (2 * y - frameBounds[..., 2] - frameBounds[..., 3]) / (frameBounds[..., 3] - frameBounds[..., 2])
+	return (numpy.stack((u, v), axis = -1), depths)
+
+def getScreenRectangles(coordinates, depths):
+	# (x min, x max, y min, y max) of the projected corners
+	# a shape that crosses the camera plane can cover anything, so it gets the whole frame
+	rects = numpy.concatenate((coordinates.min(axis = -2), coordinates.max(axis = -2)), axis = -1)[..., [0, 2, 1, 3]]
+	inFront = depths > 1e-6
+	crossing = inFront.any(axis = -1) & ~inFront.all(axis = -1)
+	rects[crossing] = [-1, 1, -1, 1]
+	return (rects, inFront.any(axis = -1))
+
+def isRectangleVisible(rects, inFront, margin = 0.0):
+	limit = 1 + margin
+	return inFront & (rects[..., 0] <= limit) & (rects[..., 1] >= -limit) & (rects[..., 2] <= limit) & (rects[..., 3] >= -limit)
+
+def isPointVisible(coordinates, depths, margin = 0.0):
+	return (depths > 1e-6) & (numpy.abs(coordinates) <= 1 + margin).all(axis = -1)
+
+def getVisibilityChanges(visible):
+	# visible: (frames, ) -> indices of the frames where the visibility differs from the frame before
+	visible = numpy.asarray(visible, dtype = bool)
+	if len(visible) == 0: return numpy.zeros(0, dtype = numpy.int64)
+	return numpy.concatenate(([0], numpy.flatnonzero(visible[1:] != visible[:-1]) + 1))
+
+def getVisibilityKeyframes(frames, visible):
+	# -> (frame, hidden) pairs that only key the changes and leave the object visible outside of the frames
+	visible = numpy.asarray(visible, dtype = bool)
+	if visible.all(): return []
+	changes = getVisibilityChanges(visible)
+	if visible[0]: changes = changes[1:]
+	keyframes = [(frames[index], not visible[index]) for index in changes]
+	if not visible[0]: keyframes.insert(0, (frames[0] - 1, False))
+	if not visible[-1]: keyframes.append((frames[-1] + 1, False))
+	return keyframes
+
+def computeMaxOverlaps(rects, visible, resolution = 256):
+	# rects: (frames, n, 4), visible: (frames, n) -> highest amount of stacked rectangles in the frame, per frame
+	# rectangles are widened to whole cells, so the result never underestimates
+	rects = numpy.clip(numpy.asarray(rects, dtype = numpy.float64), -1, 1)
+	cells = (rects + 1) / 2 * resolution
+	x0 = numpy.floor(cells[..., 0]).astype(numpy.int64)
+	x1 = numpy.minimum(numpy.floor(cells[..., 1]).astype(numpy.int64) + 1, resolution)
+	y0 = numpy.floor(cells[..., 2]).astype(numpy.int64)
+	y1 = numpy.minimum(numpy.floor(cells[..., 3]).astype(numpy.int64) + 1, resolution)
+	visible = numpy.asarray(visible, dtype = bool) & (x0 < x1) & (y0 < y1)
+	
+	overlaps = numpy.zeros(len(rects), dtype = numpy.int64)
+	for frameIndex in range(len(rects)):
+		used = visible[frameIndex]
+		if not used.any(): continue
+		grid = numpy.zeros((resolution + 1, resolution + 1), dtype = numpy.int32)
+		numpy.add.at(grid, (y0[frameIndex, used], x0[frameIndex, used]), 1)
+		numpy.add.at(grid, (y0[frameIndex, used], x1[frameIndex, used]), -1)
+		numpy.add.at(grid, (y1[frameIndex, used], x0[frameIndex, used]), -1)
+		numpy.add.at(grid, (y1[frameIndex, used], x1[frameIndex, used]), 1)
+		overlaps[frameIndex] = grid.cumsum(axis = 0).cumsum(axis = 1).max()
+	return overlaps
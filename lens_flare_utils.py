@@ -18,7 +18,7 @@ Created by Jacques Lucke
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 
-import bpy, random, math, mathutils, os.path
+import bpy, random, math, mathutils, os.path, hashlib
 from bpy_extras.image_utils import load_image
 import xml.etree.ElementTree as ET
 	
@@ -95,6 +95,16 @@ def delete(object):
 	object.name = "DELETED" + object.name
 	bpy.ops.object.delete()
 	
+def removeObjects(objects):
+	for object in objects:
+		for scene in object.users_scene:
+			scene.objects.unlink(object)
+		bpy.data.objects.remove(object)
+		
+def removeUnusedDatablocks(collection, datablocks):
+	for datablock in datablocks:
+		if datablock.users == 0: collection.remove(datablock)
+	
 def getCurrentFrame():
 	return bpy.context.screen.scene.frame_current
 
@@ -119,12 +129,52 @@ def getDataPath(name):
 def getObjectFromValidIndex(list, index):
 	return list[clamp(index, 0, len(list) - 1)]
 
+# normalized absolute path -> image name
+imagesByPath = {}
+# file content hash -> image name
+imagesByHash = {}
+imageCacheIsBuilt = False
+
 def getImage(path):
-	for image in bpy.data.images:
-		if path == image.filepath: return image
-	return loadImage(path)
+	ensureImageCache()
+	path = normalizeImagePath(path)
+	image = getImageWithName(imagesByPath.get(path))
+	if image is not None: return image
+	hash = getFileHash(path)
+	image = getImageWithName(imagesByHash.get(hash))
+	if image is None: image = loadImage(path)
+	imagesByPath[path] = image.name
+	if hash is not None: imagesByHash[hash] = image.name
+	return image
 def loadImage(path):
 	return load_image(path)
+def getImageWithName(name):
+	if name is None: return None
+	return bpy.data.images.get(name)
+	
+def ensureImageCache():
+	global imageCacheIsBuilt
+	if imageCacheIsBuilt: return
+	for image in bpy.data.images:
+		if image.filepath != "":
+			imagesByPath.setdefault(normalizeImagePath(image.filepath), image.name)
+	imageCacheIsBuilt = True
+def resetImageCache():
+	global imageCacheIsBuilt
+	imagesByPath.clear()
+	imagesByHash.clear()
+	imageCacheIsBuilt = False
+	
+def normalizeImagePath(path):
+	path = bpy.path.abspath(path).replace("\\", "/")
+	return os.path.normcase(os.path.abspath(path))
+def getFileHash(path):
+	if not os.path.isfile(path): return None
+	hash = hashlib.md5()
+	with open(path, "rb") as file:
+		for chunk in iter(lambda: file.read(65536), b""):
+			hash.update(chunk)
+	return hash.hexdigest()
 	
 def getRandom(min, max):
 	return random.random() * (max - min) + min
@@ -132,12 +182,29 @@ def getRandom(min, max):
 def hasPrefix(name, prefix):
 	return name[:len(prefix)] == prefix
 	
+# prefix -> next free number
+nameCounters = {}
+
 def getPossibleName(prefix):
-	if bpy.data.objects.get(prefix) is None: return prefix
-	i = 1
+	if prefix not in nameCounters: seedNameCounter(prefix)
+	if nameCounters[prefix] == 0:
+		nameCounters[prefix] = 1
+		if bpy.data.objects.get(prefix) is None: return prefix
+	i = nameCounters[prefix]
 	while bpy.data.objects.get(prefix + str(i)) is not None:
 		i += 1
+	nameCounters[prefix] = i + 1
 	return prefix + str(i)
+def seedNameCounter(prefix):
+	highest = -1
+	for object in bpy.data.objects:
+		name = object.name
+		if name == prefix: highest = max(highest, 0)
+		elif hasPrefix(name, prefix) and name[len(prefix):].isdigit():
+			highest = max(highest, int(name[len(prefix):]))
+	nameCounters[prefix] = highest + 1
+def resetNameCounters():
+	nameCounters.clear()
 	
 def getFileName(path):
 	return os.path.splitext(os.path.basename(path))[0]
@@ -145,6 +212,8 @@ def getFileName(path):
 def setMinMaxTransparentBounces(amount):
 	bpy.context.scene.cycles.transparent_min_bounces = amount
 	bpy.context.scene.cycles.transparent_max_bounces = amount
+def getMaxTransparentBounces():
+	return bpy.context.scene.cycles.transparent_max_bounces
 	
 def setDisplayTypeToWire(object):
 	object.draw_type = "WIRE"
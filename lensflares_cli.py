@@ -0,0 +1,188 @@
+'''
+Copyright (C) 2014 Jacques Lucke
+mail@jlucke.com
+
+Created by Jacques Lucke
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+# runs without interface:
+#   blender -b scene.blend -P lensflares_cli.py -- job.json
+#
+# job.json:
+# {
+#   "files" : ["shots/sh010.blend", "shots/sh020.blend"],     (optional, default: the opened file)
+#   "flares" : [ { "preset" : "sun", "targets" : ["Lamp"], "camera" : "Camera", "engine" : "COMPACT" } ],
+#   "occlusion" : { "frameStart" : 1, "frameEnd" : 100, "radius" : 0.1, "samples" : 8 },
+#   "cull" : { "frameStart" : 1, "frameEnd" : 100, "margin" : 0.1, "targetMargin" : 1.0 },
+#   "bake" : { "frameStart" : 1, "frameEnd" : 100, "removeRig" : true },
+#   "fitTransparentBounces" : { "frameStart" : 1, "frameEnd" : 100, "margin" : 8 },
+#   "output" : "{folder}/{name}_flares.blend",                 (optional, default: overwrite the file)
+#   "stopOnError" : false
+# }
+#
+# every line on stdout starting with { is one json log record
+# exit codes: 0 everything done, 1 some files failed, 2 invalid job, 3 addon could not be loaded
+
+import sys, os, json, time, traceback, importlib
+import bpy
+
+exitSuccess = 0
+exitFilesFailed = 1
+exitInvalidJob = 2
+exitAddonFailed = 3
+
+addonFolder = os.path.dirname(os.path.abspath(__file__))
+addonName = os.path.basename(addonFolder)
+
+def log(event, **data):
+	record = { "time" : round(time.time(), 3), "event" : event }
+	record.update(data)
+	print(json.dumps(record, sort_keys = True))
+	sys.stdout.flush()
+
+def getScriptArguments():
+	if "--" not in sys.argv: return []
+	return sys.argv[sys.argv.index("--") + 1:]
+
+def loadAddon():
+	if addonName in sys.modules: return sys.modules[addonName]
+	sys.path.append(os.path.dirname(addonFolder))
+	addon = importlib.import_module(addonName)
+	addon.register()
+	return addon
+
+def readJob(path):
+	with open(path) as file:
+		job = json.load(file)
+	if not isinstance(job, dict): raise ValueError("the job has to be a json object")
+	for flare in job.get("flares", []):
+		if "targets" not in flare: raise ValueError("every flare needs a list of targets")
+	jobFolder = os.path.dirname(os.path.abspath(path))
+	job["files"] = [os.path.join(jobFolder, file) for file in job.get("files", [])]
+	return job
+
+def validateJob(addon, job):
+	engines = [item[0] for item in addon.engineItems]
+	for flare in job.get("flares", []):
+		if flare.get("engine", engines[0]) not in engines:
+			raise ValueError("unknown engine: " + str(flare["engine"]) + " (expected one of " + ", ".join(engines) + ")")
+		getPresetPath(addon, flare.get("preset"))
+
+def getJobObject(name, filePath):
+	object = bpy.data.objects.get(name)
+	if object is None: raise ValueError("object not found in " + filePath + ": " + name)
+	return object
+
+def getPresetPath(addon, preset):
+	if preset is None: return None
+	if os.path.isfile(preset): return preset
+	path = os.path.join(addon.presetsFolder, preset + addon.presetExtension)
+	if not os.path.isfile(path): raise ValueError("preset not found: " + preset)
+	return path
+
+def getOutputPath(job, filePath):
+	pattern = job.get("output")
+	if pattern is None: return filePath
+	(folder, fileName) = os.path.split(filePath)
+	return pattern.format(folder = folder, name = os.path.splitext(fileName)[0])
+
+def getFrameRange(settings):
+	scene = bpy.context.scene
+	return (settings.get("frameStart", scene.frame_start), settings.get("frameEnd", scene.frame_end))
+
+def processOpenedFile(addon, job, filePath):
+	flareControlers = []
+	for flare in job.get("flares", []):
+		camera = getJobObject(flare["camera"], filePath) if "camera" in flare else bpy.context.scene.camera
+		if camera is None: raise ValueError("the scene has no camera")
+		if camera.type != "CAMERA": raise ValueError("not a camera in " + filePath + ": " + camera.name)
+		targets = [getJobObject(name, filePath) for name in flare["targets"]]
+		created = addon.newLensFlares(camera, targets, getPresetPath(addon, flare.get("preset")), flare.get("engine"))
+		flareControlers.extend(created)
+		log("flares_created", file = filePath, preset = flare.get("preset"), amount = len(created))
+	if len(flareControlers) == 0: flareControlers = addon.getAllFlares()
+	
+	if "occlusion" in job:
+		settings = job["occlusion"]
+		(frameStart, frameEnd) = getFrameRange(settings)
+		addon.bakeLensFlareOcclusion(flareControlers, frameStart, frameEnd, settings.get("radius", 0.0), settings.get("samples", 1))
+		log("occlusion_baked", file = filePath, frameStart = frameStart, frameEnd = frameEnd)
+	if "cull" in job:
+		settings = job["cull"]
+		(frameStart, frameEnd) = getFrameRange(settings)
+		(hidden, total) = addon.cullLensFlares(flareControlers, frameStart, frameEnd, settings.get("margin", 0.1), settings.get("targetMargin", 1.0), settings.get("hideInViewport", True))
+		log("culled", file = filePath, hidden = hidden, total = total)
+	if "fitTransparentBounces" in job:
+		settings = job["fitTransparentBounces"]
+		(frameStart, frameEnd) = getFrameRange(settings)
+		(before, after) = addon.setAnalyzedTransparentBounces(frameStart, frameEnd, settings.get("margin", addon.transparentBounceMargin))
+		log("transparent_bounces_fitted", file = filePath, before = before, after = after)
+	if "bake" in job:
+		settings = job["bake"]
+		(frameStart, frameEnd) = getFrameRange(settings)
+		addon.bakeLensFlares(flareControlers, frameStart, frameEnd, settings.get("removeRig", True))
+		log("baked", file = filePath, frameStart = frameStart, frameEnd = frameEnd)
+	
+	outputPath = getOutputPath(job, filePath)
+	bpy.ops.wm.save_as_mainfile(filepath = outputPath, copy = outputPath != filePath)
+	log("saved", file = filePath, output = outputPath)
+
+def processFile(addon, job, filePath):
+	startTime = time.time()
+	log("file_started", file = filePath)
+	try:
+		if os.path.abspath(bpy.data.filepath) != os.path.abspath(filePath):
+			bpy.ops.wm.open_mainfile(filepath = filePath)
+		processOpenedFile(addon, job, filePath)
+	except Exception as error:
+		log("file_failed", file = filePath, error = str(error), traceback = traceback.format_exc())
+		return False
+	log("file_finished", file = filePath, seconds = round(time.time() - startTime, 3))
+	return True
+
+def main():
+	arguments = getScriptArguments()
+	if len(arguments) != 1:
+		log("invalid_arguments", error = "expected: blender -b file.blend -P lensflares_cli.py -- job.json", arguments = arguments)
+		return exitInvalidJob
+	try: job = readJob(arguments[0])
+	except (OSError, ValueError) as error:
+		log("invalid_job", error = str(error))
+		return exitInvalidJob
+	try: addon = loadAddon()
+	except Exception as error:
+		log("addon_failed", error = str(error), traceback = traceback.format_exc())
+		return exitAddonFailed
+	try: validateJob(addon, job)
+	except ValueError as error:
+		log("invalid_job", error = str(error))
+		return exitInvalidJob
+	
+	files = job["files"] if len(job["files"]) > 0 else [bpy.data.filepath]
+	if "" in files:
+		log("invalid_job", error = "no files given and no file opened")
+		return exitInvalidJob
+	failed = []
+	for filePath in files:
+		if not processFile(addon, job, filePath):
+			failed.append(filePath)
+			if job.get("stopOnError", False): break
+	log("job_finished", files = len(files), failed = failed)
+	return exitFilesFailed if len(failed) > 0 else exitSuccess
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,96 @@
+import os, sys, math, numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lens_flare_engine_utils import *
+
+# the driver rig evaluated one element at a time with the driver expressions
+
+def rotationMatrix(axis, angle):
+	(x, y, z) = numpy.asarray(axis, dtype = numpy.float64) / numpy.linalg.norm(axis)
+	(c, s) = (math.cos(angle), math.sin(angle))
+	return numpy.array([
+		[c + x*x*(1-c), x*y*(1-c) - z*s, x*z*(1-c) + y*s],
+		[y*x*(1-c) + z*s, c + y*y*(1-c), y*z*(1-c) - x*s],
+		[z*x*(1-c) - y*s, z*y*(1-c) + x*s, c + z*z*(1-c)]])
+def zRotation(angle):
+	return rotationMatrix([0, 0, 1], angle)
+
+def newCameraMatrix(random):
+	matrix = numpy.identity(4)
+	matrix[:3, :3] = rotationMatrix(random.uniform(-1, 1, 3), random.uniform(0, 2 * math.pi))
+	matrix[:3, 3] = random.uniform(-10, 10, 3)
+	return matrix
+
+def newTargetInView(random, cameraMatrix):
+	local = [random.uniform(-3, 3), random.uniform(-3, 3), -random.uniform(5, 50)]
+	return cameraMatrix[:3, :3].dot(local) + cameraMatrix[:3, 3]
+
+def distance(a, b):
+	return math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+def evaluateRig(cameraMatrix, dofDistance, target, position, offset, scale, widthFactor, rotation, centerInfluence):
+	cam = cameraMatrix[:3, 3]
+	rotationPart = cameraMatrix[:3, :3]
+	center = rotationPart.dot([0, 0, -max(dofDistance, 1)]) + cam
+	directionCalculator = rotationPart.dot([0, 0, -1]) + cam
+
+	# direction properties: (a-b)/(dis+0.0000001)
+	direction = [(a - b) / (distance(target, cam) + 0.0000001) for a, b in zip(target, cam)]
+	cameraDirection = [(a - b) / (distance(cam, directionCalculator) + 0.0000001) for a, b in zip(cam, directionCalculator)]
+	angle = math.degrees(math.acos(sum(x1 * x2 for x1, x2 in zip(direction, cameraDirection))))
+	startDistance = -distance(center, cam) / math.cos(math.radians(angle))
+	start = [d * startDistance + c for d, c in zip(direction, cam)]
+	end = [2 * c - s for c, s in zip(center, start)]
+	element = numpy.array([s * (1 - position) + e * position for s, e in zip(start, end)])
+
+	elementDistance = distance(element, cam)
+	plane = element + rotationPart.dot([offset[0] * elementDistance, offset[1] * elementDistance, offset[2] * elementDistance])
+	planeDistance = distance(plane, cam)
+	scales = [widthFactor * scale[0] * planeDistance, scale[1] * planeDistance, planeDistance]
+
+	# track to constraint on x with the camera z as up, blended by its influence with the own rotation
+	baseRotation = zRotation(math.radians(rotation))
+	toCenter = rotationPart.T.dot(center - plane)
+	trackRotation = zRotation(math.atan2(toCenter[1], toCenter[0]))
+	relative = baseRotation.T.dot(trackRotation)
+	blended = baseRotation.dot(zRotation(centerInfluence * math.atan2(relative[1, 0], relative[0, 0])))
+
+	matrix = numpy.identity(4)
+	matrix[:3, :3] = rotationPart.dot(blended) * scales
+	matrix[:3, 3] = plane
+	return matrix
+
+def test_engine_matches_driver_rig():
+	random = numpy.random.RandomState(0)
+	for attempt in range(20):
+		cameraMatrix = newCameraMatrix(random)
+		dofDistance = random.uniform(0, 20)
+		targets = [newTargetInView(random, cameraMatrix) for flareIndex in range(3)]
+		amount = 12
+		flareIndices = random.randint(0, len(targets), amount)
+		positions = random.uniform(-0.5, 1.5, amount)
+		offsets = random.uniform(-0.3, 0.3, (amount, 3))
+		scales = random.uniform(0.01, 2, (amount, 2))
+		widthFactors = random.uniform(0.5, 2, amount)
+		rotations = random.uniform(-360, 360, amount)
+		centerInfluences = random.uniform(0, 1, amount)
+
+		(locations, angles, planeScales) = computeElementTransforms(cameraMatrix, max(dofDistance, 1), targets, flareIndices,
+			positions, offsets, scales, widthFactors, rotations, centerInfluences)
+		matrices = composePlaneMatrices(cameraMatrix, locations, angles, planeScales)
+		for index in range(amount):
+			expected = evaluateRig(cameraMatrix, dofDistance, targets[flareIndices[index]], positions[index], offsets[index],
+				scales[index], widthFactors[index], rotations[index], centerInfluences[index])
+			assert numpy.allclose(matrices[index], expected, rtol = 1e-5, atol = 1e-5)
+
+def test_end_mirrors_start_at_the_center():
+	random = numpy.random.RandomState(1)
+	cameraMatrix = newCameraMatrix(random)
+	targets = [newTargetInView(random, cameraMatrix) for flareIndex in range(5)]
+	(starts, ends) = computeStartAndEndLocations(cameraMatrix, 4.0, targets)
+	assert numpy.allclose((starts + ends) / 2, computeFlareCenter(cameraMatrix, 4.0))
+
+	# the start lies on the line to the target in the plane of the center
+	forward = -getCameraRotation(cameraMatrix)[:, 2]
+	assert numpy.allclose((starts - getCameraLocation(cameraMatrix)).dot(forward), 4.0)
+	assert numpy.allclose(normalizeRows(starts - getCameraLocation(cameraMatrix)), normalizeRows(numpy.array(targets) - getCameraLocation(cameraMatrix)))
@@ -0,0 +1,51 @@
+import os, sys, numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lens_flare_occlusion_utils import *
+
+def bruteForceOccludedSegments(triangles, origins, ends):
+	occluded = numpy.zeros(len(origins), dtype = bool)
+	for index, (origin, end) in enumerate(zip(origins, ends)):
+		amount = len(triangles)
+		hits = intersectTriangles(triangles, numpy.tile(origin, (amount, 1)), numpy.tile(end - origin, (amount, 1)))
+		occluded[index] = hits.any()
+	return occluded
+	
+def test_bvh_matches_brute_force():
+	random = numpy.random.RandomState(0)
+	hitAmount = 0
+	for triangleAmount in [1, 7, 50, 300]:
+		centers = random.uniform(-5, 5, (triangleAmount, 1, 3))
+		triangles = centers + random.uniform(-1, 1, (triangleAmount, 3, 3))
+		origins = random.uniform(-8, 8, (500, 3))
+		ends = random.uniform(-8, 8, (500, 3))
+		
+		occluded = BVH(triangles).findOccludedSegments(origins, ends)
+		expected = bruteForceOccludedSegments(triangles, origins, ends)
+		assert numpy.array_equal(occluded, expected)
+		hitAmount += expected.sum()
+	assert 0 < hitAmount
+		
+def test_empty_bvh_occludes_nothing():
+	occluded = BVH(numpy.zeros((0, 3, 3))).findOccludedSegments([[0, 0, 0]], [[0, 0, 1]])
+	assert not occluded.any()
+	
+def test_visible_fractions_with_partial_cover():
+	# a wall halfway to the targets that covers x > 0.001
+	wall = trianglesFromFaces([[0.001, -10, 5], [10, -10, 5], [10, 10, 5], [0.001, 10, 5]], [[0, 1, 2, 3]])
+	bvh = BVH(wall)
+	origins = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+	targets = [[0, 0, 10], [-5, 0, 10], [5, 0, 10]]
+	(radius, samples) = (1.0, 64)
+	
+	fractions = computeVisibleFractions(bvh, origins, targets, radius, samples)
+	# the wall is halfway, so a sample offset by x crosses it at x / 2
+	offsets = getJitterOffsets(samples) * radius
+	expectedCenter = 1 - (offsets[:, 0] / 2 > 0.001).mean()
+	assert 0.3 < expectedCenter < 0.7
+	assert numpy.allclose(fractions, [expectedCenter, 1.0, 0.0])
+	
+def test_single_sample_is_binary():
+	bvh = BVH(numpy.array([[[-1, -1, 5], [1, -1, 5], [0, 1, 5]]], dtype = numpy.float64))
+	fractions = computeVisibleFractions(bvh, [[0, 0, 0], [3, 0, 0]], [[0, 0, 10], [3, 0, 10]])
+	assert numpy.array_equal(fractions, [0.0, 1.0])
@@ -0,0 +1,75 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lens_flare_preset_utils import *
+
+def writePreset(folder, fileName, name, imageNames, mtime = None):
+	path = os.path.join(str(folder), fileName)
+	elements = "".join('<element imageName="{}" />'.format(imageName) for imageName in imageNames)
+	with open(path, "w") as file:
+		file.write('<flare name="{}" intensity="1.0">{}</flare>'.format(name, elements))
+	if mtime is not None: os.utime(path, (mtime, mtime))
+	return path
+
+def newIndex(folder):
+	return openPresetIndex(os.path.join(str(folder), "presets.sqlite"))
+
+def getImageRows(connection):
+	return sorted(connection.execute("SELECT path, imageName FROM presetImages"))
+
+def test_unchanged_presets_are_not_parsed_again(tmp_path):
+	sun = writePreset(tmp_path, "sun.lf", "Sun", ["circle.jpg", "ring.png"])
+	lamp = writePreset(tmp_path, "lamp.lf", "Lamp", ["circle.jpg"])
+	connection = newIndex(tmp_path)
+	assert updatePresetIndex(connection, str(tmp_path)) == 2
+	assert updatePresetIndex(connection, str(tmp_path)) == 0
+	assert queryPresets(connection) == [lamp, sun]
+	assert queryPresets(connection, imageName = "ring.png") == [sun]
+	assert queryPresets(connection, minElements = 2) == [sun]
+
+def test_touched_presets_only_update_their_status(tmp_path):
+	path = writePreset(tmp_path, "sun.lf", "Sun", ["circle.jpg"], mtime = 1000000)
+	connection = newIndex(tmp_path)
+	updatePresetIndex(connection, str(tmp_path))
+	os.utime(path, (2000000, 2000000))
+	assert updatePresetIndex(connection, str(tmp_path)) == 0
+	assert connection.execute("SELECT mtime FROM presets WHERE path = ?", (path, )).fetchone()[0] == 2000000
+	assert updatePresetIndex(connection, str(tmp_path)) == 0
+
+def test_changed_presets_are_parsed_again(tmp_path):
+	path = writePreset(tmp_path, "sun.lf", "Sun", ["circle.jpg"], mtime = 1000000)
+	connection = newIndex(tmp_path)
+	updatePresetIndex(connection, str(tmp_path))
+	writePreset(tmp_path, "sun.lf", "Sunset", ["glow.png", "streak.png"], mtime = 2000000)
+	assert updatePresetIndex(connection, str(tmp_path)) == 1
+	assert queryPresets(connection, name = "Sunset") == [path]
+	assert getImageRows(connection) == [(path, "glow.png"), (path, "streak.png")]
+
+def test_renamed_presets_replace_their_old_rows(tmp_path):
+	oldPath = writePreset(tmp_path, "sun.lf", "Sun", ["circle.jpg"])
+	connection = newIndex(tmp_path)
+	updatePresetIndex(connection, str(tmp_path))
+	newPath = os.path.join(str(tmp_path), "sunrise.lf")
+	os.rename(oldPath, newPath)
+	assert updatePresetIndex(connection, str(tmp_path)) == 1
+	assert queryPresets(connection) == [newPath]
+	assert getImageRows(connection) == [(newPath, "circle.jpg")]
+
+def test_deleted_presets_are_removed(tmp_path):
+	sun = writePreset(tmp_path, "sun.lf", "Sun", ["circle.jpg"])
+	lamp = writePreset(tmp_path, "lamp.lf", "Lamp", ["ring.png"])
+	connection = newIndex(tmp_path)
+	updatePresetIndex(connection, str(tmp_path))
+	os.remove(sun)
+	assert updatePresetIndex(connection, str(tmp_path)) == 0
+	assert queryPresets(connection) == [lamp]
+	assert getImageRows(connection) == [(lamp, "ring.png")]
+
+def test_broken_presets_are_indexed_without_elements(tmp_path):
+	path = os.path.join(str(tmp_path), "broken.lf")
+	with open(path, "w") as file:
+		file.write("<flare")
+	connection = newIndex(tmp_path)
+	assert updatePresetIndex(connection, str(tmp_path)) == 1
+	assert queryPresets(connection) == [path]
+	assert queryPresets(connection, minElements = 1) == []